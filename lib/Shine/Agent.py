@@ -0,0 +1,261 @@
+# Agent.py -- Persistent shine agent
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Persistent shine agent.
+
+A shine agent runs on a server and executes the remote shine commands (-R)
+it receives on a UNIX socket. Python modules are imported and filesystem
+configurations are parsed only once, instead of for each command.
+
+This module is also the agent client, used by the admin node through ssh:
+
+  python -m Shine.Agent <socket> <shine path> <shine arguments...>
+
+If no agent answers on the socket, or if it is busy with another request,
+the shine command is run as usual.
+
+Only the standard library is imported here at load time, so the client
+starts quickly.
+"""
+
+import os
+import sys
+import socket
+import traceback
+
+# Trailer line sent by the agent at the end of each request.
+AGENT_RC_PREFIX = "SHINE_AGENT_RC:"
+# Line sent by the agent when it starts serving a connection.
+AGENT_READY = "SHINE_AGENT_READY"
+# Seconds to wait for a busy agent before running the command directly.
+AGENT_WAIT = 0.5
+
+
+class AgentError(Exception):
+    """An error occured while setting up the shine agent."""
+
+
+def agent_connect(sockpath, timeout=AGENT_WAIT):
+    """
+    Return a socket connected to the agent listening on `sockpath', once it
+    is ready to serve it.
+
+    Raise socket.error if no agent is listening, or socket.timeout if it is
+    still busy with another request after `timeout' seconds.
+    """
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(timeout)
+        sock.connect(sockpath)
+        # Nothing else is sent by the agent until it gets a request.
+        greeting = ''
+        while not greeting.endswith('\n'):
+            data = sock.recv(64)
+            if not data:
+                break
+            greeting += data
+        if greeting != AGENT_READY + '\n':
+            raise socket.error("unexpected agent greeting: %r" % greeting)
+        sock.settimeout(None)
+    except socket.error:
+        sock.close()
+        raise
+    return sock
+
+def agent_request(sock, args, output=None):
+    """
+    Send a shine command to the agent connected through `sock'.
+
+    Command output is written on `output' (stdout by default) and the command
+    return code is returned.
+    """
+    output = output or sys.stdout
+    rc = 1
+    try:
+        sock.sendall('\0'.join(args) + '\n')
+        reader = sock.makefile('r')
+        try:
+            for line in reader:
+                if line.startswith(AGENT_RC_PREFIX):
+                    rc = int(line[len(AGENT_RC_PREFIX):])
+                else:
+                    output.write(line)
+        finally:
+            reader.close()
+        output.flush()
+    finally:
+        sock.close()
+    return rc
+
+def agent_call(sockpath, args, output=None):
+    """Connect to the agent on `sockpath' and send it a shine command."""
+    return agent_request(agent_connect(sockpath), args, output)
+
+
+class AgentServer(object):
+    """
+    Serve shine requests on a UNIX socket, one at a time.
+
+    Each connection is greeted with an AGENT_READY line, so clients waiting
+    for a busy agent could give up and run their command directly. A request
+    is a single line with the shine command arguments separated by NUL
+    characters. Command output is sent back, followed by a trailer line with
+    its return code.
+    """
+
+    def __init__(self, sockpath):
+        self.sockpath = sockpath
+        self._sock = None
+
+    def bind(self):
+        """Create the listening socket, only accessible by its owner."""
+        # Check if another agent is already running
+        if os.path.exists(self.sockpath):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                try:
+                    probe.connect(self.sockpath)
+                except socket.error:
+                    # Stale socket file
+                    os.unlink(self.sockpath)
+                else:
+                    raise AgentError("an agent is already listening on %s" %
+                                     self.sockpath)
+            finally:
+                probe.close()
+
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        oldmask = os.umask(0077)
+        try:
+            self._sock.bind(self.sockpath)
+        finally:
+            os.umask(oldmask)
+        self._sock.listen(16)
+
+    def close(self):
+        """Stop listening and remove the socket file."""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+            if os.path.exists(self.sockpath):
+                os.unlink(self.sockpath)
+
+    def serve(self, count=None):
+        """
+        Serve requests until interrupted, or until `count' requests were
+        handled.
+        """
+        if self._sock is None:
+            self.bind()
+        while count is None or count > 0:
+            conn = self._sock.accept()[0]
+            try:
+                self._handle(conn)
+            finally:
+                conn.close()
+            if count is not None:
+                count -= 1
+
+    def _handle(self, conn):
+        """Read a request on `conn', run it and send back its result."""
+        try:
+            conn.sendall(AGENT_READY + '\n')
+        except socket.error:
+            # Client gave up waiting for us
+            return
+        reader = conn.makefile('r')
+        try:
+            line = reader.readline()
+        finally:
+            reader.close()
+        if not line.endswith('\n'):
+            return
+        args = line[:-1].split('\0')
+
+        stream = conn.makefile('w')
+        saved = sys.stdout, sys.stderr
+        sys.stdout = sys.stderr = stream
+        try:
+            try:
+                rc = self.run_request(args) or 0
+            except SystemExit, exp:
+                # optparse exits on bad command line
+                rc = exp.code or 0
+            except Exception:
+                traceback.print_exc()
+                rc = 1
+        finally:
+            sys.stdout, sys.stderr = saved
+        try:
+            stream.write("%s%d\n" % (AGENT_RC_PREFIX, rc))
+            stream.close()
+        except socket.error:
+            # Client is gone
+            pass
+
+    def reset_state(self):
+        """
+        Forget the process-wide state left by the previous request: settings,
+        resources, procfs snapshot and mountdata and status caches.
+        """
+        # Imported here to keep the agent client light.
+        from Shine.Configuration.Globals import Globals
+        from Shine.Lustre import ProcSnapshot, StatusCache
+        from Shine.Lustre.Disk import reset_mountdata_cache
+        from Shine.Lustre.Actions.Action import reset_resources
+
+        Globals.reset()
+        reset_resources()
+        reset_mountdata_cache()
+        ProcSnapshot.deactivate()
+        StatusCache.reset()
+
+    def run_request(self, args):
+        """Run a shine command line and return its return code."""
+        # Imported here to keep the agent client light.
+        from ClusterShell.Task import task_self
+        from Shine.Controller import Controller
+
+        self.reset_state()
+
+        # Commands could modify these settings for their own needs.
+        task = task_self()
+        fanout = task.info('fanout')
+        debug = task.info('debug')
+        try:
+            return Controller().run_command(args)
+        finally:
+            task.set_info('fanout', fanout)
+            task.set_info('debug', debug)
+
+
+def main(args):
+    """Agent client: `args' are the socket path, shine path and arguments."""
+    sockpath, progpath = args[0:2]
+    try:
+        sock = agent_connect(sockpath)
+    except socket.error:
+        # No running agent, or busy one: run shine directly
+        os.execv(progpath, args[1:])
+    return agent_request(sock, args[2:])
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
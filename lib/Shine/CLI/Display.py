@@ -25,12 +25,12 @@ Helping method to format filesystem state for text output.
 import sys
 from operator import attrgetter
 
-from Shine.Configuration.Globals import Globals
+from ClusterShell.NodeSet import NodeSet
 
-from Shine.CLI.TextTable import TextTable
+from Shine.Configuration.Globals import Globals
 
-class DisplayError(Exception):
-    """An error prevent display to be done correctly."""
+from Shine.CLI import DisplayError
+from Shine.CLI.TextTable import TextTable, COLORS
 
 (KILO, MEGA, GIGA, TERA) = (1024.0, 1024.0 ** 2, 1024.0 ** 3, 1024.0 ** 4)
 
@@ -128,6 +128,29 @@ def _get_fields(comp, fields):
     return d_fields
 
 
+def _split_sets(comps):
+    """
+    Replace component sets, like ClientSet, by one set per node state, so
+    nodes with different states are displayed apart.
+    """
+    compsets = comps.filter(supports='split')
+    if len(compsets) == 0:
+        return comps
+    comps = comps.filter(key=lambda comp: not comp.capable('split'))
+    for compset in compsets:
+        comps.update(compset.split())
+    return comps
+
+def _node_count(compgrp):
+    """Return the number of nodes (not sets) in ``compgrp''."""
+    count = 0
+    for comp in compgrp:
+        if comp.capable('nodes'):
+            count += len(comp.nodes)
+        else:
+            count += 1
+    return count
+
 def table_fill(tbl, fs, sort_key=None, supports=None, viewsupports=None):
     """
     Fill ``tbl'' with the component properties from filesystem ``fs''.
@@ -147,6 +170,7 @@ def table_fill(tbl, fs, sort_key=None, supports=None, viewsupports=None):
     comps = fs.components.managed(supports=supports, inactive=True)
     if viewsupports is not None:
         comps = comps.filter(supports=viewsupports)
+    comps = _split_sets(comps)
     def fieldvals(comp):
         """Get the value list of field for ``comp''."""
         return _get_fields(comp, pat_fields).values()
@@ -170,7 +194,7 @@ def table_fill(tbl, fs, sort_key=None, supports=None, viewsupports=None):
 
         # Get ComponentGroup fields
         if 'count' in grp_fields:
-            fields['count'] = str(len(compgrp))
+            fields['count'] = str(_node_count(compgrp))
         if 'labels' in grp_fields:
             fields['labels'] = str(compgrp.labels())
         if 'nodes' in grp_fields:
@@ -247,3 +271,54 @@ def display(cmd, fs, supports=None):
     table_fill(tbl, fs, sort_key=key, supports=supports,
                viewsupports=viewsupports)
     return str(tbl)
+
+def status_snapshot(fs, supports=None):
+    """
+    Return a dict mapping the unique id of each component of ``fs'' to a
+    (component, node, text status) tuple.
+
+    Client sets are recorded once per node, the node name being appended to
+    their unique id.
+    """
+    snapshot = {}
+    for comp in fs.components.managed(supports=supports, inactive=True):
+        if comp.capable('split'):
+            for subset in comp.split():
+                status = subset.text_status()
+                for node in subset.nodes:
+                    snapshot["%s@%s" % (comp.uniqueid(), node)] = \
+                                                    (subset, node, status)
+        else:
+            snapshot[comp.uniqueid()] = (comp, str(comp.server.hostname),
+                                         comp.text_status())
+    return snapshot
+
+def display_transitions(cmd, fs, previous, current):
+    """
+    Return one line for each component of ``fs'' whose status differs
+    between the ``previous'' and ``current'' snapshots (see
+    status_snapshot()), or an empty string if nothing changed.
+
+    Nodes of a client set with the same transition share the same line.
+    """
+    color = setup_table(cmd.options).color
+    order = []
+    changes = {}
+    for key, (comp, node, new) in sorted(current.items()):
+        old = previous.get(key, (None, None, None))[2]
+        if old is None or old == new:
+            continue
+        change = (comp.label, old, new)
+        if change not in changes:
+            order.append(change)
+            changes[change] = []
+        changes[change].append(node)
+
+    lines = []
+    for label, old, new in order:
+        nodes = NodeSet.fromlist(changes[(label, old, new)])
+        if color:
+            new = "%s%s%s" % (COLORS['change'], new, COLORS['stop'])
+        lines.append("%s %s on %s: %s -> %s" %
+                     (fs.fs_name, label, nodes, old, new))
+    return "\n".join(lines)
@@ -24,6 +24,7 @@ Table formatting classes for text-based interface.
 import re
 
 COLORS = {'header': '\033[34m',
+          'change': '\033[1;33m',
           'stop': '\033[0m',
          }
 
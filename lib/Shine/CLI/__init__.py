@@ -0,0 +1,3 @@
+
+class DisplayError(Exception):
+    """An error prevent display to be done correctly."""
@@ -0,0 +1,73 @@
+# Agent.py -- Run a persistent shine agent.
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+Shine `agent' command classes.
+
+Run a persistent shine agent, serving remote shine requests.
+
+Requests are run one at a time. A request sent while the agent is busy is
+run without it, as if no agent was running.
+"""
+
+from Shine.Configuration.Globals import Globals
+
+from Shine.Commands.Base.Command import Command, CommandException
+
+from Shine.Agent import AgentServer, AgentError
+from Shine import FSUtils
+
+
+class Agent(Command):
+    """
+    shine agent
+    """
+
+    NAME = "agent"
+    DESCRIPTION = "Run an agent serving remote shine commands, one at a time."
+
+    def execute(self):
+
+        # Option sanity check
+        self.forbidden(self.options.fsnames, "-f")
+        self.forbidden(self.options.model, "-m")
+        self.forbidden(self.options.labels, "-l")
+        self.forbidden(self.options.indexes, "-i")
+        self.forbidden(self.options.failover, "-F")
+
+        sockpath = Globals().get('agent_socket')
+        if not sockpath:
+            raise CommandException("agent_socket is not set in shine.conf")
+
+        # Keep filesystem configurations in memory between requests
+        FSUtils.enable_conf_cache()
+
+        server = AgentServer(sockpath)
+        try:
+            server.bind()
+        except AgentError, error:
+            raise CommandException(str(error))
+
+        try:
+            server.serve()
+        finally:
+            server.close()
+
+        return 0
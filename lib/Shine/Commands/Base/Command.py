@@ -25,10 +25,7 @@ from ClusterShell.NodeSet import NodeSet
 
 from Shine.Configuration.Globals import Globals
 
-from Shine.Lustre.Server import Server
-
 from Shine.Commands.Base.CommandRCDefs import RC_FLAG_RUNTIME_ERROR
-from Shine.Commands.Base.RemoteCallEventHandler import RemoteCallEventHandler
 
 class CommandException(Exception):
     """Generic exception for Shine.Commands.Base.Command"""
@@ -193,6 +190,7 @@ class RemoteCommand(Command):
         # Limit the scope of the command if called with local flag (-L) or
         # called remotely (-R).
         if self.has_local_flag():
+            from Shine.Lustre.Server import Server
             self.options.nodes = NodeSet(Server.hostname_short())
 
     def install_eventhandler(self, local_eventhandler, global_eventhandler):
@@ -202,7 +200,13 @@ class RemoteCommand(Command):
         if self.options.remote:
             # When called remotely (-R), install a special event handler
             # that knows how to speak the Shine Proxy Protocol using pickle.
-            self.eventhandler = RemoteCallEventHandler()
+            # Imported here as it loads all the Lustre action modules.
+            from Shine.Commands.Base.RemoteCallEventHandler import \
+                                                    RemoteCallEventHandler
+            batch_delay = Globals().get('proxy_batch_delay') / 1000.0
+            self.eventhandler = RemoteCallEventHandler(
+                                    Globals().get('proxy_batch_size'),
+                                    batch_delay)
         elif self.options.local:
             self.eventhandler = local_eventhandler
         else:
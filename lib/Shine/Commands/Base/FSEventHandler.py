@@ -24,6 +24,7 @@ Command event handler classes used to display information when receiving events.
 
 import datetime
 
+from ClusterShell.NodeSet import NodeSet
 from ClusterShell.Task import task_self
 
 from Shine.CLI.Display import display
@@ -55,7 +56,12 @@ class FSLocalEventHandler(LustreEH):
         # Name of action to be supported by components (used with filter())
         self.fs_action = command.NAME
         self.verbose = self.command.options.verbose
+        # Last filesystem given to pre()
         self.fs = None
+        # All filesystems being processed, several when they are run at
+        # once (see FSLiveCommand.execute_parallel_fs() and
+        # Status.execute_multi_fs()).
+        self._filesystems = []
 
     #
     # Logging methods
@@ -188,6 +194,8 @@ class FSLocalEventHandler(LustreEH):
         Attach the provided filesystem to this handler for further processing.
         """
         self.fs = fs
+        if fs not in self._filesystems:
+            self._filesystems.append(fs)
         self.handle_pre()
 
     def handle_post(self, fs):
@@ -203,6 +211,8 @@ class FSLocalEventHandler(LustreEH):
     def post(self, fs):
         """Do any post-processing. This is called for each filesystem."""
         self.handle_post(fs)
+        if fs in self._filesystems:
+            self._filesystems.remove(fs)
 
 
 # Theorically, this class should inherit from ClusterShell EventHandler too.
@@ -246,9 +256,12 @@ class FSGlobalEventHandler(FSLocalEventHandler):
     def ev_timer(self, timer):
         """Repeating timer callback for in-progress operations."""
         filter_key = lambda t: t.state == INPROGRESS or t._list_action()
-        targets = self.fs.components.managed().filter(key=filter_key)
-        target_servers = targets.servers()
-        target_count = len(targets)
+        target_servers = NodeSet()
+        target_count = 0
+        for fs in self._filesystems:
+            targets = fs.components.managed().filter(key=filter_key)
+            target_servers.update(targets.servers())
+            target_count += len(targets)
 
         if target_count > 0 and self.status_changed:
             self.status_changed = False
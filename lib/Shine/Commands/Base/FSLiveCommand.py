@@ -28,6 +28,7 @@ from Shine.Commands.Base.Command import RemoteCommand, CommandHelpException
 
 # Command helper
 from Shine.FSUtils import open_lustrefs
+from Shine.Lustre.FileSystem import multi_run
 
 # Error handling
 from Shine.Commands.Base.CommandRCDefs import RC_RUNTIME_ERROR
@@ -45,6 +46,21 @@ class FSLiveCommand(RemoteCommand):
 
     CRITICAL = False
 
+    # Set to True if the command implements execute_multi_fs()
+    MERGE_FS = False
+
+    # Set to True if the command implements prepare_fs() and finish_fs()
+    PARALLEL_FS = False
+
+    # Set to True if the command implements execute_watch_fs()
+    WATCH = False
+
+    # Set to True if the command supports --max-age
+    MAX_AGE = False
+
+    # Set to True if the command supports --check
+    CHECK = False
+
     TARGET_STATUS_RC_MAP = {}
 
     def fs_status_to_rc(self, status_set):
@@ -61,14 +77,88 @@ class FSLiveCommand(RemoteCommand):
                              labels=self.options.labels,
                              event_handler=eh)
 
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
+        """
+        Check the command could be run on `fs' and return the (action,
+        kwargs) tuple of the FileSystem method to call, or a return code if
+        nothing should be run.
+        """
+        raise NotImplementedError("Derived class must implement.")
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, fs_result):
+        """Display `fs_result' and return the command rc for `fs'."""
+        raise NotImplementedError("Derived class must implement.")
+
     def execute_fs(self, fs, fs_conf, eh, vlevel):
-        raise NotImplemented("Derived class must implement.")
+        plan = self.prepare_fs(fs, fs_conf, eh, vlevel)
+        if type(plan) is not tuple:
+            return plan
+        action, kwargs = plan
+        fs_result = getattr(fs, action)(**kwargs)
+        return self.finish_fs(fs, fs_conf, eh, vlevel, fs_result)
+
+    def execute_parallel_fs(self, fslist, eh, vlevel):
+        """
+        Run the command for all (fs, fs_conf) of `fslist' in the same task
+        run.
+
+        Used instead of execute_fs() with --parallel-fs.
+        """
+        result = 0
+        calls = []
+        for fs, fs_conf in fslist:
+            plan = self.prepare_fs(fs, fs_conf, eh, vlevel)
+            if type(plan) is tuple:
+                calls.append((fs, fs_conf, plan))
+            else:
+                result = max(result, plan)
+
+        results = multi_run([(fs, action, kwargs)
+                             for fs, _, (action, kwargs) in calls])
+
+        first = True
+        for (fs, fs_conf, _), fs_result in zip(calls, results):
+            # Separate each fsname with a blank line
+            if not first and not self.options.remote:
+                print
+            first = False
+
+            rc = self.finish_fs(fs, fs_conf, eh, vlevel, fs_result)
+            result = max(result, rc)
+
+        return result
+
+    def execute_multi_fs(self, fslist, eh, vlevel):
+        """
+        Run the command for all (fs, fs_conf) of `fslist' at once.
+
+        Used instead of execute_fs() with --merge-fs.
+        """
+        raise NotImplementedError("Derived class must implement.")
+
+    def execute_watch_fs(self, fslist, eh, vlevel):
+        """
+        Run the command repeatedly for all (fs, fs_conf) of `fslist'.
+
+        Used instead of execute_fs() with --watch.
+        """
+        raise NotImplementedError("Derived class must implement.")
 
     def execute(self):
         first = True
 
         # Option sanity check
         self.forbidden(self.options.model, "-m, use -f")
+        if not self.MERGE_FS:
+            self.forbidden(self.options.mergefs, "--merge-fs")
+        if not self.PARALLEL_FS:
+            self.forbidden(self.options.parallelfs, "--parallel-fs")
+        if not self.WATCH:
+            self.forbidden(self.options.watch, "--watch")
+        if not self.MAX_AGE:
+            self.forbidden(self.options.max_age is not None, "--max-age")
+        if not self.CHECK:
+            self.forbidden(self.options.check, "--check")
 
         # Do not allow implicit filesystems format.
         if self.CRITICAL and not self.options.fsnames:
@@ -88,21 +178,41 @@ class FSLiveCommand(RemoteCommand):
             global_eh = self.GLOBAL_EH(self)
         eh = self.install_eventhandler(local_eh, global_eh)
 
-        for fsname in self.iter_fsname():
-
-            # Open configuration and instantiate a Lustre FS.
-            fs_conf, fs = self._open_fs(fsname, eh)
-
-            # Define debuggin level
-            fs.set_debug(self.options.debug)
-
-            # Separate each fsname with a blank line
-            if not first:
-                print
-            first = False
-
-            # Run the real job
-            vlevel = self.options.verbose
-            result = max(result, self.execute_fs(fs, fs_conf, eh, vlevel))
+        vlevel = self.options.verbose
+        fslist = []
+        try:
+            for fsname in self.iter_fsname():
+
+                # Open configuration and instantiate a Lustre FS.
+                fs_conf, fs = self._open_fs(fsname, eh)
+
+                # Define debuggin level
+                fs.set_debug(self.options.debug)
+
+                # All filesystems are handled together, later.
+                if self.options.mergefs or self.options.parallelfs or \
+                   self.options.watch:
+                    fslist.append((fs, fs_conf))
+                    continue
+
+                # Separate each fsname with a blank line
+                # (not when remote, this is not a shine message)
+                if not first and not self.options.remote:
+                    print
+                first = False
+
+                # Run the real job
+                result = max(result, self.execute_fs(fs, fs_conf, eh, vlevel))
+
+            if fslist and self.options.watch:
+                result = self.execute_watch_fs(fslist, eh, vlevel)
+            elif fslist and self.options.parallelfs:
+                result = self.execute_parallel_fs(fslist, eh, vlevel)
+            elif fslist:
+                result = self.execute_multi_fs(fslist, eh, vlevel)
+        finally:
+            # Send events possibly buffered by the event handler.
+            if hasattr(eh, 'flush'):
+                eh.flush()
 
         return result
@@ -20,22 +20,87 @@
 
 import sys
 
+from ClusterShell.Task import task_self
+
 from Shine.Lustre.EventHandler import EventHandler
-from Shine.Lustre.Actions.Proxy import shine_msg_pack
+from Shine.Lustre.Actions.Proxy import shine_msg_pack, shine_msg_pack_batch, \
+                                       shine_event_compact
 
 class RemoteCallEventHandler(EventHandler):
     """
     Special shine EventHandler installed when called with -R (remote
     call), which aims to serialize all events instead of printing human
     output.
+
+    If `batch_size' is greater than 1, events are buffered and sent together,
+    when `batch_size' events are pending or after `batch_delay' seconds.
+    Pending 'progress' events are replaced by newer ones for the same
+    component action. Component states are recorded when the event is
+    received, not when the batch is sent.
     """
 
+    def __init__(self, batch_size=0, batch_delay=0.1):
+        EventHandler.__init__(self)
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+        self._events = []
+        # (action name, element) -> index in _events of a 'progress' event
+        self._progress = {}
+        self._timer = None
+
     def event_callback(self, evtype, **kwargs):
         """Convert each event it receives into an encoded line on stdout."""
         # For distant message, we do not need to send the node. It will
         # be extract from the incoming server name.
         if 'node' in kwargs:
             del kwargs['node']
-        msg = shine_msg_pack(evtype=evtype, **kwargs)
+
+        if self.batch_size <= 1:
+            self._write(shine_msg_pack(evtype=evtype, **kwargs))
+            return
+
+        kwargs['evtype'] = evtype
+        info = kwargs.get('info')
+        kwargs = shine_event_compact(kwargs)
+        if info is not None:
+            key = (info.actname, id(info.elem))
+            if kwargs.get('status') == 'progress':
+                # Superseded progress event is replaced
+                if key in self._progress:
+                    self._events[self._progress[key]] = kwargs
+                    return
+                self._progress[key] = len(self._events)
+            else:
+                self._progress.pop(key, None)
+        self._events.append(kwargs)
+
+        if len(self._events) >= self.batch_size:
+            self.flush()
+        elif self._timer is None:
+            # Not autoclosed: the running task waits for this batch to be
+            # sent before ending.
+            self._timer = task_self().timer(self.batch_delay, handler=self)
+
+    def ev_timer(self, timer):
+        """Batch window is over, send pending events."""
+        self._timer = None
+        self.flush()
+
+    def post(self, fs):
+        """A file system was processed, send its pending events."""
+        self.flush()
+
+    def flush(self):
+        """Send all pending events in one message."""
+        if self._timer is not None:
+            self._timer.invalidate()
+            self._timer = None
+        if self._events:
+            self._write(shine_msg_pack_batch(self._events))
+            self._events = []
+            self._progress = {}
+
+    def _write(self, msg):
+        """Write an encoded message on stdout."""
         sys.stdout.write(msg)
         sys.stdout.flush()
@@ -67,7 +67,9 @@ class Execute(FSLiveCommand):
 
         return FSLiveCommand.execute(self)
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    PARALLEL_FS = True
+
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
 
         # Warn if trying to act on wrong nodes
         all_nodes = fs.components.managed().servers()
@@ -78,11 +80,13 @@ class Execute(FSLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        fs_result = fs.execute(failover=self.options.failover,
-                               addopts=self.options.additional,
-                               fanout=self.options.fanout,
-                               dryrun=self.options.dryrun,
-                               mountdata=self.options.mountdata)
+        return ('execute', dict(failover=self.options.failover,
+                                addopts=self.options.additional,
+                                fanout=self.options.fanout,
+                                dryrun=self.options.dryrun,
+                                mountdata=self.options.mountdata))
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, fs_result):
 
         rc = self.fs_status_to_rc(fs_result)
 
@@ -58,7 +58,9 @@ class Mount(FSLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    PARALLEL_FS = True
+
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
 
         # Warn if trying to act on wrong nodes
         comps = fs.components.managed(supports='mount')
@@ -69,16 +71,20 @@ class Mount(FSLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        status = fs.mount(addopts=self.options.additional,
-                          fanout=self.options.fanout,
-                          dryrun=self.options.dryrun,
-                          tunings=Tune.get_tuning(fs_conf, fs.components))
+        tunings = Tune.get_tuning(fs_conf, fs.components)
+        return ('mount', dict(addopts=self.options.additional,
+                              fanout=self.options.fanout,
+                              dryrun=self.options.dryrun,
+                              tunings=tunings))
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, status):
 
         rc = self.fs_status_to_rc(status)
 
         if not self.options.remote:
             if rc == RC_OK:
                 if vlevel > 0:
+                    comps = fs.components.managed(supports='mount')
                     key = lambda c: c.state == MOUNTED
                     print "%s was successfully mounted on %s" % \
                         (fs.fs_name, comps.filter(key=key).servers())
@@ -26,6 +26,8 @@ of the filesystem targets on local or remote servers. It is available
 for any filesystems previously installed and formatted.
 """
 
+from Shine.Configuration.Globals import Globals
+
 from Shine.Commands.Tune import Tune
 
 # Command base class
@@ -92,7 +94,8 @@ class Start(FSLiveCommand):
                           fanout=self.options.fanout,
                           dryrun=self.options.dryrun,
                           mountdata=self.options.mountdata,
-                          tunings=Tune.get_tuning(fs_conf, fs.components))
+                          tunings=Tune.get_tuning(fs_conf, fs.components),
+                          pipeline=Globals().get('start_pipeline'))
 
         rc = self.fs_status_to_rc(status)
 
@@ -28,6 +28,13 @@ of the filesystem, or if needed, to enquire about filesystem components
 detailed states.
 """
 
+import sys
+import datetime
+
+from ClusterShell.Event import EventHandler
+from ClusterShell.NodeSet import NodeSet
+from ClusterShell.Task import task_self
+
 # Command base class
 from Shine.Commands.Base.FSLiveCommand import FSLiveCommand
 from Shine.Commands.Base.CommandRCDefs import RC_ST_OFFLINE, RC_ST_EXTERNAL, \
@@ -41,10 +48,57 @@ from Shine.Commands.Base.FSEventHandler import FSGlobalEventHandler, \
                                                FSLocalEventHandler
 from Shine.Lustre.FileSystem import MOUNTED, RECOVERING, EXTERNAL, OFFLINE, \
                                     TARGET_ERROR, CLIENT_ERROR, RUNTIME_ERROR, \
-                                    MIGRATED
+                                    MIGRATED, multi_status, multi_run
+from Shine.Lustre.Component import ComponentGroup
 
+from Shine.CLI.Display import status_snapshot, display_transitions
 from Shine.FSUtils import open_lustrefs
 
+
+class NodeBackoff(object):
+    """
+    Track nodes which do not answer to status polls.
+
+    A node which failed `n' polls in a row is skipped for the next 2**(n-1)
+    polls, up to MAX_SKIP.
+    """
+
+    MAX_SKIP = 8
+
+    def __init__(self):
+        self._failures = {}
+        self._skip = {}
+
+    def skipped(self):
+        """Return the set of nodes to skip for the next poll."""
+        nodes = set()
+        for node, count in self._skip.items():
+            if count > 0:
+                nodes.add(node)
+                self._skip[node] = count - 1
+        return nodes
+
+    def update(self, polled, failed):
+        """
+        Record the result of a poll on `polled' nodes, where `failed' ones
+        did not answer.
+
+        Return the sorted list of nodes which just started failing.
+        """
+        newly = []
+        for node in polled:
+            if node in failed:
+                count = self._failures.get(node, 0) + 1
+                self._failures[node] = count
+                self._skip[node] = min(2 ** (count - 1), self.MAX_SKIP)
+                if count == 1:
+                    newly.append(node)
+            else:
+                self._failures.pop(node, None)
+                self._skip.pop(node, None)
+        return sorted(newly)
+
+
 class Status(FSLiveCommand):
     """
     shine status [-f <fsname>] [-t <target>] [-i <index(es)>] [-n <nodes>] [-qv]
@@ -66,30 +120,30 @@ class Status(FSLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
-
-        # Warn if trying to act on wrong nodes
-        all_nodes = fs.components.managed().allservers()
-        if not self.check_valid_list(fs.fs_name, all_nodes, "check"):
-            return RC_FAILURE
+    MERGE_FS = True
+    PARALLEL_FS = True
+    WATCH = True
+    MAX_AGE = True
 
-        # Apply 'status' only to required components
+    def _select_comps(self, fs):
+        """Return the components of `fs' needed by the requested view."""
         comps = fs.components
         if self.options.view.startswith("target"):
             comps = comps.filter(supports='index')
         if self.options.view.startswith("disk"):
             comps = comps.filter(supports='dev')
+        return comps
 
-        # Will call the handle_pre() method defined by the event handler.
-        if hasattr(eh, 'pre'):
-            eh.pre(fs)
-
-        fs_result = fs.status(comps,
-                              failover=self.options.failover,
-                              dryrun=self.options.dryrun,
-                              fanout=self.options.fanout,
-                              mountdata=self.options.mountdata)
+    def _status_options(self):
+        """Return the options given to FileSystem status methods."""
+        return dict(failover=self.options.failover,
+                    dryrun=self.options.dryrun,
+                    fanout=self.options.fanout,
+                    mountdata=self.options.mountdata,
+                    max_age=self.options.max_age)
 
+    def _status_result(self, fs, fs_result, eh):
+        """Display result of `fs' status and return the command rc."""
         # Display error messages for each node that failed.
         if len(fs.proxy_errors) > 0:
             self.display_proxy_errors(fs)
@@ -103,6 +157,161 @@ class Status(FSLiveCommand):
 
         return result
 
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
+
+        # Warn if trying to act on wrong nodes
+        all_nodes = fs.components.managed().allservers()
+        if not self.check_valid_list(fs.fs_name, all_nodes, "check"):
+            return RC_FAILURE
+
+        # Apply 'status' only to required components
+        comps = self._select_comps(fs)
+
+        # Will call the handle_pre() method defined by the event handler.
+        if hasattr(eh, 'pre'):
+            eh.pre(fs)
+
+        return ('status', dict(comps=comps, **self._status_options()))
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, fs_result):
+        return self._status_result(fs, fs_result, eh)
+
+    def execute_multi_fs(self, fslist, eh, vlevel):
+        result = 0
+
+        fs_comps = []
+        for fs, _ in fslist:
+            # Warn if trying to act on wrong nodes
+            all_nodes = fs.components.managed().allservers()
+            if not self.check_valid_list(fs.fs_name, all_nodes, "check"):
+                result = max(result, RC_FAILURE)
+                continue
+
+            if hasattr(eh, 'pre'):
+                eh.pre(fs)
+
+            fs_comps.append((fs, self._select_comps(fs)))
+
+        results = multi_status(fs_comps, **self._status_options())
+
+        first = True
+        for (fs, _), fs_result in zip(fs_comps, results):
+            # Separate each fsname with a blank line
+            if not first and not self.options.remote:
+                print
+            first = False
+
+            result = max(result, self._status_result(fs, fs_result, eh))
+
+        return result
+
+    def execute_watch_fs(self, fslist, eh, vlevel):
+        """
+        Poll status of all (fs, fs_conf) of `fslist' every --watch seconds,
+        until interrupted. Return the worst rc of the last status of each
+        file system.
+
+        File systems are opened only once. After the first full display,
+        only status changes are printed.
+        """
+        result = 0
+        watched = []
+        for fs, fs_conf in fslist:
+            plan = self.prepare_fs(fs, fs_conf, eh, vlevel)
+            if type(plan) is tuple:
+                watched.append(fs)
+            else:
+                print >> sys.stderr, "ERROR: Cannot watch `%s' (rc=%d)" % \
+                                     (fs.fs_name, plan)
+                result = max(result, plan)
+
+        backoff = NodeBackoff()
+        snapshots = {}
+        rcs = {}
+        try:
+            while watched:
+                self._watch_round(watched, eh, backoff, snapshots, rcs)
+                self._wait(self.options.watch)
+        except KeyboardInterrupt:
+            # Usual way to stop watching
+            pass
+        return max([result] + rcs.values())
+
+    def _watch_round(self, watched, eh, backoff, snapshots, rcs):
+        """
+        Poll status of `watched' file systems once, except on nodes skipped
+        by `backoff', and display it. The first round displays the whole
+        status, the next ones only display changes since `snapshots'.
+
+        Polled components forget their previous state first, so a node
+        which does not answer anymore shows up as a transition. Components
+        on skipped nodes keep their last state, reported as stale.
+
+        `snapshots' and `rcs' are updated with the status and the return
+        code of each polled file system.
+        """
+        first_round = not snapshots
+        skipped = NodeSet.fromlist(backoff.skipped())
+        polled = set()
+        stale = []
+        calls = []
+        for fs in watched:
+            comps = []
+            stale_comps = []
+            stale_nodes = NodeSet()
+            for comp in self._select_comps(fs).managed(supports='status'):
+                nodes = comp.allservers().nodeset()
+                left = nodes.difference(skipped)
+                if len(left) < len(nodes):
+                    stale_comps.append(comp.label)
+                    stale_nodes.update(nodes.intersection(skipped))
+                if len(left) > 0:
+                    comp.clear_state(left)
+                    polled.update(left)
+                    comps.append(comp)
+            if stale_comps:
+                stale.append((fs, stale_comps, stale_nodes))
+            if comps:
+                calls.append((fs, 'status',
+                              dict(comps=ComponentGroup(comps),
+                                   excluded=skipped,
+                                   **self._status_options())))
+
+        results = multi_run(calls)
+
+        failed = set()
+        now = datetime.datetime.now().strftime("%H:%M:%S")
+        for (fs, _, kwargs), fs_result in zip(calls, results):
+            for _, keys in fs.proxy_errors.walk():
+                failed.update(NodeSet.fromlist(keys))
+
+            if first_round:
+                rcs[fs.fs_name] = self._status_result(fs, fs_result, eh)
+            else:
+                rcs[fs.fs_name] = self.fs_status_to_rc(fs_result)
+                changes = display_transitions(self, fs,
+                                              snapshots.get(fs.fs_name, {}),
+                                              status_snapshot(fs))
+                for line in changes.splitlines():
+                    print "[%s] %s" % (now, line)
+
+            snapshots[fs.fs_name] = status_snapshot(fs)
+
+        for fs, labels, nodes in stale:
+            print "[%s] %s: stale status of %s, not polled on %s" % \
+                  (now, fs.fs_name, ", ".join(labels), nodes)
+
+        for node in backoff.update(polled, failed):
+            if not first_round:
+                print "[%s] %s is not responding, polling it less often" % \
+                      (now, node)
+
+    def _wait(self, delay):
+        """Wait for `delay' seconds using a ClusterShell timer."""
+        task = task_self()
+        task.timer(delay, handler=EventHandler())
+        task.resume()
+
     def _open_fs(self, fsname, eh):
         # Status command needs to open the filesystem in extended mode.
         # See FSUtils.instantiate_lustrefs() for the use of this argument.
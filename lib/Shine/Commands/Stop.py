@@ -61,14 +61,9 @@ class Stop(FSLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    PARALLEL_FS = True
 
-        # Prepare options...
-        mount_options = {}
-        mount_paths = {}
-        for tgt_type in [ 'mgt', 'mdt', 'ost' ]:
-            mount_options[tgt_type] = fs_conf.get_target_mount_options(tgt_type)
-            mount_paths[tgt_type] = fs_conf.get_target_mount_path(tgt_type)
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
 
         # Warn if trying to act on wrong nodes
         servers = fs.components.managed(supports='stop').servers()
@@ -79,11 +74,13 @@ class Stop(FSLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        status = fs.stop(addopts=self.options.additional,
-                         failover=self.options.failover,
-                         fanout=self.options.fanout,
-                         dryrun=self.options.dryrun,
-                         mountdata=self.options.mountdata)
+        return ('stop', dict(addopts=self.options.additional,
+                             failover=self.options.failover,
+                             fanout=self.options.fanout,
+                             dryrun=self.options.dryrun,
+                             mountdata=self.options.mountdata))
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, status):
 
         rc = self.fs_status_to_rc(status)
 
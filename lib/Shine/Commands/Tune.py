@@ -45,7 +45,7 @@ from Shine.Lustre.FileSystem import MOUNTED, RECOVERING, EXTERNAL, OFFLINE, \
 
 
 class Tune(FSLiveCommand):
-    """shine tune [-v]"""
+    """shine tune [-v] [--check]"""
 
     NAME = "tune"
     DESCRIPTION = "Tune file system servers."
@@ -53,6 +53,8 @@ class Tune(FSLiveCommand):
     GLOBAL_EH = FSGlobalEventHandler
     LOCAL_EH = FSLocalEventHandler
 
+    CHECK = True
+
     TARGET_STATUS_RC_MAP = { \
             MOUNTED : RC_OK,
             MIGRATED : RC_OK,
@@ -85,12 +87,18 @@ class Tune(FSLiveCommand):
 
         status = fs.tune(tuning, addopts=self.options.additional,
                          dryrun=self.options.dryrun,
+                         check=self.options.check,
                          fanout=self.options.fanout)
 
         rc = self.fs_status_to_rc(status)
 
-        if rc == RC_OK:
+        if rc == RC_OK and self.options.check:
+            print "Filesystem %s tuning is up to date." % fs.fs_name
+        elif rc == RC_OK:
             print "Filesystem %s successfully tuned." % fs.fs_name
+        elif self.options.check:
+            self.display_proxy_errors(fs)
+            print "Tuning of filesystem %s differs." % fs.fs_name
         else:
             self.display_proxy_errors(fs)
             print "Tuning of filesystem %s failed." % fs.fs_name
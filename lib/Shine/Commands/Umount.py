@@ -56,7 +56,9 @@ class Umount(FSLiveCommand):
             CLIENT_ERROR : RC_CLIENT_ERROR,
             RUNTIME_ERROR : RC_RUNTIME_ERROR }
 
-    def execute_fs(self, fs, fs_conf, eh, vlevel):
+    PARALLEL_FS = True
+
+    def prepare_fs(self, fs, fs_conf, eh, vlevel):
 
         # Warn if trying to act on wrong nodes
         comps = fs.components.managed(supports='umount')
@@ -67,15 +69,18 @@ class Umount(FSLiveCommand):
         if hasattr(eh, 'pre'):
             eh.pre(fs)
 
-        status = fs.umount(addopts=self.options.additional,
-                           dryrun=self.options.dryrun,
-                           fanout=self.options.fanout)
+        return ('umount', dict(addopts=self.options.additional,
+                               dryrun=self.options.dryrun,
+                               fanout=self.options.fanout))
+
+    def finish_fs(self, fs, fs_conf, eh, vlevel, status):
 
         rc = self.fs_status_to_rc(status)
 
         if not self.options.remote:
             if rc == RC_OK:
                 if vlevel > 0:
+                    comps = fs.components.managed(supports='umount')
                     key = lambda c: c.state == OFFLINE
                     print "%s was successfully unmounted on %s" % \
                         (fs.fs_name, comps.filter(key=key).servers())
@@ -24,9 +24,48 @@
 # List of enabled commands classes.
 # ----------------------------------------------------------------------
 
-COMMAND_LIST = {}
+class CommandRegistry(object):
+    """
+    Map command names to command classes.
 
-for cmd in [ "Show",
+    Each command module is only imported when its class is first looked up,
+    so running one command does not load the modules of all the others.
+    """
+
+    def __init__(self, modules):
+        # Command name -> module name
+        self._modules = modules
+        self._classes = {}
+
+    def __contains__(self, name):
+        return name in self._modules
+
+    def __iter__(self):
+        return iter(self._modules)
+
+    def __len__(self):
+        return len(self._modules)
+
+    def __getitem__(self, name):
+        if name not in self._classes:
+            modname = self._modules[name]
+            # Import command class file
+            mod = __import__(modname, globals(), locals(), [modname])
+            cls = getattr(mod, modname)
+            assert cls.NAME == name, "%s declares %s" % (modname, cls.NAME)
+            self._classes[name] = cls
+        return self._classes[name]
+
+    def keys(self):
+        return self._modules.keys()
+
+    def loaded(self):
+        """Return the names of the commands already imported."""
+        return self._classes.keys()
+
+
+COMMAND_LIST = CommandRegistry(dict([(cmd.lower(), cmd) for cmd in [
+             "Show",
              "Config",
              "List",
              "Install",
@@ -41,11 +80,5 @@ for cmd in [ "Show",
              "Umount",
              "Tune",
              "Tunefs",
-             "Execute"]:
-
-    # Import command class file
-    mod = __import__(cmd, globals(), locals(), [cmd])
-
-    # Add class to global command list
-    cls = getattr(mod, cmd)
-    COMMAND_LIST[cls.NAME] = cls
+             "Execute",
+             "Agent"]]))
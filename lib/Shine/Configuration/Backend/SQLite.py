@@ -0,0 +1,268 @@
+# SQLite.py -- SQLite backend module
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+"""
+SQLite backend.
+
+Storage devices are kept in a local SQLite database, with their file system
+assignment and status. Device definitions are imported from the File backend
+`storage_file', each time it changes, so assignments survive edits of this
+file.
+"""
+
+import os
+import sqlite3
+
+from Shine.Configuration.Backend.Backend import Backend
+from Shine.Configuration.Backend.File import Storage
+from Shine.Configuration.Globals import Globals
+from Shine.Configuration.TargetDevice import TargetDevice
+
+BACKEND_MODNAME = "SQLite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fs (
+    name        TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS device (
+    id          INTEGER PRIMARY KEY,
+    type        TEXT NOT NULL,
+    node        TEXT NOT NULL,
+    dev         TEXT NOT NULL,
+    tag         TEXT,
+    ha_node     TEXT,
+    size        INTEGER,
+    jdev        TEXT,
+    jsize       INTEGER,
+    fs_name     TEXT REFERENCES fs (name),
+    tgt_index   INTEGER,
+    status      INTEGER NOT NULL,
+    UNIQUE (type, node, dev)
+);
+CREATE INDEX IF NOT EXISTS device_fs ON device (type, fs_name);
+CREATE TABLE IF NOT EXISTS source (
+    path        TEXT PRIMARY KEY,
+    mtime       REAL NOT NULL,
+    size        INTEGER NOT NULL
+);
+"""
+
+# Device columns, as named in storage file and TargetDevice.
+_DEVICE_KEYS = ('node', 'dev', 'tag', 'ha_node', 'size', 'jdev', 'jsize')
+
+
+class SQLite(Backend):
+
+    def __init__(self):
+        Backend.__init__(self)
+        self._db = None
+
+    def get_name(self):
+        return "SQLite"
+
+    def get_desc(self):
+        return "SQLite Backend System."
+
+    def start(self):
+        if self._db:
+            return
+
+        db_path = Globals().get_storage_db()
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+
+        self._db = sqlite3.connect(db_path)
+        self._db.text_factory = str
+        self._db.executescript(_SCHEMA)
+        self._sync_storage(Globals().get_storage_file())
+
+    def stop(self):
+        if self._db:
+            self._db.close()
+            self._db = None
+
+    def _commit(self, statements):
+        """
+        Run all (sql, args) `statements' in a single transaction.
+
+        Return the number of rows modified by the last statement.
+        """
+        cursor = self._db.cursor()
+        try:
+            for sql, args in statements:
+                cursor.execute(sql, args)
+            self._db.commit()
+        except:
+            self._db.rollback()
+            raise
+        return cursor.rowcount
+
+    def _sync_storage(self, path):
+        """
+        Import devices from storage file `path' if it changed since last time.
+
+        Known devices are updated in place and keep their assignment.
+        Unassigned devices which are no more declared are removed.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # No storage file, devices are only managed in the database.
+            return
+
+        cursor = self._db.cursor()
+        cursor.execute("SELECT mtime, size FROM source WHERE path = ?",
+                       (path,))
+        if cursor.fetchone() == (stat.st_mtime, stat.st_size):
+            return
+
+        storage = Storage()
+        storage.load(path)
+
+        known = {}
+        cursor.execute("SELECT id, type, node, dev FROM device")
+        for devid, tgt_type, node, dev in cursor.fetchall():
+            known[(tgt_type, node, dev)] = devid
+
+        statements = []
+        for tgt_type in ('mgt', 'mdt', 'ost'):
+            for dic in storage.elements(tgt_type).as_dict():
+                values = self._device_values(dic)
+                devid = known.pop((tgt_type, values[0], values[1]), None)
+                if devid is None:
+                    statements.append(("INSERT INTO device (type, %s, status) "
+                                       "VALUES (?, %s, ?)" %
+                                       (", ".join(_DEVICE_KEYS),
+                                        ", ".join("?" * len(_DEVICE_KEYS))),
+                                       (tgt_type,) + values +
+                                       (self.TARGET_AVAILABLE,)))
+                else:
+                    statements.append(("UPDATE device SET %s WHERE id = ?" %
+                                       ", ".join(["%s = ?" % key
+                                                  for key in _DEVICE_KEYS]),
+                                       values + (devid,)))
+
+        for devid in known.values():
+            statements.append(("DELETE FROM device "
+                               "WHERE id = ? AND fs_name IS NULL", (devid,)))
+
+        statements.append(("INSERT OR REPLACE INTO source (path, mtime, size) "
+                           "VALUES (?, ?, ?)",
+                           (path, stat.st_mtime, stat.st_size)))
+        self._commit(statements)
+
+    def _device_values(self, dic):
+        """Convert a storage file device dict to device column values."""
+        values = []
+        for key in _DEVICE_KEYS:
+            value = dic.get(key)
+            if key == 'ha_node' and value is not None:
+                value = " ".join(value)
+            elif key == 'node' and value is None:
+                value = ''
+            values.append(value)
+        return tuple(values)
+
+    def get_target_devices(self, target, fs_name=None, update_mode=False):
+        """
+        Get available target storage devices.
+
+        In update mode, devices already used by `fs_name' are also returned,
+        with their target index.
+        """
+        sql = "SELECT %s, fs_name, tgt_index FROM device WHERE type = ? AND " \
+                % ", ".join(_DEVICE_KEYS)
+        if update_mode and fs_name:
+            sql += "(fs_name IS NULL OR fs_name = ?)"
+            args = (target, fs_name)
+        else:
+            sql += "fs_name IS NULL"
+            args = (target,)
+
+        devices = []
+        for row in self._db.execute(sql + " ORDER BY node, dev", args):
+            dic = {}
+            for key, value in zip(_DEVICE_KEYS, row):
+                if value is None or value == '':
+                    continue
+                if key == 'ha_node':
+                    value = value.split()
+                dic[key] = value
+            dev_fs, tgt_index = row[-2:]
+            if dev_fs == fs_name and tgt_index is not None:
+                dic['index'] = tgt_index
+            devices.append(TargetDevice(target, dic))
+        return devices
+
+    def register_fs(self, fs):
+        """
+        This function is used to register a a filesystem configuration to the backend
+        """
+        self._commit([("INSERT OR IGNORE INTO fs (name) VALUES (?)",
+                       (fs.fs_name,))])
+        return 0
+
+    def unregister_fs(self, fs):
+        """
+        This function is used to remove a filesystem configuration to the backend
+        """
+        self._commit([("UPDATE device SET fs_name = NULL, tgt_index = NULL, "
+                       "status = ? WHERE fs_name = ?",
+                       (self.TARGET_AVAILABLE, fs.fs_name)),
+                      ("DELETE FROM fs WHERE name = ?", (fs.fs_name,))])
+        return 0
+
+    def register_target(self, fs, target):
+        """
+        Set the specified `target', used by `fs', as 'in use' in the backend.
+
+        This target could not be use anymore for other filesystems.
+
+        Return 1 if the device is unknown or already used by another
+        filesystem.
+        """
+        count = self._commit([
+                    ("INSERT OR IGNORE INTO fs (name) VALUES (?)",
+                     (fs.fs_name,)),
+                    ("UPDATE device SET fs_name = ?, tgt_index = ?, "
+                     "status = ? WHERE type = ? AND node = ? AND dev = ? "
+                     "AND (fs_name IS NULL OR fs_name = ?)",
+                     (fs.fs_name, target.get_index(), self.TARGET_UNKNOWN,
+                      target.get_type().lower(), target.get_nodename() or '',
+                      target.get_dev(), fs.fs_name))])
+        if count == 0:
+            return 1
+        return 0
+
+    def unregister_target(self, fs, target):
+        """
+        Set the specified `target', used by `fs', as available in the backend.
+
+        This target could be now reuse, for other targets of the same
+        filesystem or any other one.
+        """
+        self._commit([("UPDATE device SET fs_name = NULL, tgt_index = NULL, "
+                       "status = ? WHERE type = ? AND node = ? AND dev = ? "
+                       "AND fs_name = ?",
+                       (self.TARGET_AVAILABLE, target.get_type().lower(),
+                        target.get_nodename() or '', target.get_dev(),
+                        fs.fs_name))])
+        return 0
@@ -130,6 +130,22 @@ class Configuration:
             opts = clnt.get_mount_options() or self.get_default_mount_options()
             yield clnt.get_nodes(), path, opts
 
+    def iter_client_sets(self):
+        """
+        Iterate over (nodes, mount_path, mount_options), nodes being the
+        NodeSet of all clients with this mount path and these mount options.
+        """
+        order = []
+        nodes = {}
+        for node, path, opts in self.iter_clients():
+            if (path, opts) not in nodes:
+                order.append((path, opts))
+                nodes[(path, opts)] = []
+            nodes[(path, opts)].append(node)
+
+        for path, opts in order:
+            yield NodeSet.fromlist(nodes[(path, opts)]), path, opts
+
     def iter_routers(self):
         """
         Iterate over (node)
@@ -20,9 +20,15 @@
 
 import copy
 import os
+import sys
+import tempfile
+import cPickle
+from hashlib import md5
 
+from Shine import __version__
 from Shine.Configuration.Globals import Globals
-from Shine.Configuration.Model import Model
+from Shine.Configuration.Model import Model, CandidateSet
+from Shine.Configuration.ModelFile import ModelFile
 from Shine.Configuration.Exceptions import ConfigInvalidFileSystem, \
                                            ConfigDeviceNotFoundError, \
                                            ConfigException
@@ -33,6 +39,136 @@ from Shine.Configuration.Backend.BackendRegistry import BackendRegistry
 class ModelFileIOError(ConfigException):
     """Malformed or unfound model file or XML file."""
 
+# Compiled model files are saved next to the model file, with this suffix.
+COMPILED_SUFFIX = '.cache'
+# Increase it when Model content changes.
+COMPILED_VERSION = 1
+
+# See _compiled_key()
+_COMPILED_KEY = None
+
+def _compiled_key():
+    """
+    Return what identifies the code of compiled models: COMPILED_VERSION,
+    shine version and a digest of the modules defining model classes, so
+    compiled models of another shine are not used.
+    """
+    global _COMPILED_KEY
+    if _COMPILED_KEY is None:
+        digest = md5()
+        for cls in (Model, ModelFile):
+            path = sys.modules[cls.__module__].__file__
+            if path[-4:] in ('.pyc', '.pyo') and os.path.exists(path[:-1]):
+                path = path[:-1]
+            try:
+                modfile = open(path, 'rb')
+                try:
+                    digest.update(modfile.read())
+                finally:
+                    modfile.close()
+            except IOError:
+                digest.update(path)
+        _COMPILED_KEY = (COMPILED_VERSION, __version__, digest.hexdigest())
+    return _COMPILED_KEY
+
+def _load_compiled(filename):
+    """
+    Return a Model loaded from `filename', using its compiled version if it
+    is up to date.
+
+    Compiled version is valid if it was written by the same shine code (see
+    _compiled_key()) and if model file mtime and size did not change or, if
+    they did, if its content hash is the same. Otherwise, `filename' is
+    parsed and compiled version is updated.
+    """
+    try:
+        info = os.stat(filename)
+    except OSError, error:
+        raise IOError(str(error))
+
+    cachepath = filename + COMPILED_SUFFIX
+    cached = None
+    try:
+        fcache = open(cachepath, 'rb')
+        try:
+            # Only trust a file written by the model file owner
+            if os.fstat(fcache.fileno()).st_uid == info.st_uid:
+                cached = cPickle.load(fcache)
+        finally:
+            fcache.close()
+    except Exception:
+        # Missing or unreadable compiled file, just ignore it
+        cached = None
+
+    if not isinstance(cached, dict) or \
+       cached.get('version') != _compiled_key() or \
+       not isinstance(cached.get('model'), Model):
+        cached = None
+    elif (cached['mtime'], cached['size']) == (info.st_mtime, info.st_size):
+        return cached['model']
+
+    modelfd = open(filename)
+    try:
+        data = modelfd.read()
+    finally:
+        modelfd.close()
+    digest = md5(data).hexdigest()
+
+    if cached is not None and cached['digest'] == digest:
+        model = cached['model']
+    else:
+        model = Model()
+        model.parse_lines(data.splitlines(), filename)
+
+    cached = {'version': _compiled_key(), 'mtime': info.st_mtime,
+              'size': info.st_size, 'digest': digest, 'model': model}
+    try:
+        fd, tmppath = tempfile.mkstemp(prefix='.%s.' % \
+                                              os.path.basename(filename),
+                                       dir=os.path.dirname(cachepath))
+        try:
+            fcache = os.fdopen(fd, 'wb')
+            try:
+                cPickle.dump(cached, fcache, cPickle.HIGHEST_PROTOCOL)
+            finally:
+                fcache.close()
+            os.rename(tmppath, cachepath)
+        except:
+            os.unlink(tmppath)
+            raise
+    except (IOError, OSError):
+        # Compiled version is only an optimization
+        pass
+
+    return model
+
+class _IndexAllocator(object):
+    """
+    Track used target indexes and allocate the lowest free one.
+
+    Indexes are never released, so the lowest free index only increases and
+    all operations are O(1) amortized.
+    """
+
+    def __init__(self, size):
+        self._size = size
+        self._used = set()
+        self._lowest = 0
+
+    def first(self):
+        """Return the lowest free index."""
+        while self._lowest in self._used:
+            self._lowest += 1
+        if self._lowest >= self._size:
+            raise IndexError("no more free index")
+        return self._lowest
+
+    def take(self, idx):
+        """Mark `idx' as used. Raise KeyError if it is not free."""
+        if idx in self._used or not 0 <= idx < self._size:
+            raise KeyError(idx)
+        self._used.add(idx)
+
 class Target:
     def __init__(self, type, cf_target):
         self.type = type
@@ -137,14 +273,22 @@ class FileSystem(object):
     Lustre File System Configuration class.
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, compiled=False):
+        """
+        Load filesystem configuration from model file `filename'.
+
+        If `compiled' is set, model file compiled version is used if possible.
+        """
 
         self.backend = None
         self.xmf_path = None
         self.model = Model()
 
         try:
-            self.model.load(filename)
+            if compiled:
+                self.model = _load_compiled(filename)
+            else:
+                self.model.load(filename)
         except IOError:
             raise ModelFileIOError("Could not read %s" % filename)
 
@@ -193,7 +337,7 @@ class FileSystem(object):
     def load_from_fsname(cls, fsname):
         """Load from cache."""
         conf_file = cls._cache_path(fsname)
-        fsconf = FileSystem(conf_file)
+        fsconf = FileSystem(conf_file, compiled=True)
         fsconf.xmf_path = conf_file
         return fsconf
 
@@ -224,7 +368,7 @@ class FileSystem(object):
                 continue
 
             # Lustre supports up to FFFF targets per type.
-            indexes = range(0, 65535)
+            indexes = _IndexAllocator(65535)
 
             if self.backend:
 
@@ -243,6 +387,7 @@ class FileSystem(object):
                 # be enough for sorting. This is not perfect but enough to have
                 # a very low entropy in result order.
                 candidates.sort(key=lambda x: (x.get('node'), x.get('dev')))
+                candidates = CandidateSet(candidates)
 
                 # Delete it (to be replaced... see below)
                 self.model.elements(target).clear()
@@ -252,12 +397,17 @@ class FileSystem(object):
                     # Remove already used index from candidate list.
                     for target_model in target_models:
                         if 'index' in target_model:
-                            idx = target_model.get('index')
-                            # List raises ValueError and we need to know the
-                            # missing indexes here, so we had this hack.
-                            if idx not in indexes:
-                                raise KeyError(idx)
-                            indexes.remove(idx)
+                            indexes.take(target_model.get('index'))
+
+                    # Devices already used by this filesystem keep their
+                    # index (update mode), new ones should not take it.
+                    for candidate in candidates:
+                        if candidate.has_index():
+                            try:
+                                indexes.take(candidate.index())
+                            except KeyError:
+                                # Already set in the model
+                                pass
 
                     # Iterates on each Model.Target
                     for target_model in target_models:
@@ -281,14 +431,8 @@ class FileSystem(object):
 
                             # Manage index, mandatoy in XMF files
                             if not matching.has_index():
-                                matching.add_index(indexes[0])
-                                idx = matching.index()
-                                # List raises ValueError and we need to know
-                                # the missing indexes here, so we had this
-                                # hack.
-                                if idx not in indexes:
-                                    raise KeyError(idx)
-                                indexes.remove(idx)
+                                matching.add_index(indexes.first())
+                                indexes.take(matching.index())
 
                             # Copy properties from model
                             # which do not exist in backend.
@@ -316,18 +460,14 @@ class FileSystem(object):
                     # Remove already used indexes from candidate list.
                     for params in self.model.elements(target):
                         if 'index' in params:
-                            idx = params.get('index')
-                            # List raises ValueError and we need to know the
-                            # missing indexes here, so we had this hack.
-                            if idx not in indexes:
-                                raise KeyError(idx)
-                            indexes.remove(idx)
+                            indexes.take(params.get('index'))
 
                     # Manage index
                     for params in self.model.elements(target):
                         if 'index' not in params:
-                            params.add('index', str(indexes[0]))
-                            indexes.remove(indexes[0])
+                            idx = indexes.first()
+                            params.add('index', str(idx))
+                            indexes.take(idx)
 
                 except KeyError, error:
                     raise ConfigInvalidFileSystem(self, \
@@ -518,6 +658,8 @@ class FileSystem(object):
 
         if not result:
             os.unlink(self.xmf_path)
+            if os.path.exists(self.xmf_path + COMPILED_SUFFIX):
+                os.unlink(self.xmf_path + COMPILED_SUFFIX)
 
         return result
 
@@ -46,6 +46,12 @@ class Globals(object):
                 Globals.__instance.load(cls.DEFAULT_CONF_FILE)
         return Globals.__instance
 
+    @classmethod
+    def reset(cls):
+        """Forget all settings, the configuration file is read again on
+        next use."""
+        Globals.__instance = None
+
     def __getattr__(self, attr):
         return getattr(self.__instance, attr)
 
@@ -60,9 +66,11 @@ class Globals(object):
 
             # Backend stuff
             self.add_element('backend',             check='enum',
-                    default='None', values=['ClusterDB', 'File', 'None'])
+                    default='None', values=['ClusterDB', 'File', 'SQLite', 'None'])
             self.add_element('storage_file',        check='path',
                     default='/etc/shine/storage.conf')
+            self.add_element('storage_db',          check='path',
+                    default='/var/cache/shine/storage.db')
             self.add_element('status_dir',          check='path',
                     default='/var/cache/shine/status')
 
@@ -81,8 +89,33 @@ class Globals(object):
             self.add_element('default_timeout',     check='digit',
                     default=30)
 
+            # Proxy events batching (delay in milliseconds)
+            self.add_element('proxy_batch_size',    check='digit',
+                    default=0)
+            self.add_element('proxy_batch_delay',   check='digit',
+                    default=100)
+
             # Commands
             self.add_element('command_path',        check='path')
+            self.add_element('native_mountdata',    check='boolean',
+                    default=False)
+
+            # Start targets as soon as the components they need are started
+            self.add_element('start_pipeline',      check='boolean',
+                    default=False)
+
+            # Targets formatted at once on each storage controller (0: all)
+            self.add_element('format_per_controller', check='digit',
+                    default=0)
+
+            # Manage client nodes with the same mount as one component
+            self.add_element('client_set_size',     check='digit',
+                    default=0)
+
+            # Persistent agent
+            self.add_element('agent_socket',        check='path')
+            self.add_element('agent_python',        check='path',
+                    default='/usr/bin/python')
 
             # Lustre version
             self.add_element('lustre_version',      check='string')
@@ -126,6 +159,9 @@ class Globals(object):
         def get_storage_file(self):
             return self.get('storage_file')
 
+        def get_storage_db(self):
+            return self.get('storage_db')
+
         def get_status_dir(self):
             return self.get('status_dir')
 
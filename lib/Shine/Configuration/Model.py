@@ -141,41 +141,60 @@ class Target(ModelFile):
         """
         Filter the `candidates` list with only those who shared the same key,
         value pairs.
+
+        `candidates' could be a list or a CandidateSet. For the latter, only
+        candidates with the same node or tag are considered, if this target
+        defines them without any regexp.
         """
+        patterns = self.as_dict()
+        # Index and active have a special meaning and should not be considered
+        patterns.pop('index', None)
+        patterns.pop('active', None)
+
+        if isinstance(candidates, CandidateSet):
+            for key in CandidateSet.INDEXED_KEYS:
+                value = patterns.get(key)
+                if type(value) is str and _is_literal(value):
+                    candidates = candidates.bucket(key, value)
+                    break
+
+        # Each pattern is compiled once, when first needed
+        compiled = {}
+        def matches(pattern, value):
+            """Return True if `value' fully matches regexp `pattern'."""
+            if pattern not in compiled:
+                try:
+                    compiled[pattern] = re.compile('^' + pattern + '$')
+                except re.error:
+                    raise ModelFileValueError("Bad syntax: %s" % pattern)
+            return compiled[pattern].match(value) is not None
+
         matching = []
 
         # For each possible targets
         for target in candidates:
 
             # Verify my keys match its attributes
-            for key, regexp in self.as_dict().iteritems():
-                # Index and active have a special meaning
-                # and should not be considered
-                if key in ('index', 'active'):
-                    continue
+            for key, regexp in patterns.iteritems():
                 # Key is missing, this does not match
                 if key not in target:
                     break
 
-                try:
-                    # If this is a list
-                    if type(regexp) is list:
-                        bknds = target.get(key)
-                        # If there's more criteria in model, it does not match
-                        if len(regexp) > len(bknds):
-                            break
-                        # Match each criteria with its equivalent in backend
-                        # definition. Break at first that differs.
-                        if [True for bk, rgexp in zip(bknds, regexp)
-                                      if not re.match('^' + rgexp + '$', bk)]:
-                            break
-
-                    # Or a simple element
-                    elif not re.match('^' + regexp + '$', target.get(key)):
+                # If this is a list
+                if type(regexp) is list:
+                    bknds = target.get(key)
+                    # If there's more criteria in model, it does not match
+                    if len(regexp) > len(bknds):
+                        break
+                    # Match each criteria with its equivalent in backend
+                    # definition. Break at first that differs.
+                    if [True for bk, rgexp in zip(bknds, regexp)
+                                  if not matches(rgexp, bk)]:
                         break
 
-                except re.error:
-                    raise ModelFileValueError("Bad syntax: %s" % regexp)
+                # Or a simple element
+                elif not matches(regexp, target.get(key)):
+                    break
 
             # Ok, everything matches, add it
             else:
@@ -183,6 +202,60 @@ class Target(ModelFile):
 
         return matching
 
+
+# Characters with a special meaning in regexps
+_REGEXP_CHARS = frozenset('.^$*+?{}[]\\|()')
+
+def _is_literal(pattern):
+    """Return True if regexp `pattern' only matches itself."""
+    return not _REGEXP_CHARS.intersection(pattern)
+
+
+class CandidateSet(object):
+    """
+    Ordered set of backend devices, used by Target.match_device().
+
+    Devices are indexed by node and tag, so matching them against a target
+    with a literal node or tag does not need to look at all devices. Removal
+    is O(1).
+    """
+
+    INDEXED_KEYS = ('node', 'tag')
+
+    def __init__(self, devices):
+        self._devices = list(devices)
+        self._positions = {}
+        self._removed = set()
+        self._buckets = {}
+        for pos, device in enumerate(self._devices):
+            self._positions[id(device)] = pos
+            for key in self.INDEXED_KEYS:
+                value = device.get(key)
+                if type(value) is str:
+                    bucket = self._buckets.setdefault((key, value), [])
+                    bucket.append(pos)
+
+    def __len__(self):
+        return len(self._devices) - len(self._removed)
+
+    def __iter__(self):
+        for pos, device in enumerate(self._devices):
+            if pos not in self._removed:
+                yield device
+
+    def bucket(self, key, value):
+        """Iterate over devices whose `key' is `value', in order."""
+        for pos in self._buckets.get((key, value), []):
+            if pos not in self._removed:
+                yield self._devices[pos]
+
+    def remove(self, device):
+        """Remove `device' from the set."""
+        pos = self._positions.get(id(device))
+        if pos is None or pos in self._removed:
+            raise ValueError("device not in set")
+        self._removed.add(pos)
+
 class Router(ModelFile):
     """Define 'router' in model file: nodes=<NODES>"""
 
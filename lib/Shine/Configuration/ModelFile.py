@@ -693,7 +693,16 @@ class ModelFile(object):
     def load(self, filename):
         """Fill a model file using data from file pointed by filename."""
         modelfd = open(filename)
-        for nbr, line in enumerate(modelfd):
+        self.parse_lines(modelfd, filename)
+        modelfd.close()
+
+    def parse_lines(self, lines, filename):
+        """
+        Fill a model file using `lines' read from `filename'.
+
+        `filename' is only used for error messages.
+        """
+        for nbr, line in enumerate(lines):
             # Remove comments and blank lines
             line = line.split('#', 1)[0].strip()
             if line:
@@ -702,7 +711,6 @@ class ModelFile(object):
                 except ModelFileValueError, error:
                     raise ModelFileValueError("%s at %s:%d" % \
                                                 (error, filename, nbr + 1))
-        modelfd.close()
 
     def save(self, filename, header=None):
         """Write model file content to specified file.
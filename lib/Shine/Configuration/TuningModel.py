@@ -37,6 +37,59 @@ TYPE_ALIASES = {
     'rtr': 'router',
 }
 
+def _name_prefix(name):
+    """
+    Return the leading part of a node name or node set string, up to the
+    first digit or range. Nodes and node sets containing them share it.
+    """
+    return re.match(r'[^0-9\[]*', str(name)).group(0)
+
+def _shell_words(text):
+    """
+    Split `text' in words as sh does, removing quotes and backslashes.
+    Variables and commands are not expanded.
+
+    Raise ValueError if a quote is not closed.
+    """
+    words = []
+    word = None
+    pos = 0
+    while pos < len(text):
+        char = text[pos]
+        pos += 1
+        if char.isspace():
+            if word is not None:
+                words.append(word)
+                word = None
+            continue
+        if word is None:
+            word = ''
+        if char == '\\' and pos < len(text):
+            word += text[pos]
+            pos += 1
+        elif char == "'":
+            end = text.find("'", pos)
+            if end < 0:
+                raise ValueError("No closing quotation")
+            word += text[pos:end]
+            pos = end + 1
+        elif char == '"':
+            while pos < len(text) and text[pos] != '"':
+                if text[pos] == '\\' and pos + 1 < len(text) and \
+                   text[pos + 1] in '$`"\\':
+                    pos += 1
+                word += text[pos]
+                pos += 1
+            if pos >= len(text):
+                raise ValueError("No closing quotation")
+            pos += 1
+        else:
+            word += char
+    if word is not None:
+        words.append(word)
+    return words
+
+
 class TuningError(ConfigException):
     """
     Tuning model Error.
@@ -87,9 +140,9 @@ class TuningParameter(object):
             output += " nodes=%s" % self.node_list
         return output
         
-    def build_tuning_command(self, fs_name):
+    def tuning_paths(self, fs_name):
         """
-        This function aims to apply the tuning parameter to the local node
+        Return the list of local files this tuning parameter applies to.
         """
         path_pattern = self.name
         
@@ -101,9 +154,26 @@ class TuningParameter(object):
         path_pattern = path_pattern.replace("${mdt}", "%s-MDT" % fs_name)
         path_pattern = path_pattern.replace("${fsname}", "%s" % fs_name)
                     
+        return glob.glob(path_pattern)
+
+    def written_value(self):
+        """
+        Return the value really written by the tuning command, as the shell
+        used to write it with 'echo -n value': quotes and backslashes are
+        interpreted as by sh, and words are joined by a single space.
+
+        Variables and commands are not expanded, and echo options or
+        escapes (sh without xpg_echo) are not interpreted.
+        """
+        return ' '.join(_shell_words(str(self.value)))
+
+    def build_tuning_command(self, fs_name):
+        """
+        This function aims to apply the tuning parameter to the local node
+        """
         # Walk through path list and create a command for each one
         command_list = []
-        for path in glob.glob(path_pattern):
+        for path in self.tuning_paths(fs_name):
             command_list.append("echo -n %s > %s" % (self.value, path))
 
         # Return the newly created commands to the caller
@@ -130,6 +200,7 @@ class TuningModel(object):
         self.filename = filename
         self.aliases = {}
         self._parameter_dict = {}
+        self._index = None
 
     def convert_parameter_aliases(self, check=True):
         """
@@ -179,6 +250,14 @@ class TuningModel(object):
                                                 m_alias.group(2))
 
                 elif m_param:
+                    # Value is written as the shell would do, see
+                    # TuningParameter.written_value().
+                    try:
+                        _shell_words(m_param.group(1))
+                    except ValueError, error:
+                        raise TuningError("Wrong tuning value '%s': %s" %
+                                          (m_param.group(1), error))
+
                     # This line is a parameter instanciation
                     nodes = NodeSet.fromlist(
                                            m_param.group(3).lower().split(';'))
@@ -197,6 +276,8 @@ class TuningModel(object):
 
         # Call the alias to full name convertion function
         self.convert_parameter_aliases()
+
+        self._build_index()
         
     def __str__(self):
         """
@@ -215,37 +296,53 @@ class TuningModel(object):
             
         return msg
     
+    def _build_index(self):
+        """
+        Index tuning parameters by node type and by node name prefix.
+
+        Each parameter is also numbered, so lookups return parameters in the
+        same order whatever index matched them.
+        """
+        by_type = {}
+        by_prefix = {}
+        position = {}
+        for parameters in self._parameter_dict.values():
+            for parameter in parameters:
+                position[id(parameter)] = len(position)
+                for node_type in parameter.node_types:
+                    by_type.setdefault(node_type, []).append(parameter)
+                prefixes = set([_name_prefix(nodes) for nodes
+                                in parameter.node_list.contiguous()])
+                for prefix in prefixes:
+                    by_prefix.setdefault(prefix, []).append(parameter)
+        self._index = (by_type, by_prefix, position)
+
     def get_params_for_name(self, node_name, node_type):
         """
         This function returns a list of tuning parameters that must be applied :
             -  to the node named <node_named>
             -  to the node of type stored in node_type
         """
-        # Initialize thelist of tuning parameter that mus be applied to
-        # the node identified by the node_name and the node_type
-        params = []
-
-        # Walk through the list of tuning parameters
-        for parameters in self._parameter_dict.values():
+        if self._index is None:
+            self._build_index()
+        by_type, by_prefix, position = self._index
+
+        # Parameters for one of the node types
+        matches = {}
+        for ntype in node_type:
+            for parameter in by_type.get(ntype, ()):
+                matches[id(parameter)] = parameter
+
+        # Parameters for the node name, only checking the ones declared for
+        # nodes with the same name prefix.
+        if node_name:
+            for parameter in by_prefix.get(_name_prefix(node_name), ()):
+                if id(parameter) not in matches \
+                   and node_name in parameter.node_list:
+                    matches[id(parameter)] = parameter
+
+        return sorted(matches.values(), key=lambda param: position[id(param)])
 
-            # Walk through the list of parameters to identify the one that must
-            # be applied to the considered node.
-            for parameter in parameters:
-
-                # Is the node type one of the type supported by this tuning
-                # parameter?
-                if set(node_type) & parameter.node_types:
-                    # Save the parameter to the list that will be returned
-                    params.append(parameter)
-
-                # Is the node name in the node name list of the tuning
-                # parameter?
-                elif node_name in parameter.node_list:
-                    # Save the parameter to the list that will be returned
-                    params.append(parameter)
-        
-        return params
-        
     def _add_parameter(self, new_parameter):
         """
         Function used to add a tuning parameter to the tuning model. 
@@ -276,6 +373,7 @@ class TuningModel(object):
 
         # If the tuning parameter is already known add a value to the list
         self._parameter_dict[new_parameter.name].append(new_parameter)
+        self._index = None
 
     def create_parameter(self, parameter_name, parameter_value,
                          node_type_list=None, node_name_list=None):
@@ -30,13 +30,12 @@ from Shine.Configuration.Globals import Globals
 from Shine.Configuration.ModelFile import ModelFileValueError
 from Shine.Configuration.Exceptions import ConfigException
 
-from Shine.CLI.Display import DisplayError
+from Shine.CLI import DisplayError
 from Shine.Commands import COMMAND_LIST
 from Shine.Commands.Base.Command import CommandHelpException, CommandException
 from Shine.Commands.Base.CommandRCDefs import RC_RUNTIME_ERROR
 
-from Shine.Lustre.FileSystem import FSRemoteError
-from Shine.Lustre.Component import ComponentError
+from Shine.Lustre import FSRemoteError, ComponentError
 
 from ClusterShell.Task import task_self
 from ClusterShell.NodeSet import NodeSet, NodeSetException, NodeSetParseError, \
@@ -67,7 +66,7 @@ class Controller(object):
         print >> sys.stderr, "Error: %s" % msg
 
     @classmethod
-    def handle_options(cls):
+    def handle_options(cls, argv=None):
 
         def check_nodeset(option, opt, value):
             try:
@@ -197,8 +196,25 @@ class Controller(object):
                           choices=['auto', 'never', 'always'], default='auto',
                           help="analyze target mountdata (never, always"
                                " or auto)", metavar='WHEN')
+        parser.add_option("--merge-fs", dest="mergefs", action="store_true",
+                          help="run only one remote command per server for"
+                               " all file systems")
+        parser.add_option("--parallel-fs", dest="parallelfs",
+                          action="store_true",
+                          help="run the command on all file systems at once")
+        parser.add_option("--watch", dest="watch", type="float",
+                          metavar="SECONDS",
+                          help="poll status again every SECONDS, only"
+                               " displaying changes")
+        parser.add_option("--max-age", dest="max_age", type="int",
+                          metavar="SECONDS",
+                          help="use component status checked less than"
+                               " SECONDS ago, if available")
+        parser.add_option("--check", dest="check", action="store_true",
+                          help="only report values which differ, do not"
+                               " change them")
         # Parse command line
-        (options, args) = parser.parse_args()
+        (options, args) = parser.parse_args(argv)
 
         # A command is mandatory
         if not args:
@@ -207,6 +223,14 @@ class Controller(object):
         # Incompatible options
         if options.view and options.viewfmt:
             parser.error("-O and -V option are mutually exclusive")
+        if options.mergefs and options.parallelfs:
+            parser.error("--merge-fs and --parallel-fs are mutually exclusive")
+        if options.watch is not None and options.watch <= 0:
+            parser.error("--watch interval should be positive")
+        if options.max_age is not None and options.max_age < 0:
+            parser.error("--max-age should not be negative")
+        if options.watch and options.mergefs:
+            parser.error("--merge-fs and --watch are mutually exclusive")
         if not options.view:
             options.view = 'fs'
 
@@ -239,13 +263,13 @@ class Controller(object):
         return (options, args, cmdname)
 
 
-    def run_command(self):
+    def run_command(self, argv=None):
         # sys.exit() if error on command line (optparse behaviour)
         # rc=2
 
         rc = RC_RUNTIME_ERROR
 
-        (options, args, cmdname) = self.handle_options()
+        (options, args, cmdname) = self.handle_options(argv)
 
         try:
 
@@ -19,9 +19,12 @@
 #
 
 
+import os
+
 from ClusterShell.NodeSet import NodeSet, RangeSet
 
 from Shine.Configuration.Configuration import Configuration
+from Shine.Configuration.Globals import Globals
 
 from Shine.Lustre.FileSystem import FileSystem, MGT, MDT, OST, Client, Router
 from Shine.Lustre.Component import ComponentGroup
@@ -78,6 +81,41 @@ def _get_server(nodename, fs, fs_conf, handler, nodes=None, excluded=None):
 
     return _SERVERS[nodename]
 
+def _create_client_sets(fs, client_nodes, mount_path, mount_options, handler,
+                        target_types=None, nodes=None, excluded=None,
+                        labels=None):
+    """
+    Gather `client_nodes' in ClientSet components, one for enabled nodes and
+    one for the others.
+
+    The local node and nodes already known as servers are kept as regular
+    clients: return them.
+    """
+    kept = NodeSet.fromlist([Server.hostname_long(), Server.hostname_short()])
+    kept.updaten(_SERVERS.keys())
+    kept.intersection_update(client_nodes)
+
+    enabled = client_nodes.difference(kept)
+    if nodes is not None:
+        enabled.intersection_update(nodes)
+    if excluded is not None:
+        enabled.difference_update(excluded)
+    disabled = client_nodes.difference(kept).difference(enabled)
+
+    for set_nodes, set_enabled in ((enabled, True), (disabled, False)):
+        if len(set_nodes) == 0:
+            continue
+        server = Server(str(set_nodes), [], handler)
+        server.action_enabled = set_enabled
+        if target_types is not None and 'client' not in target_types:
+            set_enabled = False
+        clients = fs.new_client_set(server, mount_path, mount_options,
+                                    set_enabled)
+        if labels is not None and clients.label not in labels:
+            clients.action_enabled = False
+
+    return kept
+
 def instantiate_lustrefs(fs_conf, target_types=None, nodes=None, excluded=None,
                          failover=None, indexes=None, labels=None, groups=None,
                          event_handler=None, extended=False):
@@ -151,23 +189,32 @@ def instantiate_lustrefs(fs_conf, target_types=None, nodes=None, excluded=None,
 
 
     # Create attached file system clients...
-    for client_node, mount_path, mount_options in fs_conf.iter_clients():
-        server = _get_server(client_node, fs, fs_conf, event_handler,
-                             nodes=nodes, excluded=excluded)
+    # Large groups of clients with the same mount are gathered in ClientSet.
+    set_size = Globals().get('client_set_size')
+    for client_nodes, mount_path, mount_options in fs_conf.iter_client_sets():
+        if set_size and len(client_nodes) >= set_size:
+            client_nodes = _create_client_sets(fs, client_nodes, mount_path,
+                                               mount_options, event_handler,
+                                               target_types, nodes, excluded,
+                                               labels)
+
+        for client_node in client_nodes:
+            server = _get_server(client_node, fs, fs_conf, event_handler,
+                                 nodes=nodes, excluded=excluded)
 
-        # filter on target types and nodes
-        client_action_enabled = True
-        if (target_types is not None and 'client' not in target_types) or \
-            (nodes is not None and server.hostname not in nodes) or \
-            (excluded is not None and server.hostname in excluded):
-            client_action_enabled = False
+            # filter on target types and nodes
+            client_action_enabled = True
+            if (target_types is not None and 'client' not in target_types) or \
+                (nodes is not None and server.hostname not in nodes) or \
+                (excluded is not None and server.hostname in excluded):
+                client_action_enabled = False
 
-        client = fs.new_client(server, mount_path, mount_options, \
-                               client_action_enabled)
+            client = fs.new_client(server, mount_path, mount_options, \
+                                   client_action_enabled)
 
-        # Now the device is instanciated, we could check label name
-        if (labels is not None and client.label not in labels):
-            client.action_enabled = False
+            # Now the device is instanciated, we could check label name
+            if (labels is not None and client.label not in labels):
+                client.action_enabled = False
 
     # Create attached file system routers...
     for router_node in fs_conf.iter_routers():
@@ -206,6 +253,35 @@ def create_lustrefs(fs_model_file, event_handler=None, nodes=None,
     return fs_conf, fs
 
 
+# In-memory configuration cache, only enabled by long-running processes.
+# fs_name -> ((mtime, size), Configuration)
+_CONFIGS = None
+
+def enable_conf_cache():
+    """Keep loaded filesystem configurations for later open_lustrefs()."""
+    global _CONFIGS
+    _CONFIGS = {}
+
+def _load_conf(fs_name):
+    """
+    Load an installed filesystem configuration, using the cached one if
+    enabled and if its file was not modified since.
+    """
+    if _CONFIGS is None:
+        return Configuration.load_from_cache(fs_name)
+
+    xmf_path = os.path.join(Globals().get_conf_dir(), "%s.xmf" % fs_name)
+    try:
+        info = os.stat(xmf_path)
+    except OSError:
+        _CONFIGS.pop(fs_name, None)
+        return Configuration.load_from_cache(fs_name)
+
+    stamp = (info.st_mtime, info.st_size)
+    if fs_name not in _CONFIGS or _CONFIGS[fs_name][0] != stamp:
+        _CONFIGS[fs_name] = (stamp, Configuration.load_from_cache(fs_name))
+    return _CONFIGS[fs_name][1]
+
 def open_lustrefs(fs_name, target_types=None, nodes=None, excluded=None,
                   failover=None, indexes=None, labels=None, groups=None,
                   event_handler=None, extended=False):
@@ -214,7 +290,7 @@ def open_lustrefs(fs_name, target_types=None, nodes=None, excluded=None,
     from installed shine configuration.
     """
     # Create file system configuration
-    fs_conf = Configuration.load_from_cache(fs_name)
+    fs_conf = _load_conf(fs_name)
 
     fs = instantiate_lustrefs(fs_conf, target_types, nodes, excluded,
                               failover, indexes, labels, groups,
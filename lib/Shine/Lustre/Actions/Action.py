@@ -26,16 +26,18 @@ An action must inherits from one of the base Action class.
 """
 
 import os
+import stat
 import time
 import re
 from string import Template
+from collections import deque
 
 from ClusterShell.Event import EventHandler
 from ClusterShell.Task import task_self
 
 from Shine.Configuration.Globals import Globals
 
-from Shine.Lustre import ComponentError
+from Shine.Lustre import ComponentError, ProcSnapshot, StatusCache
 
 # XXX: This is not really good to import stuff from CLI in Actions. This part
 # of Display should be generalized in some kind of Utility module and imported
@@ -111,24 +113,119 @@ class Action(EventHandler):
     def ev_close(self, worker):
         """Compute the action whole duration."""
         self.duration = time.time() - self.start
+        # The command could have changed what procfs reports.
+        ProcSnapshot.invalidate()
 
     def launch(self):
         """Run the action."""
         raise NotImplementedError("Derived classes must implement.")
 
+# Pending scheduler operations, see _schedule().
+_SCHED_QUEUE = deque()
+_SCHED_BUSY = False
+
+def _schedule(func, *args):
+    """
+    Queue a graph operation and process the queue, if not already done.
+
+    Graph operations (launching an action, propagating a final status to
+    followers) may trigger other ones. They are queued and processed
+    iteratively, avoiding deep recursion on large action graphs.
+    """
+    global _SCHED_BUSY
+    _SCHED_QUEUE.append((func, args))
+    if _SCHED_BUSY:
+        return
+    _SCHED_BUSY = True
+    try:
+        try:
+            while _SCHED_QUEUE:
+                func, args = _SCHED_QUEUE.popleft()
+                func(*args)
+        except:
+            _SCHED_QUEUE.clear()
+            raise
+    finally:
+        _SCHED_BUSY = False
+
+
+class Resource(object):
+    """
+    Something which could only be used by `capacity' actions at once.
+
+    Actions declare the resources they need with CommonAction.resources().
+    They are not run before all of them are available.
+    """
+
+    def __init__(self, name, capacity=1):
+        self.name = name
+        self.capacity = capacity
+        self.users = 0
+        self._waiting = deque()
+
+    def available(self):
+        """Return True if one more action could use this resource."""
+        return self.users < self.capacity
+
+    def wait(self, action):
+        """Remember `action' waits for this resource to be available."""
+        self._waiting.append(action)
+
+    def acquire(self):
+        """Use one slot of this resource."""
+        assert self.available()
+        self.users += 1
+
+    def release(self):
+        """Free one slot and retry to start the waiting actions."""
+        self.users -= 1
+        waiting, self._waiting = self._waiting, deque()
+        for action in waiting:
+            _schedule(action._start)
+
+# All resources, see get_resource(). They are dropped at the end of each run
+# (see FileSystem._run_actions()).
+_RESOURCES = {}
+
+def get_resource(name, capacity=1):
+    """
+    Return the resource named `name', created with `capacity' if it does
+    not exist yet.
+    """
+    if name not in _RESOURCES:
+        _RESOURCES[name] = Resource(name, capacity)
+    return _RESOURCES[name]
+
+def reset_resources():
+    """Forget all resources and their users, for a new run."""
+    _RESOURCES.clear()
+
+
 class CommonAction(Action):
     """
     Abstract class representing an Action with graph dependency features.
 
     It could be with other CommonAction instances to create a graph of actions.
     See GroupAction to group them.
+
+    Each action counts its prerequisites which are not finished yet, and is
+    run when this counter drops to zero. Counters are set up when the action
+    is first launched, so the graph could be modified until then.
     """
 
     def __init__(self):
         Action.__init__(self)
         self.deps = set()
         self.followers = set()
+        # Groups this action is a member of
+        self.groups = []
         self._status = ACT_WAITING
+        # Prerequisites being waited for: None, 'deps' or 'members'
+        self._waiting_for = None
+        self._pending = 0
+        self._failed = False
+        # Resources used while running
+        self._held = []
 
     def depends_on(self, other):
         """
@@ -149,46 +246,111 @@ class CommonAction(Action):
 
         If this is a final state, try to launch actions depending on it.
         """
+        final = self._status in (ACT_OK, ACT_ERROR)
         self._status = status
         # If it is a final states, propagate in the graph
-        if self._status in (ACT_OK, ACT_ERROR):
+        if self._status in (ACT_OK, ACT_ERROR) and not final:
+            self._release()
             for action in self.followers:
-                action.launch()
+                _schedule(action._prereq_done, self)
 
-    def _graph_ok(self, actions):
+    def _wait_for(self, kind, actions):
         """
-        Return True if dependencies in action list are OK.
+        Start counting `actions' which are not finished yet and launch the
+        waiting ones.
 
-        Return False if
-         - the group is not in WAITING state.
-         - one of them is waiting and launch it
-         - one of them is still running
-         - one of them is in error. This group is set in ERROR too.
+        When all of them are finished, _prereq_ok() is called.
         """
+        self._waiting_for = kind
+        self._pending = 0
+        self._failed = False
+        for action in actions:
+            status = action.status()
+            if status == ACT_ERROR:
+                self._failed = True
+            elif status != ACT_OK:
+                self._pending += 1
+                if status == ACT_WAITING:
+                    _schedule(action._poke)
+        if self._pending == 0:
+            self._prereq_ok()
+
+    def _prereq_done(self, action):
+        """`action' just finished. Update my counters if I was waiting it."""
+        if self._status in (ACT_OK, ACT_ERROR):
+            return
 
-        # If I'm no more waiting, no need to be launched twice
-        if self.status() != ACT_WAITING:
-            return False
+        # A finished action launches all its followers.
+        if self._waiting_for is None:
+            self._poke()
+            return
+
+        if self._waiting_for == 'deps':
+            waited = action in self.deps
+        else:
+            waited = self._is_member(action)
+        if not waited:
+            return
 
-        # If some deps are not yet run, launch them!
-        waiting = [dep for dep in actions if dep.status() == ACT_WAITING]
-        if waiting:
-            for dep in waiting:
-                dep.launch()
-            return False
+        if action.status() == ACT_ERROR:
+            self._failed = True
+        self._pending -= 1
+        if self._pending == 0:
+            self._prereq_ok()
 
-        # If all my deps are not in final state, wait
-        running = [dep for dep in actions if dep.status() == ACT_RUNNING]
-        if running:
-            return False
+    def _is_member(self, action):
+        """Return True if `action' is a member of this action."""
+        return False
 
+    def _prereq_ok(self):
+        """All waited actions are finished, go on."""
         # If some deps are in error, I'm too
-        error = [dep for dep in actions if dep.status() == ACT_ERROR]
-        if error:
+        if self._failed:
             self.set_status(ACT_ERROR)
-            return False
-
-        return True
+        elif self._waiting_for == 'deps':
+            self._start()
+
+    def _start(self):
+        """Run the action, if all the resources it needs are available."""
+        resources = self.resources()
+        for resource in resources:
+            if not resource.available():
+                self._waiting_for = 'resources'
+                resource.wait(self)
+                return
+
+        for resource in resources:
+            resource.acquire()
+        self._held = resources
+        self._waiting_for = 'run'
+        self.set_status(ACT_RUNNING)
+        try:
+            self._launch()
+        except:
+            # Do not keep resources for an action which will never end
+            self._release()
+            raise
+
+    def resources(self):
+        """Return the list of Resource needed to run this action."""
+        return []
+
+    def _release(self):
+        """Free the resources used by this action, if any."""
+        held, self._held = self._held, []
+        for resource in held:
+            resource.release()
+
+    def _poke(self):
+        """Start waiting for my dependencies, if not already done."""
+        # If I'm no more waiting, no need to be launched twice
+        if self._status == ACT_WAITING and self._waiting_for is None:
+            # Group members are only launched once their groups are, even
+            # if a dependency outside of the group is already finished.
+            for group in self.groups:
+                if group.status() == ACT_WAITING:
+                    return
+            self._wait_for('deps', self.deps)
 
     def ev_close(self, worker):
         """
@@ -210,12 +372,9 @@ class CommonAction(Action):
 
     def launch(self):
         """Check dependencies and run the action."""
-
-        if not self._graph_ok(self.deps):
-            return
-
-        self.set_status(ACT_RUNNING)
-        self._launch()
+        # All local checks of this run share the same procfs snapshot.
+        ProcSnapshot.activate()
+        _schedule(self._poke)
 
     def _launch(self):
         """
@@ -234,7 +393,8 @@ class ActionGroup(CommonAction):
 
     def __init__(self):
         CommonAction.__init__(self)
-        self._members = list()  # Ideally this should be an OrderedSet
+        self._members = list()
+        self._memberset = set()
 
     def __len__(self):
         """Number or group members."""
@@ -250,11 +410,16 @@ class ActionGroup(CommonAction):
 
     def add(self, action):
         """Add an action to this group."""
-        if action not in self._members:  # _members should behave like a set
+        if action not in self._memberset:
             self._members.append(action)
+            self._memberset.add(action)
+            action.groups.append(self)
             # Add a half-dependency
             action.followers.add(self)
 
+    def _is_member(self, action):
+        return action in self._memberset
+
     def sequential(self):
         """Create a dependency between each group element.
 
@@ -264,16 +429,31 @@ class ActionGroup(CommonAction):
         for elem1, elem2 in zip(self._members, self._members[1:]):
             elem2.depends_on(elem1)
 
+    def _prereq_ok(self):
+        if self._waiting_for == 'members':
+            # So, all members are OK
+            if self._failed:
+                self.set_status(ACT_ERROR)
+            else:
+                self.set_status(ACT_OK)
+        else:
+            CommonAction._prereq_ok(self)
+
     def _launch(self):
         """Launch each member of this group."""
-        # _graph_ok() wants us WAITING but launch() set us RUNNING
-        self.set_status(ACT_WAITING)
+        self._wait_for('members', self._members)
 
-        if not self._graph_ok(self._members):
-            return
 
-        # So, all members are OK
-        self.set_status(ACT_OK)
+class _MountdataProbe(EventHandler):
+    """Read a target mountdata and resume its action when done."""
+
+    def __init__(self, action):
+        EventHandler.__init__(self)
+        self.action = action
+
+    def ev_close(self, worker):
+        """Give the probe result back to the action."""
+        self.action._mountdata_probed(worker)
 
 
 class FSAction(CommonAction):
@@ -286,6 +466,10 @@ class FSAction(CommonAction):
 
     NEEDED_MODULES = []
 
+    # LBUG #18624: set to True if this action could not be run on several
+    # loop devices of the same server at once.
+    SERIAL_LOOPDEV = False
+
     def __init__(self, comp, **kwargs):
         CommonAction.__init__(self)
         self.comp = comp
@@ -309,6 +493,23 @@ class FSAction(CommonAction):
         desc = '%s of %s' % (self.NAME, self.comp.longtext())
         return ActionInfo(self, self.comp, desc)
 
+    def resources(self):
+        """
+        Actions on loop devices are serialized per server, if needed.
+
+        Device check is not done yet, so device type is checked here.
+        """
+        if self.SERIAL_LOOPDEV:
+            try:
+                isblk = stat.S_ISBLK(os.stat(self.comp.dev).st_mode)
+            except OSError:
+                # Error will be reported by full_check()
+                return []
+            if not isblk:
+                name = "%s:loopdev" % self.comp.server.hostname
+                return [get_resource(name)]
+        return []
+
     def _addopts_substitute(self, addopts):
         """Substitute placeholders in `addopts' based on self.comp data."""
 
@@ -383,8 +584,30 @@ class FSAction(CommonAction):
         Run the command to process the action.
 
         It checks the command could be really be run and raises events.
+        If target mountdata should be read, this is done in background first.
         """
         self.comp.action_event(self, 'start')
+
+        if self.check_mountdata and hasattr(self.comp, 'mountdata_probe'):
+            cmd = self.comp.mountdata_probe()
+            if cmd:
+                self.task.shell(cmd, handler=_MountdataProbe(self),
+                                stderr=True)
+                return
+
+        self._check_and_run()
+
+    def _mountdata_probed(self, worker):
+        """Record mountdata probe result and go on with the action."""
+        retcode = worker.retcode()
+        if retcode is None:
+            # Timeout
+            retcode = 1
+        self.comp.mountdata_probed(retcode, worker.read())
+        self._check_and_run()
+
+    def _check_and_run(self):
+        """Check the component and run the command, if needed."""
         try:
             self.comp.full_check(mountdata=self.check_mountdata)
 
@@ -405,24 +628,32 @@ class FSAction(CommonAction):
         """
         Action.ev_close(self, worker)
 
-        self.comp.lustre_check()
-
-        # Action timed out
-        if worker.did_timeout():
-            self.comp.action_event(self, 'timeout')
-            self.set_status(ACT_ERROR)
-
-        # Action succeeded
-        elif worker.retcode() == 0:
-            result = Result(duration=self.duration, retcode=worker.retcode())
-            self.comp.action_event(self, 'done', result)
-            self.set_status(ACT_OK)
+        try:
+            self.comp.lustre_check()
+            # Its last status check is no more relevant.
+            StatusCache.forget(self.comp)
+
+            # Action timed out
+            if worker.did_timeout():
+                self.comp.action_event(self, 'timeout')
+                self.set_status(ACT_ERROR)
+
+            # Action succeeded
+            elif worker.retcode() == 0:
+                result = Result(duration=self.duration,
+                                retcode=worker.retcode())
+                self.comp.action_event(self, 'done', result)
+                self.set_status(ACT_OK)
 
-        # Action failed
-        else:
-            result = ErrorResult(worker.read(), self.duration, worker.retcode())
-            self.comp.action_event(self, 'failed', result)
-            self.set_status(ACT_ERROR)
+            # Action failed
+            else:
+                result = ErrorResult(worker.read(), self.duration,
+                                     worker.retcode())
+                self.comp.action_event(self, 'failed', result)
+                self.set_status(ACT_ERROR)
+        finally:
+            # The command is over, even if its result could not be checked.
+            self._release()
 
     def needed_modules(self):
         """
@@ -25,11 +25,10 @@ tunefs command as it is very close in behaviour.
 
 import re
 
-from ClusterShell.Task import task_self
-
 from Shine.Configuration.Globals import Globals
 
-from Shine.Lustre.Actions.Action import FSAction
+from Shine.Lustre.Actions.Action import FSAction, get_resource
+from Shine.Lustre.Disk import device_controller
 
 import Shine.Lustre.Target
 
@@ -41,6 +40,9 @@ class CommonFormat(FSAction):
 
     NEEDED_MODULES = ['ldiskfs']
 
+    # LBUG #18624: multiple mkfs.lustre on loop devices
+    SERIAL_LOOPDEV = True
+
     def __init__(self, target, **kwargs):
         FSAction.__init__(self, target, **kwargs)
 
@@ -59,6 +61,26 @@ class CommonFormat(FSAction):
         else:
             self.quota_type = None
 
+    def ev_close(self, worker):
+        """Forget previous mountdata, as they were just modified."""
+        self.comp.mountdata_forget()
+        FSAction.ev_close(self, worker)
+
+    def resources(self):
+        """
+        Also limit the actions run at once on the same storage controller,
+        if format_per_controller is set.
+        """
+        resources = FSAction.resources(self)
+        capacity = Globals().get('format_per_controller')
+        if capacity:
+            controller = device_controller(self.comp.dev)
+            if controller is not None:
+                name = "%s:controller:%s" % (self.comp.server.hostname,
+                                             controller)
+                resources.append(get_resource(name, capacity))
+        return resources
+
     def _mgsnids(self):
         """
         Prepare the argument list for mgsnode NID parameters.
@@ -73,11 +95,6 @@ class CommonFormat(FSAction):
         """Raise an exception if the target is mounted."""
         self.comp.raise_if_started("Cannot %s" % self.NAME)
 
-        # LBUG #18624 : workaround for "multiple mkfs.lustre on loop devices"
-        if not self.comp.dev_isblk:
-            # configure one engine client max per task (sequential, bah.)
-            task_self().set_info("fanout", 1)
-
         return None
 
     def _prepare_cmd(self):
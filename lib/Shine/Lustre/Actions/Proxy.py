@@ -25,6 +25,7 @@ import binascii, pickle
 from ClusterShell.MsgTree import MsgTree
 from ClusterShell.NodeSet import NodeSet
 
+from Shine.Configuration.Globals import Globals
 from Shine.Lustre.Component import INPROGRESS, RUNTIME_ERROR
 from Shine.Lustre.Actions.Action import Action, CommonAction, ActionInfo, \
                                         ACT_OK, ACT_ERROR
@@ -36,7 +37,7 @@ from Shine.Lustre.Actions.Action import ErrorResult
 # SHINE PROXY PROTOCOL
 #
 SHINE_MSG_MAGIC = "SHINE:"
-SHINE_MSG_VERSION = 3
+SHINE_MSG_VERSION = 4
 
 class ProxyActionUnpackError(Exception):
     """An error occured while trying to unpack a shine event message."""
@@ -44,12 +45,53 @@ class ProxyActionUnpackError(Exception):
 class ProxyActionUnpickleError(Exception):
     """An error occured while trying to unpickle a shine event message."""
 
+class _RemoteAction(object):
+    """Stand-in for a distant action, only used to rebuild its ActionInfo."""
+
+    def __init__(self, name):
+        self.NAME = name
+
+def shine_event_compact(event):
+    """
+    Replace the ActionInfo of an event by a light tuple.
+
+    Since v4, components are not pickled anymore, only a compact record of
+    their state is sent. The record is taken when this is called: events
+    kept to be sent later should be compacted first. Already compacted
+    events are left unchanged.
+    """
+    info = event.get('info')
+    if info is not None and not isinstance(info, tuple):
+        record = None
+        if hasattr(info.elem, 'state_record'):
+            record = info.elem.state_record()
+        event['info'] = (info.actname, info.description, record)
+    return event
+
+def _event_expand(event):
+    """Rebuild the ActionInfo of an event compacted by shine_event_compact()."""
+    if 'info' in event:
+        actname, desc, record = event['info']
+        event['info'] = ActionInfo(_RemoteAction(actname), record, desc)
+    return event
+
 def shine_msg_pack(**kwargs):
     """Shine event serialization method."""
     # To be more evolutive, Shine message contains only a dict.
+    kwargs = shine_event_compact(kwargs)
     return "%s%d:%s" % (SHINE_MSG_MAGIC, SHINE_MSG_VERSION,
                         binascii.b2a_base64(pickle.dumps(kwargs, -1)))
 
+def shine_msg_pack_batch(events):
+    """
+    Serialize several events in one message.
+
+    `events' is a list of dicts, as given to shine_msg_pack() or compacted
+    by shine_event_compact().
+    """
+    return shine_msg_pack(evtype='batch',
+                          events=[shine_event_compact(evt) for evt in events])
+
 def shine_msg_unpack(msg):
     """
     Parse a raw string from a remote shine command.
@@ -67,15 +109,25 @@ def shine_msg_unpack(msg):
     except Exception, exp:
         raise ProxyActionUnpackError("Malformed Shine message: %s" % exp)
 
-    if version == SHINE_MSG_VERSION:
+    if version in (SHINE_MSG_VERSION, 3):
         try:
             # unpack and unpickle object
-            return pickle.loads(binascii.a2b_base64(data))
+            data = pickle.loads(binascii.a2b_base64(data))
         except Exception, exp:
             msg = "Cannot unpickle message (check Shine and ClusterShell " \
                   "versions): %s" % exp
             raise ProxyActionUnpickleError(msg)
 
+        # v4 messages carry a (name, description, record) tuple for 'info'.
+        # The record is given as ActionInfo element, it will be applied on
+        # the local component by FileSystem.distant_event().
+        if version == SHINE_MSG_VERSION:
+            if data.get('evtype') == 'batch':
+                data['events'] = [_event_expand(evt) for evt in data['events']]
+            else:
+                _event_expand(data)
+        return data
+
     elif version == 2:
         try:
             return shine_msg_unpack_v2(data)
@@ -118,7 +170,8 @@ class FSProxyAction(CommonAction):
 
     NAME = 'proxy'
 
-    def __init__(self, fs, action, nodes, debug, comps=None, **kwargs):
+    def __init__(self, fs, action, nodes, debug, comps=None, sockpath=None,
+                 **kwargs):
 
         CommonAction.__init__(self)
 
@@ -128,18 +181,22 @@ class FSProxyAction(CommonAction):
         self.nodes = nodes
         self.debug = debug
 
+        # If set, the command is forwarded to the shine agent listening on
+        # this socket on remote nodes (see Shine.Agent).
+        self.sockpath = sockpath
+
         self._comps = comps
 
         self.options = {}
         for optname in ('addopts', 'failover', 'mountdata', 'fanout',
-                        'dryrun'):
+                        'dryrun', 'check', 'max_age'):
             self.options[optname] = kwargs.get(optname)
 
         self._outputs = MsgTree()
         self._errpickle = MsgTree()
         self._silentnodes = NodeSet() # Error nodes without output
 
-        if self.fs.debug:
+        if self.debug:
             print "FSProxyAction %s on %s" % (action, nodes)
 
     def info(self):
@@ -150,14 +207,15 @@ class FSProxyAction(CommonAction):
 
         command = ["%s" % self.progpath]
         command.append(self.action)
-        command.append("-f %s" % self.fs.fs_name)
+        command.append("-f %s" % ','.join(self._fsnames()))
         command.append("-R")
 
         if self.debug:
             command.append("-d")
 
-        if self._comps:
-            command.append("-l %s" % self._comps.labels())
+        labels = self._labels()
+        if labels:
+            command.append("-l %s" % labels)
 
         if self.options['addopts']:
             command.append("-o '%s'" % self.options['addopts'])
@@ -171,6 +229,12 @@ class FSProxyAction(CommonAction):
         if self.options['dryrun']:
             command.append('--dry-run')
 
+        if self.options['check']:
+            command.append('--check')
+
+        if self.options['max_age'] is not None:
+            command.append('--max-age=%d' % self.options['max_age'])
+
         # To be compatible with older clients in most cases, do not set the
         # option when it is its default value.
         if self.options['mountdata'] not in (None, 'auto'):
@@ -178,9 +242,37 @@ class FSProxyAction(CommonAction):
 
         return command
 
+    def _fsnames(self):
+        """Return the names of file systems the remote command applies to."""
+        return [self.fs.fs_name]
+
+    def _labels(self):
+        """Return the labels of components to select on remote nodes."""
+        if self._comps:
+            return self._comps.labels()
+
+    def _iter_comps(self):
+        """Iterate over all components related to this ProxyAction."""
+        return iter(self._comps or [])
+
+    def _event_fs(self, node, data):
+        """
+        Return the file system the event described by `data' is for, or
+        None if it should be ignored.
+        """
+        return self.fs
+
+    def _proxy_error(self, nodes, message):
+        """Report a proxy error for `nodes' to the file system."""
+        self.fs._handle_shine_proxy_error(nodes, message)
+
     def _launch(self):
         """Launch FS proxy command."""
         command = self._prepare_cmd()
+        if self.sockpath:
+            # Forward the command line to the agent client.
+            command = [Globals().get('agent_python'), "-m Shine.Agent",
+                       self.sockpath] + command
 
         # Schedule cluster command.
         self.task.shell(' '.join(command), nodes=self.nodes, handler=self)
@@ -193,47 +285,66 @@ class FSProxyAction(CommonAction):
         Raise 'proxy' events for all components related to this ProxyAction.
         """
         # Add a 'proxy' running action for each component.
-        if self._comps:
-            for comp in self._comps:
-                # This special event is raised to keep track of undergoing
-                # actions. Maybe this could be dropped is such tracking is no
-                # more needed.
-                comp.action_event(self, 'start')
+        for comp in self._iter_comps():
+            # This special event is raised to keep track of undergoing
+            # actions. Maybe this could be dropped is such tracking is no
+            # more needed.
+            comp.action_event(self, 'start')
+
+    def _distant_event(self, node, data):
+        """Raise the event described by `data' for `node'."""
+        fs = self._event_fs(node, data)
+        if fs is None:
+            return
+
+        # COMPAT: Prior to 1.4, 'comp'+'action' was used.
+        # 1.4+ uses ActionInfo
+        if 'comp' in data:
+            action = Action()
+            action.NAME = data.pop('action')
+            comp = data.pop('comp')
+            comp.fs = fs
+            desc = "%s of %s" % (action.NAME, comp.longtext())
+            data['info'] = ActionInfo(action, comp, desc)
+            evtype = 'comp'
+        else:
+            evtype = data.pop('evtype')
+
+        fs.distant_event(evtype, node=node, **data)
+
+    def _add_errpickle(self, node, msg):
+        """Record an unpickling error for `node', only once per message."""
+        if msg not in self._errpickle.get(node, ""):
+            self._errpickle.add(node, msg)
 
     def ev_read(self, worker):
         node = worker.current_node
         buf = worker.current_msg
         try:
             data = shine_msg_unpack(buf)
-
-            # COMPAT: Prior to 1.4, 'comp'+'action' was used.
-            # 1.4+ uses ActionInfo
-            if 'comp' in data:
-                action = Action()
-                action.NAME = data.pop('action')
-                comp = data.pop('comp')
-                comp.fs = self.fs
-                desc = "%s of %s" % (action.NAME, comp.longtext())
-                data['info'] = ActionInfo(action, comp, desc)
-                evtype = 'comp'
-            else:
-                evtype = data.pop('evtype')
-
-            self.fs.distant_event(evtype, node=node, **data)
         except ProxyActionUnpickleError, exp:
             # Maintain a standalone list of unpickling errors.
             # Node could have unpickling error but still exit with 0
-            msg = str(exp)
-            if msg not in self._errpickle.get(node, ""):
-                self._errpickle.add(node, msg)
-        except AttributeError, exp:
-            msg = "Cannot read message (check Shine and ClusterShell " \
-                  "version): %s" % str(exp)
-            if msg not in self._errpickle.get(node, ""):
-                self._errpickle.add(node, msg)
+            self._add_errpickle(node, str(exp))
+            return
         except ProxyActionUnpackError:
             # Store output that is not a shine message
             self._outputs.add(node, buf)
+            return
+
+        # A batch message contains several events
+        if data.get('evtype') == 'batch':
+            events = data['events']
+        else:
+            events = [data]
+
+        for data in events:
+            try:
+                self._distant_event(node, data)
+            except AttributeError, exp:
+                msg = "Cannot read message (check Shine and ClusterShell " \
+                      "version): %s" % str(exp)
+                self._add_errpickle(node, msg)
 
     def ev_hup(self, worker):
         """Keep a list of node, without output, with a return code != 0"""
@@ -260,12 +371,11 @@ class FSProxyAction(CommonAction):
         status = ACT_OK
 
         # Remove the 'proxy' running action for each component.
-        if self._comps:
-            for comp in self._comps:
-                # This special event helps to keep track of undergoing actions
-                # (see ev_start())
-                comp.action_event(self, 'done')
-                comp.sanitize_state(nodes=worker.nodes)
+        for comp in self._iter_comps():
+            # This special event helps to keep track of undergoing actions
+            # (see ev_start())
+            comp.action_event(self, 'done')
+            comp.sanitize_state(nodes=worker.nodes)
 
         # Gather nodes by return code
         for rc, nodes in worker.iter_retcodes():
@@ -286,17 +396,99 @@ class FSProxyAction(CommonAction):
                     nodes = NodeSet.fromlist(nodes)
                     msg = "Remote action %s failed: %s\n" % \
                                                         (self.action, buffers)
-                    self.fs._handle_shine_proxy_error(nodes, msg)
+                    self._proxy_error(nodes, msg)
 
         # Raise errors for each unpickling error,
         # which could happen mostly when Shine exits with 0.
         for buffers, nodes in self._errpickle.walk():
             nodes = NodeSet.fromlist(nodes)
-            self.fs._handle_shine_proxy_error(nodes, str(buffers))
+            self._proxy_error(nodes, str(buffers))
 
         # Raise an error for nodes without output
         if len(self._silentnodes) > 0:
             msg = "Remote action %s failed: No response" % self.action
-            self.fs._handle_shine_proxy_error(self._silentnodes, msg)
+            self._proxy_error(self._silentnodes, msg)
 
         self.set_status(status)
+
+
+class FSMultiProxyAction(FSProxyAction):
+    """
+    File system command proxy action for several file systems at once.
+
+    Only one remote command is run on each node, for all the file systems
+    added with add_fs(). Distant events are dispatched to the file system
+    their component belongs to.
+    """
+
+    def __init__(self, action, nodes, debug, sockpath=None, **kwargs):
+        FSProxyAction.__init__(self, None, action, nodes, debug,
+                               sockpath=sockpath, **kwargs)
+        self._fscomps = []
+        self._fsmap = {}
+
+    def add_fs(self, fs, comps):
+        """Also run the remote command for `comps' of file system `fs'."""
+        assert fs.fs_name not in self._fsmap
+        # First file system gets events not related to a component.
+        if self.fs is None:
+            self.fs = fs
+        self._fscomps.append((fs, comps))
+        self._fsmap[fs.fs_name] = fs
+
+    def _fsnames(self):
+        return [fs.fs_name for fs, _ in self._fscomps]
+
+    def _labels(self):
+        # The remote command selects the union of all file system labels.
+        # Events for components not selected for their file system are
+        # ignored, see _event_fs().
+        labels = NodeSet()
+        for _, comps in self._fscomps:
+            if comps:
+                labels.update(comps.labels())
+        return labels
+
+    def _iter_comps(self):
+        for _, comps in self._fscomps:
+            for comp in comps or []:
+                yield comp
+
+    def _event_fs(self, node, data):
+        """
+        Return the file system whose selected components include the one
+        of the event, or None if it is only found in file systems which did
+        not select it. Other events are for the first file system.
+
+        SHINE:3 and older peers do not send the file system name, the
+        component is searched in all file systems.
+        """
+        # COMPAT: Prior to 1.4, 'comp'+'action' was used.
+        elem = data.get('comp')
+        if elem is None:
+            if data.get('evtype') != 'comp' or data.get('info') is None:
+                return self.fs
+            elem = data['info'].elem
+
+        candidates = self._fscomps
+        if isinstance(elem, dict) and elem.get('fs') in self._fsmap:
+            candidates = [(fs, comps) for fs, comps in self._fscomps
+                          if fs.fs_name == elem['fs']]
+
+        found = False
+        for fs, comps in candidates:
+            try:
+                comp = fs._event_owner(node, elem)
+            except KeyError:
+                continue
+            found = True
+            if comps is None or comp in comps:
+                return fs
+        if found:
+            return None
+        # Unknown component, let the first file system report it.
+        return self.fs
+
+    def _proxy_error(self, nodes, message):
+        for fs, _ in self._fscomps:
+            fs._handle_shine_proxy_error(nodes, message)
@@ -24,19 +24,43 @@ status checking.
 """
 
 from Shine.Lustre.Actions.Action import FSAction, ACT_OK
+from Shine.Lustre import StatusCache
 
 class Status(FSAction):
     """
     Status action triggers component status checking.
 
-    It does not run an external command.
+    It does not run an external command. If `max_age' is set, the last
+    result of this check is used instead, if it is recent enough and read
+    mountdata when they are needed (see StatusCache).
     """
 
     NAME = 'status'
 
+    def __init__(self, comp, **kwargs):
+        FSAction.__init__(self, comp, **kwargs)
+        self.max_age = kwargs.get('max_age')
+
+    def _launch(self):
+        """Use cached status if allowed and available, or check component."""
+        record = None
+        if self.max_age is not None:
+            record = StatusCache.lookup(self.comp, self.max_age,
+                                        self.check_mountdata)
+        if record is None:
+            FSAction._launch(self)
+            return
+
+        self.comp.action_event(self, 'start')
+        self.comp.update_record(record,
+                                self.comp.fs.local_server or self.comp.server)
+        self.set_status(ACT_OK)
+        self.comp.action_event(self, 'done')
+
     def _shell(self):
         """
         No-op method. Status command does not need to run an external command.
         """
+        StatusCache.record(self.comp, self.check_mountdata)
         self.set_status(ACT_OK)
         self.comp.action_event(self, 'done')
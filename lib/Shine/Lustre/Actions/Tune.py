@@ -23,6 +23,8 @@ Classes used the apply tuning on local node, either from tuning.conf or
 dynamically created.
 """
 
+import re
+
 from Shine.Lustre.Actions.Action import CommonAction, ActionGroup, \
                                         ActionInfo, \
                                         ACT_OK, ACT_ERROR, ErrorResult
@@ -35,24 +37,126 @@ _SRVTYPE_MAP = {
         'router': 'router'
     }
 
-class _TuningAction(CommonAction):
-    """Action handling the command to modify only 1 tuning."""
+def _read_value(path):
+    """Return the current value of tuning file `path', or None if unreadable."""
+    try:
+        tunefile = open(path)
+        try:
+            return tunefile.read().strip()
+        finally:
+            tunefile.close()
+    except (IOError, OSError):
+        return None
+
+# Value with an optional binary size suffix, like 32M
+_SIZE_RE = re.compile(r'^(\d+)([kmgt]?)$', re.IGNORECASE)
+_SIZE_SHIFT = {'': 0, 'k': 10, 'm': 20, 'g': 30, 't': 40}
+# Selected item of a read-back list, like 'crc32 [adler]'
+_SELECTED_RE = re.compile(r'\[([^\]\s]+)\]')
+# Read-back known to be written back as is: a single plain word or number
+_SCALAR_RE = re.compile(r'^[\w.:@]*$')
+
+def _size(text):
+    """Return the size in bytes `text' stands for, or None."""
+    match = _SIZE_RE.match(text)
+    if match is None:
+        return None
+    return int(match.group(1)) << _SIZE_SHIFT[match.group(2).lower()]
+
+def _compare(current, value):
+    """
+    Compare tuning read-back `current' with the value to write.
+
+    Return True if they match, False if they differ and None if it is not
+    known: Lustre reports some parameters in another format than the one
+    they are written with (debug masks, selection lists, size suffixes...).
+    """
+    if current is None:
+        return False
+    value = value.strip()
+    if current == value:
+        return True
+
+    # Only the selected item of a list, like checksum_type, is set.
+    selected = _SELECTED_RE.findall(current)
+    if len(selected) == 1:
+        return selected[0] == value
+
+    # Sizes could be written with a suffix and read back in bytes.
+    cursize, size = _size(current), _size(value)
+    if cursize is not None and size is not None:
+        if cursize == size:
+            return True
+        if current.isdigit() and value.isdigit():
+            return False
+        # Read-back unit is not known
+        return None
+
+    if _SCALAR_RE.match(current) and _SCALAR_RE.match(value):
+        return False
+    # Masks, relative changes ('+neterror') and multi-line values
+    return None
+
+
+class _TuningBatch(CommonAction):
+    """
+    Action writing all tunings of a server, in-process.
+
+    Current values are read first and only the different ones are written.
+    Values which cannot be compared with their read-back (see _compare())
+    are written anyway. Each write is still logged and reported as the
+    equivalent shell command, but no process is spawned for it.
+
+    In check mode, nothing is written and each different value is reported
+    as an error. Values which cannot be compared are not reported.
+    """
 
     NAME = "tuning"
 
-    def __init__(self, action, command):
+    def __init__(self, action, tunings):
         CommonAction.__init__(self)
         self._tune = action
-        self._command = command
+        # List of (command, path, value)
+        self._tunings = tunings
         self.dryrun = action.dryrun
+        self.check = action.check
+        # Error messages, one per failed tuning
+        self.failed = []
 
     def _launch(self):
-        self._tune._server.hdlr.log('detail',
-                                    msg='[RUN] %s' % self._command)
-        if self.dryrun:
-            self.set_status(ACT_OK)
+        # Read all values before modifying any of them.
+        changes = []
+        for command, path, value in self._tunings:
+            current = _read_value(path)
+            same = _compare(current, value)
+            if same is False or (same is None and not self.check):
+                changes.append((command, path, value, current))
+
+        for command, path, value, current in changes:
+            if self.check:
+                if current is None:
+                    self.failed.append("%s could not be read" % path)
+                else:
+                    self.failed.append("%s is '%s' instead of '%s'" %
+                                       (path, current, value))
+                continue
+
+            self._tune._server.hdlr.log('detail', msg='[RUN] %s' % command)
+            if self.dryrun:
+                continue
+            try:
+                tunefile = open(path, 'w')
+                try:
+                    tunefile.write(value)
+                finally:
+                    tunefile.close()
+            except (IOError, OSError):
+                self.failed.append("'%s' failed" % command)
+
+        if self.failed:
+            self.set_status(ACT_ERROR)
         else:
-            self.task.shell(self._command, handler=self)
+            self.set_status(ACT_OK)
 
 
 class Tune(ActionGroup):
@@ -68,25 +172,31 @@ class Tune(ActionGroup):
         self._fsname = fsname
         self._init = False
         self.dryrun = kwargs.get('dryrun', False)
+        self.check = kwargs.get('check', False)
 
     def info(self):
         """Return a ActionInfo describing this action."""
+        if self.check:
+            return ActionInfo(self, self._server, 'check tunings')
         return ActionInfo(self, self._server, 'apply tunings')
 
     def _add_actions(self):
         """
-        Create all individual tunings Action.
+        Create the Action applying all tunings of this server.
 
         To be run before this fake group action is really launched.
         """
         srvtypes = set([_SRVTYPE_MAP.get(comp.TYPE) for comp in self._comps])
         srvname = str(self._server.hostname)
 
-        tunings = self._conf.get_params_for_name(srvname, srvtypes)
-        for tuning in tunings:
-            cmds = tuning.build_tuning_command(self._fsname)
-            for command in cmds:
-                self.add(_TuningAction(self, command))
+        batch = []
+        for tuning in self._conf.get_params_for_name(srvname, srvtypes):
+            value = tuning.written_value()
+            for path in tuning.tuning_paths(self._fsname):
+                command = "echo -n %s > %s" % (tuning.value, path)
+                batch.append((command, path, value))
+        if batch:
+            self.add(_TuningBatch(self, batch))
 
     def set_status(self, status):
         """
@@ -103,8 +213,7 @@ class Tune(ActionGroup):
                 # Build an error string
                 errors = []
                 for act in self:
-                    if act.status() == ACT_ERROR:
-                        errors.append("'%s' failed" % act._command)
+                    errors += act.failed
                 result = ErrorResult("\n".join(errors))
                 self._server.action_event(self, 'failed', result)
 
@@ -22,16 +22,20 @@
 Classes for Shine framework to manage Lustre clients.
 """
 
-from glob import glob
 import os 
 import re
+from array import array
 
+from ClusterShell.NodeSet import NodeSet
+
+from Shine.Lustre import ProcSnapshot
 from Shine.Lustre.Component import Component, ComponentError, \
                                    MOUNTED, OFFLINE, CLIENT_ERROR, RUNTIME_ERROR
 
 from Shine.Lustre.Actions.StartClient import StartClient
 from Shine.Lustre.Actions.StopClient import StopClient
 
+from Shine.Lustre.Server import Server
 from Shine.Lustre.Target import MDT, OST
 
 
@@ -46,6 +50,8 @@ class Client(Component):
     It can be started, stopped and check for status.
     """
 
+    __slots__ = ('mount_options', 'mount_path', 'mtpt', 'proc_states')
+
     TYPE = 'client'
     DISPLAY_ORDER = max(MDT.DISPLAY_ORDER, OST.DISPLAY_ORDER) + 1 
 
@@ -70,11 +76,11 @@ class Client(Component):
         """
         self.mount_options = mount_options
         self.mount_path = mount_path
-
-        Component.__init__(self, fs, server, enabled)
         self.mtpt = None
         self.proc_states = {}
 
+        Component.__init__(self, fs, server, enabled)
+
     def longtext(self):
         """
         Return the client filesystem name and mount point.
@@ -98,9 +104,36 @@ class Client(Component):
 
         # Compat v0.910: Following values depend on Shine remote version
         self.mount_options = getattr(other, 'mount_options', None)
-        self.mtpt = getattr(other, 'mtpt', getattr(other, 'status_info', None))
+        self.mtpt = getattr(other, 'mtpt', None)
         self.proc_states = getattr(other, 'proc_states', {})
 
+    def __setstate__(self, state):
+        Component.__setstate__(self, state)
+        if 'mtpt' not in state:
+            # Compat v0.910: mount point used to be named 'status_info'
+            self.mtpt = state.get('status_info')
+
+    def state_record(self):
+        """
+        Return a compact dict of my serializable fields.
+        """
+        record = Component.state_record(self)
+        record['mount_path'] = self.mount_path
+        record['mount_options'] = self.mount_options
+        record['mtpt'] = self.mtpt
+        record['proc_states'] = dict(self.proc_states)
+        return record
+
+    def update_record(self, record, server):
+        """
+        Update my serializable fields from a record sent by `server'.
+        """
+        Component.update_record(self, record, server)
+        self.mount_path = record['mount_path']
+        self.mount_options = record['mount_options']
+        self.mtpt = record['mtpt']
+        self.proc_states = record['proc_states']
+
     def lustre_check(self):
         """
         Check Client health at Lustre level.
@@ -108,8 +141,9 @@ class Client(Component):
 
         self.state = None   # Undefined
 
-        proc_lov_match = glob("/proc/fs/lustre/lov/%s-clilov-*" %
-                              self.fs.fs_name)
+        procfs = ProcSnapshot.snapshot()
+
+        proc_lov_match = procfs.client_lovs(self.fs.fs_name)
 
         if not proc_lov_match:
             self.state = OFFLINE
@@ -121,29 +155,25 @@ class Client(Component):
         loaded = os.path.isdir(proc_lov_match[0])
 
         # check for presence in /proc/mounts
-        f_proc_mounts = open("/proc/mounts", 'r')
-        try:
-            curr_lnetdev = None
-            for line in f_proc_mounts:
-                if line.find(" %s lustre " % self.mount_path) > 0:
-                    lnetdev, mntp = line.split(' ', 2)[0:2]
-                    if loaded:
-                        curr_lnetdev = lnetdev
-                        self.state = MOUNTED
-                        self.mtpt = mntp
-                    else:
-                        self.state = CLIENT_ERROR
-                        if lnetdev != curr_lnetdev:
-                            raise ComponentError(self, "conflicting mounts "
-                                                "detected for %s and %s on %s" %
-                                                 (lnetdev, curr_lnetdev,
-                                                  self.mount_path))
-                        else:
-                            raise ComponentError(self, "multiple mounts "
-                                                 "detected for %s (%s)" %
-                                                 (lnetdev, self.mount_path))
-        finally:
-            f_proc_mounts.close()
+        curr_lnetdev = None
+        for lnetdev, mntp, fstype in procfs.mounts_by_path(self.mount_path):
+            if fstype != "lustre":
+                continue
+            if loaded:
+                curr_lnetdev = lnetdev
+                self.state = MOUNTED
+                self.mtpt = mntp
+            else:
+                self.state = CLIENT_ERROR
+                if lnetdev != curr_lnetdev:
+                    raise ComponentError(self, "conflicting mounts "
+                                        "detected for %s and %s on %s" %
+                                         (lnetdev, curr_lnetdev,
+                                          self.mount_path))
+                else:
+                    raise ComponentError(self, "multiple mounts "
+                                         "detected for %s (%s)" %
+                                         (lnetdev, self.mount_path))
 
         if loaded and self.state != MOUNTED:
             # up but not mounted = incoherent state
@@ -160,9 +190,9 @@ class Client(Component):
         """Check current target status in /proc/fs/lustre/*/*/state"""
 
         self.proc_states = {}
-        for entry in glob("/proc/fs/lustre/??c/%s-*/state" % self.fs.fs_name):
-            f_state = open(entry, 'r')
-            for line in f_state:
+        procfs = ProcSnapshot.snapshot()
+        for entry, lines in procfs.import_states(self.fs.fs_name):
+            for line in lines:
                 if line.startswith('current_state:'):
                     state_name = line.split(None, 1)[1].strip()
 
@@ -180,7 +210,6 @@ class Client(Component):
                     self.proc_states[state_name] += 1
                     # Stop reading other file lines
                     break
-            f_state.close()
 
         if 'EVICTED' in self.proc_states:
             self.state = CLIENT_ERROR
@@ -215,3 +244,203 @@ class Client(Component):
     def umount(self, **kwargs):
         """Umount a Lustre client."""
         return StopClient(self, **kwargs)
+
+
+class ClientSet(Client):
+    """
+    All the client nodes of a filesystem sharing the same mount path and
+    mount options, as one component.
+
+    Its server is a Server whose hostname is the NodeSet of all these nodes,
+    so a single proxy action runs on all of them. Node states are kept in an
+    array, in NodeSet order, and state is the worst of them. Import state
+    counts are only kept for the nodes reporting some, and proc_states sums
+    them. Client nodes are only known through their name: a ClientSet could
+    not be checked nor acted on locally.
+    """
+
+    __slots__ = ('_node_states', '_positions', '_node_procs')
+
+    # Value stored in the state array for unknown states
+    UNKNOWN = -1
+
+    def __init__(self, fs, server, mount_path, mount_options=None,
+                 enabled=True):
+        self._node_states = array('b', [self.UNKNOWN] * len(server.hostname))
+        self._positions = None
+        self._node_procs = {}
+        Client.__init__(self, fs, server, mount_path, mount_options, enabled)
+
+    @property
+    def nodes(self):
+        """NodeSet of all client nodes."""
+        return self.server.hostname
+
+    def uniqueid(self):
+        """
+        Return a unique string representing this client set.
+
+        This takes its nodes and self.mount_path in account.
+        """
+        return "%s-[%s]-%s" % (self.label, self.nodes, self.mount_path)
+
+    def node_server(self, node):
+        """Return a Server for `node', one of my client nodes."""
+        return Server(node, [], self.server.hdlr)
+
+    #
+    # Per-node states
+    #
+
+    def _position(self, node):
+        """Return the index of `node' in the state array."""
+        if self._positions is None:
+            self._positions = dict([(name, pos) for pos, name in
+                                    enumerate(self.nodes)])
+        return self._positions[node]
+
+    def get_node_state(self, node):
+        """Return the state of `node'."""
+        state = self._node_states[self._position(node)]
+        if state == self.UNKNOWN:
+            return None
+        return state
+
+    def set_node_state(self, node, state):
+        """Update the state of `node'."""
+        if state is None:
+            state = self.UNKNOWN
+        self._node_states[self._position(node)] = state
+        self._changed()
+
+    def get_state(self):
+        """Return the worst known state of client nodes, if any."""
+        known = [state for state in set(self._node_states)
+                 if state != self.UNKNOWN]
+        if not known:
+            return None
+        return max(known)
+
+    def set_state(self, value):
+        """Set the state of all client nodes."""
+        if value is None:
+            value = self.UNKNOWN
+        self._node_states = array('b', [value] * len(self._node_states))
+        self._changed()
+
+    state = property(get_state, set_state)
+
+    def _set_node_procs(self, node, proc_states):
+        """Update import state counts of `node' and their sums."""
+        if proc_states:
+            self._node_procs[node] = dict(proc_states)
+        elif self._node_procs.pop(node, None) is None:
+            return
+        self._sum_procs()
+
+    def _sum_procs(self):
+        """Compute proc_states from import state counts of all nodes."""
+        self.proc_states = {}
+        for proc_states in self._node_procs.itervalues():
+            for state, count in proc_states.iteritems():
+                self.proc_states[state] = self.proc_states.get(state, 0) + \
+                                          count
+
+    def iter_states(self):
+        """Iterate over (state, NodeSet) of client nodes, per state."""
+        bystate = {}
+        for node, state in zip(self.nodes, self._node_states):
+            bystate.setdefault(state, []).append(node)
+        for state, nodes in bystate.iteritems():
+            if state == self.UNKNOWN:
+                state = None
+            yield state, NodeSet.fromlist(nodes)
+
+    def split(self):
+        """
+        Return a list of ClientSet, one for each state of my nodes.
+
+        This is only useful for display purpose.
+        """
+        states = list(self.iter_states())
+        if len(states) <= 1:
+            return [self]
+        sets = []
+        for state, nodes in states:
+            server = Server(str(nodes), [], self.server.hdlr)
+            server.action_enabled = self.server.action_enabled
+            clients = ClientSet(self.fs, server, self.mount_path,
+                                self.mount_options, self.action_enabled)
+            clients.state = state
+            clients.mtpt = self.mtpt
+            for node, proc_states in self._node_procs.iteritems():
+                if node in nodes:
+                    clients._node_procs[node] = proc_states
+            clients._sum_procs()
+            sets.append(clients)
+        return sets
+
+    def update(self, other):
+        """
+        Update the state of a client node from other/distant Client, whose
+        server is this node.
+        """
+        node = str(other.server.hostname)
+        self.set_node_state(node, other.state)
+        if getattr(other, 'mtpt', None) is not None:
+            self.mtpt = other.mtpt
+        self._set_node_procs(node, getattr(other, 'proc_states', {}))
+
+    def state_record(self):
+        """
+        Return a compact dict of my serializable fields.
+        """
+        record = Client.state_record(self)
+        record['nodes'] = str(self.nodes)
+        record['node_states'] = self._node_states.tolist()
+        return record
+
+    def update_record(self, record, server):
+        """
+        Update the state of `server' client node from a Client record.
+
+        The mount point is kept for the whole set.
+        """
+        node = str(server.hostname)
+        self.set_node_state(node, record['state'])
+        if record.get('mtpt') is not None:
+            self.mtpt = record['mtpt']
+        self._set_node_procs(node, record.get('proc_states'))
+
+    def clear_state(self, nodes=None):
+        """
+        Forget the state of my client nodes in `nodes' (all of them by
+        default), before they are checked again.
+        """
+        if nodes is None:
+            self.state = None
+            self._node_procs = {}
+            self._sum_procs()
+            return
+        for node in self.nodes.intersection(nodes):
+            self._node_states[self._position(node)] = self.UNKNOWN
+            self._node_procs.pop(node, None)
+        self._sum_procs()
+        self._changed()
+
+    def sanitize_state(self, nodes=None):
+        """
+        Clean state of my client nodes in `nodes', if they were not reported.
+        """
+        if nodes is None:
+            nodes = self.nodes
+        else:
+            nodes = self.nodes.intersection(nodes)
+        for node in nodes:
+            if self.get_node_state(node) is None:
+                self.set_node_state(node, RUNTIME_ERROR)
+
+
+    def lustre_check(self):
+        """A ClientSet is never checked locally."""
+        raise ComponentError(self, "client set could not be checked locally")
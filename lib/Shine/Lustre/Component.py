@@ -19,8 +19,9 @@
 #
 
 import sys
+import weakref
 
-from itertools import ifilter, groupby
+from itertools import groupby
 from operator import attrgetter, itemgetter
 
 from ClusterShell.NodeSet import NodeSet
@@ -38,7 +39,7 @@ RUNTIME_ERROR = 7
 INACTIVE = 8
 MIGRATED = 9
 
-from Shine.Lustre import ComponentError
+from Shine.Lustre import ComponentError, slots_getstate, slots_setstate
 from Shine.Lustre.Server import ServerGroup
 from Shine.Lustre.Actions.Status import Status
 from Shine.Lustre.Actions.Execute import Execute
@@ -62,9 +63,19 @@ class Component(object):
     # Text mapping for each possible states
     STATE_TEXT_MAP = {}
 
+    # Components are created per node, they have no instance dict.
+    __slots__ = ('fs', '_server', '_state', 'action_enabled',
+                 '_running_actions', '_mode', 'active', '_groups')
+
+    # Slots pickled under their public name, as by older shine versions.
+    PICKLE_NAMES = (('_server', 'server'), ('_state', 'state'))
+
     def __init__(self, fs, server, enabled = True, mode = 'managed',
                  active = 'manual'):
 
+        # Weak references to the groups indexing me, see _watch().
+        self._groups = ()
+
         # File system
         self.fs = fs
 
@@ -77,8 +88,8 @@ class Component(object):
         # Enabled or not
         self.action_enabled = enabled
 
-        # List of running action
-        self._running_actions = []
+        # Running actions. It is replaced, never updated in place.
+        self._running_actions = ()
 
         # Component behaviour change depending on its mode.
         self._mode = mode
@@ -94,6 +105,44 @@ class Component(object):
         """
         return "%s-%s" % (self.fs.fs_name, self.TYPE)
 
+    def get_server(self):
+        """Return the server this component currently runs on."""
+        return self._server
+
+    def set_server(self, server):
+        """Change the component server (failover) and tell my groups."""
+        self._server = server
+        self._changed()
+
+    server = property(get_server, set_server)
+
+    def get_state(self):
+        """Return the component state."""
+        return self._state
+
+    def set_state(self, value):
+        """Update the component state and tell my groups."""
+        self._state = value
+        self._changed()
+
+    state = property(get_state, set_state)
+
+    def _watch(self, group):
+        """
+        Tell `group' each time my server or state is changed, so it could
+        update its indexes. Only a weak reference to `group' is kept.
+        """
+        refs = [ref for ref in self._groups if ref() is not None]
+        refs.append(weakref.ref(group))
+        self._groups = tuple(refs)
+
+    def _changed(self):
+        """Notify the groups watching me that my server or state changed."""
+        for ref in self._groups:
+            group = ref()
+            if group is not None:
+                group._reindex(self)
+
     def allservers(self):
         """
         Return all servers this target can run on. On standard component
@@ -105,6 +154,10 @@ class Component(object):
         """Return a unique string representing this component."""
         return "%s-%s" % (self.label, ','.join(self.server.nids))
 
+    def node_server(self, node):
+        """Return the server of this component running on `node'."""
+        return self.allservers().select(NodeSet(node))[0]
+
     def longtext(self):
         """
         Return a string describing this component, for output purposes.
@@ -124,6 +177,28 @@ class Component(object):
         """
         self.state = other.state
 
+    def state_record(self):
+        """
+        Return a compact dict of my serializable fields, sent to the
+        distant shine instead of the whole object (see shine_msg_pack()).
+        """
+        return {'type': self.TYPE, 'id': self.uniqueid(), 'state': self.state,
+                'fs': self.fs.fs_name}
+
+    def update_record(self, record, server):
+        """
+        Update my serializable fields from a record sent by `server'.
+        """
+        self.state = record['state']
+
+    def clear_state(self, nodes=None):
+        """
+        Forget component state on `nodes' (all its nodes by default), before
+        it is checked again.
+        """
+        if nodes is None or str(self.server.hostname) in nodes:
+            self.state = None
+
     def sanitize_state(self, nodes=None):
         """
         Clean component state if it is wrong.
@@ -146,13 +221,20 @@ class Component(object):
             self.state = RUNTIME_ERROR
 
     def __getstate__(self):
-        odict = self.__dict__.copy()
-        del odict['fs']
+        odict = slots_getstate(self, ignore=('fs', '_groups'))
+        for slot, name in self.PICKLE_NAMES:
+            if slot in odict:
+                odict[name] = odict.pop(slot)
         return odict
 
     def __setstate__(self, state):
-        self.__dict__.update(state)
+        odict = dict(state)
+        for slot, name in self.PICKLE_NAMES:
+            if name in odict:
+                odict[slot] = odict.pop(name)
+        slots_setstate(self, odict)
         self.fs = None
+        self._groups = ()
 
     #
     # Component behaviour
@@ -208,13 +290,15 @@ class Component(object):
         """
         Add the named action to the running action list.
         """
-        self._running_actions.append(act)
+        self._running_actions += (act,)
 
     def _del_action(self, act):
         """
         Remove the named action from the running action list.
         """
-        self._running_actions.remove(act)
+        actions = list(self._running_actions)
+        actions.remove(act)
+        self._running_actions = tuple(actions)
 
     def _list_action(self):
         """
@@ -262,12 +346,95 @@ class Component(object):
 class ComponentGroup(object):
     """
     Gather and efficiently manipulate list of Components.
+
+    Components are also indexed by TYPE. Components supporting an action
+    and derived NodeSets (labels()) are computed once and kept until the
+    group is modified.
+
+    Indexes by server hostname and by state are built on first use. The
+    group then watches its components, which notify it when their server
+    or state is changed (see Component._watch()).
     """
 
     def __init__(self, iterable=None):
         self._elems = {}
+        self._bytype = {}
+        self._cache = {}
+        # (by hostname, by state, per-component keys), see _indexes()
+        self._index = None
         if iterable:
-            self._elems = dict([(comp.uniqueid(), comp) for comp in iterable])
+            for comp in iterable:
+                self._insert(comp.uniqueid(), comp)
+
+    @classmethod
+    def _from_items(cls, items):
+        """
+        Return a new group from (uniqueid, component) tuples, without
+        computing unique ids again.
+        """
+        grp = cls()
+        for compid, comp in items:
+            grp._insert(compid, comp)
+        return grp
+
+    def _insert(self, compid, comp):
+        """Add or replace `comp' in the group and its indexes."""
+        if self._index is not None and compid in self._elems:
+            self._unindex(self._elems[compid])
+        self._elems[compid] = comp
+        self._bytype.setdefault(comp.TYPE, {})[compid] = comp
+        self._cache.clear()
+        if self._index is not None:
+            self._index_comp(compid, comp)
+
+    #
+    # Server and state indexes
+    #
+
+    def _indexes(self):
+        """Return the (by hostname, by state) indexes, built on first use."""
+        if self._index is None:
+            self._index = ({}, {}, {})
+            for compid, comp in self._elems.iteritems():
+                self._index_comp(compid, comp)
+        return self._index[0], self._index[1]
+
+    def _index_comp(self, compid, comp):
+        """Add `comp' to server and state indexes, and watch it."""
+        byserver, bystate, keys = self._index
+        hostname = str(comp.server.hostname)
+        state = comp.state
+        byserver.setdefault(hostname, {})[compid] = comp
+        bystate.setdefault(state, {})[compid] = comp
+        keys[id(comp)] = (compid, hostname, state)
+        comp._watch(self)
+
+    def _unindex(self, comp):
+        """Remove `comp' from server and state indexes."""
+        byserver, bystate, keys = self._index
+        compid, hostname, state = keys.pop(id(comp))
+        _discard(byserver, hostname, compid)
+        _discard(bystate, state, compid)
+
+    def _reindex(self, comp):
+        """
+        Move `comp' in server and state indexes after one of them was
+        changed. Called by the component itself, see Component._changed().
+        """
+        if self._index is None or id(comp) not in self._index[2]:
+            return
+        byserver, bystate, keys = self._index
+        compid, hostname, state = keys[id(comp)]
+        newhost = str(comp.server.hostname)
+        newstate = comp.state
+        if newhost != hostname:
+            _discard(byserver, hostname, compid)
+            byserver.setdefault(newhost, {})[compid] = comp
+            self._cache.pop('servers', None)
+        if newstate != state:
+            _discard(bystate, state, compid)
+            bystate.setdefault(newstate, {})[compid] = comp
+        keys[id(comp)] = (compid, newhost, newstate)
 
     def __len__(self):
         return len(self._elems)
@@ -291,10 +458,11 @@ class ComponentGroup(object):
         Raises a KeyError if a component
         with the same uniqueid() is already added.
         """
-        if component in self:
+        compid = component.uniqueid()
+        if compid in self._elems:
             raise KeyError("A component with id %s already exists." %
-                           component.uniqueid())
-        self._elems[component.uniqueid()] = component
+                           compid)
+        self._insert(compid, component)
  
     def update(self, iterable):
         """
@@ -310,9 +478,12 @@ class ComponentGroup(object):
         """
         if not isinstance(other, ComponentGroup):
             return NotImplemented 
-        grp = ComponentGroup()
-        grp.update(iter(self))
-        grp.update(iter(other))
+        grp = ComponentGroup._from_items(self._elems.iteritems())
+        for compid, comp in other._elems.iteritems():
+            if compid in grp._elems:
+                raise KeyError("A component with id %s already exists." %
+                               compid)
+            grp._insert(compid, comp)
         return grp
 
     #
@@ -321,11 +492,18 @@ class ComponentGroup(object):
 
     def labels(self):
         """Return a NodeSet containing all component label."""
-        return NodeSet.fromlist((comp.label for comp in self))
+        if 'labels' not in self._cache:
+            self._cache['labels'] = NodeSet.fromlist((comp.label
+                                                      for comp in self))
+        return self._cache['labels'].copy()
 
     def servers(self):
         """Return a NodeSet containing all component servers."""
-        return NodeSet.fromlist((comp.server.hostname for comp in self))
+        # Dropped by _reindex() when a component server changes (failover).
+        if 'servers' not in self._cache:
+            byserver = self._indexes()[0]
+            self._cache['servers'] = NodeSet.fromlist(byserver.iterkeys())
+        return self._cache['servers'].copy()
 
     def allservers(self):
         """Return a NodeSet containing all component servers and fail
@@ -339,6 +517,35 @@ class ComponentGroup(object):
     # Filtering methods
     #
 
+    def _supporting(self, supports):
+        """Return the (cached) ComponentGroup of components capable of
+        `supports'."""
+        cachekey = ('supports', supports)
+        if cachekey not in self._cache:
+            self._cache[cachekey] = ComponentGroup._from_items(
+                                        [(compid, comp) for compid, comp
+                                         in self._elems.iteritems()
+                                         if comp.capable(supports)])
+        return self._cache[cachekey]
+
+    def bytype(self, comptype):
+        """Return a new ComponentGroup with only the components of type
+        `comptype' (ie: MDT.TYPE)."""
+        return ComponentGroup._from_items(
+                                self._bytype.get(comptype, {}).iteritems())
+
+    def byserver(self, hostname):
+        """Return a new ComponentGroup with only the components currently
+        running on `hostname'."""
+        return ComponentGroup._from_items(
+                    self._indexes()[0].get(str(hostname), {}).iteritems())
+
+    def bystate(self, state):
+        """Return a new ComponentGroup with only the components in `state'
+        (ie: MOUNTED)."""
+        return ComponentGroup._from_items(
+                    self._indexes()[1].get(state, {}).iteritems())
+
     def filter(self, supports=None, key=None):
         """
         Returns a new ComponentGroup instance containing only the component
@@ -349,14 +556,15 @@ class ComponentGroup(object):
         Example: Return only the OST from the group
         >>> group.filter(key=lambda t: t.TYPE == OST.TYPE)
         """
-        if supports and not key:
-            filter_key = lambda x: x.capable(supports)
-        elif supports and key:
-            filter_key = lambda x: key(x) and x.capable(supports)
+        if supports:
+            items = self._supporting(supports)._elems.iteritems()
         else:
-            filter_key = key
+            items = self._elems.iteritems()
 
-        return ComponentGroup(ifilter(filter_key, iter(self)))
+        if key is not None:
+            items = [(compid, comp) for compid, comp in items if key(comp)]
+
+        return ComponentGroup._from_items(items)
 
     def enabled(self):
         """Uses filter() to return only the enabled components."""
@@ -397,32 +605,43 @@ class ComponentGroup(object):
         """
         assert (not (attr and key)), "Unsupported: attr and supports"
 
+        # TYPE and state are indexed, no need to sort all components.
+        if attr == 'TYPE':
+            return ((comptype, self.bytype(comptype)) for comptype in
+                    sorted(self._bytype, reverse=reverse))
+        if attr == 'state':
+            return ((state, self.bystate(state)) for state in
+                    sorted(self._indexes()[1], reverse=reverse))
+
         if key is None and attr is not None:
             key = attrgetter(attr)
 
         # Sort the components using the key, and then group results 
         # using the same key.
-        sortlist = sorted(iter(self), key=key, reverse=reverse)
-        grouped = groupby(sortlist, key)
-        return ((grpkey, ComponentGroup(comps)) for grpkey, comps in grouped)
+        itemkey = lambda (compid, comp): key(comp)
+        sortlist = sorted(self._elems.iteritems(), key=itemkey,
+                          reverse=reverse)
+        grouped = groupby(sortlist, itemkey)
+        return ((grpkey, ComponentGroup._from_items(items))
+                for grpkey, items in grouped)
 
     def groupbyallservers(self):
         """
         Group components per server taking into account
         all possible servers for each component.
         """
-        # Create a list of (server, component) tuples
+        # Create a list of (server, (uniqueid, component)) tuples
         srvcomps = []
-        for comp in self:
-            for srv in comp.allservers():
-                srvcomps.append((srv, comp))
+        for item in self._elems.iteritems():
+            for srv in item[1].allservers():
+                srvcomps.append((srv, item))
 
         # Sort the components using the server name in each tuple as key,
         # and then, group results using the same key.
         sortlist = sorted(srvcomps, key=itemgetter(0))
         grouped = groupby(sortlist, key=itemgetter(0))
 
-        return ((grpkey, ComponentGroup(map(itemgetter(1), tpl)))
+        return ((grpkey, ComponentGroup._from_items(map(itemgetter(1), tpl)))
                 for grpkey, tpl in grouped)
 
 
@@ -432,3 +651,11 @@ class ComponentGroup(object):
             return self.groupby(attr='server')
         else:
             return self.groupbyallservers()
+
+
+def _discard(index, key, compid):
+    """Remove `compid' from `index'[`key'], and the key once empty."""
+    entries = index[key]
+    del entries[compid]
+    if not entries:
+        del index[key]
@@ -25,10 +25,15 @@ Lustre Disk abstraction module.
 
 import copy
 import os
+import re
 import stat
+import struct
 import subprocess
 
 from Shine.Configuration.Globals import Globals
+from Shine.Lustre import ProcSnapshot
+from Shine.Lustre.Mountdata import read_mountdata, MountdataError, \
+                                  SB_OFFSET, EXT2_SUPER_MAGIC
 
 ### From lustre/include/lustre_disk.h:
 
@@ -41,6 +46,37 @@ LDD_F_WRITECONF = 0x0100    # regenerate all logs for this fs
 LDD_F_UPGRADE14 = 0x0200    # COMPAT_14
 LDD_F_PARAM = 0x0400        # process as lctl conf_param
 
+# Superblock size, see Shine.Lustre.Mountdata for other ext4 definitions.
+SB_SIZE = 1024
+
+# Mountdata read by tunefs.lustre, indexed by Disk._mountdata_key()
+_MOUNTDATA_CACHE = {}
+
+def reset_mountdata_cache():
+    """Forget all mountdata read by this process."""
+    _MOUNTDATA_CACHE.clear()
+
+# Block devices in sysfs, see device_controller().
+SYSFS_BLOCK = '/sys/class/block'
+
+def device_controller(dev):
+    """
+    Return the sysfs path of the storage controller of the block device
+    `dev', or None if it is unknown or virtual (loop, device-mapper, ...).
+
+    SCSI devices are grouped by their host adapter, the other ones (NVMe,
+    virtio, ...) by the device holding their block directory.
+    """
+    name = os.path.basename(os.path.realpath(dev))
+    path = os.path.realpath(os.path.join(SYSFS_BLOCK, name))
+    parts = path.split(os.sep)
+    if 'block' not in parts or 'virtual' in parts:
+        return None
+    for pos, part in enumerate(parts):
+        if re.match(r'host\d+$', part):
+            return os.sep.join(parts[:pos])
+    return os.sep.join(parts[:parts.index('block')])
+
 
 class DiskDeviceError(Exception):
     """
@@ -51,12 +87,20 @@ class DiskDeviceError(Exception):
         self._disk = disk
 
 
-class Disk:
+class Disk(object):
     """
     Represents a low-level Lustre Disk as defined in lustre/include/
     lustre_disk.h. Base class for Lustre Target (see Target.py).
+
+    Disk has no attribute storage of its own, classes using it declare
+    FIELDS in their __slots__.
     """
 
+    __slots__ = ()
+
+    FIELDS = ('dev', 'dev_isblk', 'dev_size', 'ldd_svname', '_ldd_flags',
+              '_probe_key', '_probed')
+
     def __init__(self, dev):
         self.dev = dev
 
@@ -68,6 +112,10 @@ class Disk:
         self.ldd_svname = None
         self._ldd_flags = 0
 
+        # filled by mountdata_probe() and mountdata_probed()
+        self._probe_key = None
+        self._probed = None
+
     def update(self, other):
         """
         Update my serializable fields from other/distant object.
@@ -77,6 +125,24 @@ class Disk:
         self.ldd_svname = copy.copy(other.ldd_svname)
         self._ldd_flags = other._ldd_flags
 
+    def state_record(self):
+        """
+        Return a compact dict of my serializable fields.
+        """
+        return {'dev_isblk': self.dev_isblk,
+                'dev_size': self.dev_size,
+                'ldd_svname': self.ldd_svname,
+                'ldd_flags': self._ldd_flags}
+
+    def update_record(self, record):
+        """
+        Update my serializable fields from a distant record.
+        """
+        self.dev_isblk = record['dev_isblk']
+        self.dev_size = record['dev_size']
+        self.ldd_svname = record['ldd_svname']
+        self._ldd_flags = record['ldd_flags']
+
     def _device_check(self):
         """
         Device sanity checking based on the stat() syscall.
@@ -92,16 +158,10 @@ class Disk:
             # block device
             self.dev_isblk = True
             # get dev size
-            partitions = open("/proc/partitions", 'r')
-            try:
-                dev = os.path.basename(os.path.realpath(self.dev))
-                for line in partitions:
-                    d_info = line.rstrip('\n').split(' ')
-                    if len(d_info) > 1 and d_info[-1] == dev:
-                        self.dev_size = int(d_info[-2]) * 1024
-                        break
-            finally:
-                partitions.close()
+            dev = os.path.basename(os.path.realpath(self.dev))
+            size = ProcSnapshot.snapshot().partition_size(dev)
+            if size is not None:
+                self.dev_size = size
 
         elif stat.S_ISREG(mode):
             # regular file
@@ -111,29 +171,137 @@ class Disk:
             # unsupported
             raise DiskDeviceError(self, "unsupported device type")
 
-    def _mountdata_check(self, label_check=None):
-        """Read device flags using 'tunefs.lustre'"""
+    def _mountdata_key(self):
+        """
+        Return a key identifying current device content, or None.
 
+        It is based on device name, st_rdev and ldiskfs superblock mount and
+        write times, which change each time mountdata could be modified.
+        """
+        try:
+            info = os.stat(self.dev)
+            fdev = open(self.dev, 'rb')
+            try:
+                fdev.seek(SB_OFFSET)
+                sblock = fdev.read(SB_SIZE)
+            finally:
+                fdev.close()
+        except (OSError, IOError):
+            return None
+
+        if len(sblock) < SB_SIZE:
+            return None
+        mtime, wtime, mnt_count, magic = struct.unpack('<IIHxxH',
+                                                       sblock[44:58])
+        if magic != EXT2_SUPER_MAGIC:
+            return None
+
+        key = (self.dev, info.st_rdev, mtime, wtime, mnt_count)
+        if stat.S_ISREG(info.st_mode):
+            key += (info.st_mtime, info.st_size)
+        return key
+
+    def _mountdata_cmd(self):
+        """Return the command line used to read device mountdata."""
         cmd = "tunefs.lustre --dryrun %s" % self.dev
         path = Globals().get('command_path')
         if path:
             cmd = "export PATH=%s:${PATH}; %s" % (path, cmd)
+        return cmd
+
+    def _mountdata_read(self, key):
+        """
+        Get device flags without running 'tunefs.lustre', from cache or, if
+        enabled, directly from the device.
+
+        Return True if they were found.
+        """
+        if key is not None and key in _MOUNTDATA_CACHE:
+            self._ldd_flags, self.ldd_svname = _MOUNTDATA_CACHE[key]
+            return True
+
+        if not Globals().get('native_mountdata'):
+            return False
+
+        try:
+            self._ldd_flags, self.ldd_svname = read_mountdata(self.dev)
+        except (MountdataError, IOError):
+            return False
+
+        if key is not None:
+            _MOUNTDATA_CACHE[key] = (self._ldd_flags, self.ldd_svname)
+        return True
+
+    def mountdata_probe(self):
+        """
+        Return the command line reading device mountdata or None if they
+        are already known.
+
+        Command output should be given to mountdata_probed().
+        """
+        self._probed = None
+        # Missing device will be reported by _device_check()
+        if not os.path.exists(self.dev):
+            return None
 
-        process = subprocess.Popen([cmd], stdout=subprocess.PIPE,
-                                   stderr=subprocess.PIPE, shell=True)
-        output = process.communicate()[0]
-        if process.returncode > 0:
+        self._probe_key = self._mountdata_key()
+        if self._mountdata_read(self._probe_key):
+            self._probed = (0, None)
+            return None
+
+        return self._mountdata_cmd()
+
+    def mountdata_probed(self, retcode, output):
+        """
+        Record the result of mountdata_probe() command.
+
+        It will be used by next _mountdata_check() call.
+        """
+        self._probed = (retcode, output)
+
+    def mountdata_forget(self):
+        """Drop cached mountdata for this device, as they were modified."""
+        for key in [key for key in _MOUNTDATA_CACHE if key[0] == self.dev]:
+            del _MOUNTDATA_CACHE[key]
+
+    def _mountdata_check(self, label_check=None):
+        """
+        Read device flags using 'tunefs.lustre'.
+
+        Flags are cached as long as the device content does not change. If
+        mountdata_probe() was called before, its result is used.
+        """
+        if self._probed is not None:
+            key = self._probe_key
+            retcode, output = self._probed
+            self._probed = None
+        else:
+            key = self._mountdata_key()
+            if self._mountdata_read(key):
+                retcode, output = 0, None
+            else:
+                process = subprocess.Popen([self._mountdata_cmd()],
+                                           stdout=subprocess.PIPE,
+                                           stderr=subprocess.PIPE, shell=True)
+                output = process.communicate()[0]
+                retcode = process.returncode
+
+        if retcode > 0:
             raise DiskDeviceError(self, "Failed to run 'tunefs.lustre' to " +
-                                  "read flags (rc=%d)" % process.returncode)
-
-        for line in output.splitlines():
-            line = line.strip()
-            if line.startswith('Flags:'):
-                self._ldd_flags = int(line.split(':')[1], 16)
-            elif line.startswith('Target:'):
-                self.ldd_svname = line.split(':', 1)[1].strip()
-            elif line.startswith('Permanent disk data:'):
-                break
+                                  "read flags (rc=%d)" % retcode)
+
+        # Flags were not already read, parse command output.
+        if output is not None:
+            for line in output.splitlines():
+                line = line.strip()
+                if line.startswith('Flags:'):
+                    self._ldd_flags = int(line.split(':')[1], 16)
+                elif line.startswith('Target:'):
+                    self.ldd_svname = line.split(':', 1)[1].strip()
+                elif line.startswith('Permanent disk data:'):
+                    break
+            if key is not None:
+                _MOUNTDATA_CACHE[key] = (self._ldd_flags, self.ldd_svname)
 
         if label_check:
             # Lustre 2.3 changed the label patterns.
@@ -35,15 +35,18 @@ from ClusterShell.NodeSet import NodeSet
 from ClusterShell.Task import task_self
 
 from Shine.Configuration.Globals import Globals
+from Shine.Configuration.FileSystem import COMPILED_SUFFIX
 
-from Shine.Lustre.Actions.Action import ActionGroup, ACT_ERROR
-from Shine.Lustre.Actions.Proxy import FSProxyAction
+from Shine.Lustre.Actions.Action import ActionGroup, ACT_ERROR, \
+                                       reset_resources
+from Shine.Lustre.Actions.Proxy import FSProxyAction, FSMultiProxyAction
 from Shine.Lustre.Actions.Install import Install
+from Shine.Lustre import ProcSnapshot, StatusCache, FSError, FSRemoteError
 
 from Shine.Lustre.EventHandler import EventHandler
 from Shine.Lustre.Component import ComponentGroup
 from Shine.Lustre.Server import Server
-from Shine.Lustre.Client import Client
+from Shine.Lustre.Client import Client, ClientSet
 from Shine.Lustre.Router import Router
 from Shine.Lustre.Target import MGT, MDT, OST, Journal
 # FileSystem class needs to re-export all Target status, they are used in
@@ -53,23 +56,55 @@ from Shine.Lustre.Component import INPROGRESS, EXTERNAL, MOUNTED, \
                                    CLIENT_ERROR, TARGET_ERROR, MIGRATED
 
 
-class FSError(Exception):
+def _start_order(comp, orders=None):
     """
-    Base FileSystem error exception.
+    Return the start order of `comp', unless `orders' dict gives another one
+    for its type.
     """
+    if orders and comp.TYPE in orders:
+        return orders[comp.TYPE]
+    return comp.START_ORDER
 
-class FSRemoteError(FSError):
+def _start_kind(comp, orders=None):
+    """Return what matters in `comp' for start dependencies."""
+    is_mdt0 = (comp.TYPE == MDT.TYPE and comp.index == 0)
+    return (_start_order(comp, orders), comp.TYPE, is_mdt0)
+
+def _start_needs(kind, other):
     """
-    Remote host(s) not available, or a remote operation failed.
+    Tell if components of `kind' could only be started once the ones of
+    `other' kind are (see _start_kind()).
     """
-    def __init__(self, nodes, rc, msg):
-        FSError.__init__(self)
-        self.msg = msg
-        self.nodes = nodes
-        self.rc = int(rc)
-
-    def __str__(self):
-        return "%s: %s [rc=%d]" % (self.nodes, self.msg, self.rc)
+    order, comptype, is_mdt0 = kind
+    other_order, other_type, other_is_mdt0 = other
+    if comptype in (OST.TYPE, MDT.TYPE):
+        # MGS, and routers, should be up.
+        if other_order <= MGT.START_ORDER:
+            return True
+        # DNE: MDT0 is started before the other MDTs.
+        if comptype == MDT.TYPE and not is_mdt0 and other_is_mdt0:
+            return True
+        # On first start or writeconf, MDTs are started before OSTs.
+        return comptype == OST.TYPE and other_type == MDT.TYPE and \
+               other_order < order
+    # Other components keep the usual start order.
+    return other_order < order
+
+
+# Actions run by FileSystem._launch(): expected states, whether action
+# results are checked, and default _prepare() options.
+_SIMPLE_ACTIONS = {
+    'format':  ([OFFLINE], True, {}),
+    'tunefs':  ([OFFLINE], True, {}),
+    'fsck':    ([OFFLINE], True, {}),
+    # Here we check MOUNTED but in fact, any status is OK.
+    'status':  ([MOUNTED], False, {'allservers': True}),
+    'stop':    ([OFFLINE], False, {'groupby': 'START_ORDER', 'reverse': True,
+                                   'need_unload': True}),
+    'mount':   ([MOUNTED], True, {}),
+    'umount':  ([OFFLINE], False, {'need_unload': True}),
+    'execute': ([MOUNTED], True, {}),
+}
 
 
 class FileSystem:
@@ -88,12 +123,19 @@ class FileSystem:
         # file system MGT
         self.mgt = None
 
+        # Client sets, each one gathering many client nodes
+        self._client_sets = []
+
         # Local server reference
         self.local_server = None
 
         self.debug = False
         self.logger = self._setup_logging()
 
+        # If set, proxy actions are shared with other file systems, indexed
+        # by action name and servers (see multi_status()).
+        self._proxies = None
+
     def set_debug(self, debug):
         self.debug = debug
 
@@ -147,7 +189,9 @@ class FileSystem:
 
         # Update the local component instance with the provided instance
         # if one is available in params.
-        if evtype == 'comp':
+        if evtype == 'comp' and isinstance(params['info'].elem, dict):
+            self._apply_record(node, params)
+        elif evtype == 'comp':
             other = params['info'].elem
             other.fs = self
             try:
@@ -159,15 +203,17 @@ class FileSystem:
                     target.journal.update(other)
                     comp = target.journal
                 else:
-                    comp = self.components[other.uniqueid()]
+                    comp = self._find_component(other.uniqueid(), node,
+                                                other.TYPE,
+                                                getattr(other, 'mount_path',
+                                                        None))
                     # comp.update() updates the component state
                     # and disk information if the component is a target.
                     # These information don't need to be updated unless
                     # we are on a completion event.
                     if params['status'] not in ('start', 'progress'):
                         # ensure other.server is the actual distant server
-                        other.server = comp.allservers().select(
-                                                            NodeSet(node))[0]
+                        other.server = comp.node_server(node)
 
                         # update target from remote one
                         comp.update(other)
@@ -180,6 +226,70 @@ class FileSystem:
 
         self.hdlr.event_callback(evtype, node=node, **params)
 
+    def _apply_record(self, node, params):
+        """
+        Update the local component from a compact state record (v4 proxy
+        messages) and substitute it in event parameters.
+        """
+        record = params['info'].elem
+        try:
+            # Journal objects are not in components list.
+            if record['type'] == Journal.TYPE:
+                comp = self.components[record['target']].journal
+                comp.update_record(record, comp.server)
+            else:
+                comp = self._find_component(record['id'], node,
+                                            record['type'],
+                                            record.get('mount_path'))
+                # Component is updated only on completion events.
+                if params['status'] not in ('start', 'progress'):
+                    comp.update_record(record, comp.node_server(node))
+
+            params['info'].elem = comp
+            params['comp'] = comp
+        except KeyError, error:
+            print >> sys.stderr, "ERROR: Component update " \
+                                 "failed (%s)" % str(error)
+
+    def _find_component(self, compid, node, comptype, mount_path=None):
+        """
+        Return the component with `compid' unique id.
+
+        Distant clients belonging to a client set are only known through
+        their node and mount path: the ClientSet is returned for them.
+        """
+        try:
+            return self.components[compid]
+        except KeyError:
+            if comptype == Client.TYPE:
+                for clients in self._client_sets:
+                    if clients.mount_path == mount_path and \
+                       node in clients.nodes:
+                        return clients
+            raise
+
+    def _event_owner(self, node, elem):
+        """
+        Return my component a distant event from `node' is about, or its
+        target for a journal event. `elem' is a state record or, from
+        peers older than SHINE:4, a component instance.
+
+        Raise KeyError if the component is not mine.
+        """
+        if isinstance(elem, dict):
+            if elem['type'] == Journal.TYPE:
+                return self.components[elem['target']]
+            return self._find_component(elem['id'], node, elem['type'],
+                                        elem.get('mount_path'))
+
+        # Component ids depend on their file system.
+        if elem.TYPE == Journal.TYPE:
+            elem.target.fs = self
+            return self.components[elem.target.uniqueid()]
+        elem.fs = self
+        return self._find_component(elem.uniqueid(), node, elem.TYPE,
+                                    getattr(elem, 'mount_path', None))
+
     def _handle_shine_proxy_error(self, nodes, message):
         """
         Store error messages, for later processing.
@@ -226,6 +336,16 @@ class FileSystem:
         self._attach_component(client)
         return client
 
+    def new_client_set(self, server, mount_path, mount_options=None,
+                       enabled=True):
+        """
+        Create a new attached client set, for all `server' nodes.
+        """
+        clients = ClientSet(self, server, mount_path, mount_options, enabled)
+        self._attach_component(clients)
+        self._client_sets.append(clients)
+        return clients
+
     def new_router(self, server, enabled=True):
         """
         Create a new attached router.
@@ -242,7 +362,21 @@ class FileSystem:
         """Create a proxy action to remotely run a shine action."""
         assert isinstance(servers, NodeSet)
         assert comps is None or isinstance(comps, ComponentGroup)
-        return FSProxyAction(self, action, servers, self.debug, comps, **kwargs)
+        sockpath = Globals().get('agent_socket')
+
+        # Proxy actions shared with other file systems (see multi_status()).
+        if self._proxies is not None:
+            key = (action, str(servers))
+            if key not in self._proxies:
+                self._proxies[key] = FSMultiProxyAction(action, servers,
+                                                        self.debug,
+                                                        sockpath=sockpath,
+                                                        **kwargs)
+            self._proxies[key].add_fs(self, comps)
+            return self._proxies[key]
+
+        return FSProxyAction(self, action, servers, self.debug, comps,
+                             sockpath=sockpath, **kwargs)
 
     def _run_actions(self):
         """
@@ -250,12 +384,20 @@ class FileSystem:
 
         It clears all previous proxy errors and starts task run-loop. This
         launches all FSProxyAction prepared before by example.
+        The procfs snapshot shared by this run is dropped when it ends, and
+        status results of local components are written to their cache.
+        Resource slots still used by actions which did not end are freed.
         """
         self.proxy_errors = MsgTree()
         task_self().set_default("stderr_msgtree", False)
         task_self().set_info('connect_timeout', 
                              Globals().get_ssh_connect_timeout())
-        task_self().resume()
+        try:
+            task_self().resume()
+        finally:
+            ProcSnapshot.deactivate()
+            StatusCache.flush()
+            reset_resources()
 
     def _check_errors(self, expected_states, components=None, actions=None):
         """
@@ -363,6 +505,8 @@ class FileSystem:
                     result = 0
                 else:
                     result = os.remove(fs_file)
+                    if os.path.exists(fs_file + COMPILED_SUFFIX):
+                        os.remove(fs_file + COMPILED_SUFFIX)
 
         if len(distant_servers) > 0:
             # Perform the remove operations on all targets for these nodes.
@@ -377,13 +521,27 @@ class FileSystem:
         return result
 
     def _prepare(self, action, comps=None, groupby=None, reverse=False,
-                 need_unload=False, tunings=None, allservers=False, **kwargs):
+                 need_unload=False, tunings=None, allservers=False,
+                 pipeline=False, unloads=None, excluded=None, orders=None,
+                 **kwargs):
         """
         Instanciate all actions for the component list and but them in a graph
         of ActionGroup().
 
         Action could be local or proxy actions.
         Components list is filtered, based on action name.
+
+        If `pipeline' is set, groups are not run one after the other. Each
+        action only waits for the ones it needs, see _start_needs().
+
+        `unloads' is a dict of module unloading actions, by server name,
+        shared by several file systems run together: modules are unloaded
+        only once, after all of them.
+
+        Nothing is run on the servers in `excluded' NodeSet, if any.
+
+        `orders' is a dict of start orders by component type, replacing
+        their START_ORDER for this call only.
         """
 
         graph = ActionGroup()
@@ -395,8 +553,13 @@ class FileSystem:
         localsrv = None
         modules = set()
         localcomps = None
+        localgrps = []
+        bykind = {}
 
-        if groupby:
+        if groupby == 'START_ORDER':
+            key = lambda comp: _start_order(comp, orders)
+            iterable = comps.groupby(key=key, reverse=reverse)
+        elif groupby:
             iterable = comps.groupby(attr=groupby, reverse=reverse)
         else:
             iterable = [(None, comps)]
@@ -409,17 +572,30 @@ class FileSystem:
             proxygrp = ActionGroup()
 
             for srv, comps in comps.groupbyserver(allservers=allservers):
+                nodes = srv.hostname
+                if excluded:
+                    nodes = nodes.difference(excluded)
+                    if len(nodes) == 0:
+                        continue
                 if srv.action_enabled is True:
                     if srv.is_local():
                         localsrv = srv
                         localcomps = comps
                         for comp in comps:
-                            compgrp.add(getattr(comp, action)(**kwargs))
+                            act = getattr(comp, action)(**kwargs)
+                            compgrp.add(act)
+                            if pipeline:
+                                bykind.setdefault(_start_kind(comp, orders),
+                                                  []).append(act)
                     else:
-                        act = self._proxy_action(action, srv.hostname,
-                                                 comps, **kwargs)
+                        act = self._proxy_action(action, nodes, comps,
+                                                 **kwargs)
+                        if pipeline:
+                            for kind in set([_start_kind(comp, orders)
+                                             for comp in comps]):
+                                bykind.setdefault(kind, []).append(act)
                         if tunings and tunings.filename:
-                            copy = Install(srv.hostname, self, tunings.filename,
+                            copy = Install(nodes, self, tunings.filename,
                                            comps=comps, **kwargs)
                             act.depends_on(copy)
                             proxygrp.add(copy)
@@ -434,6 +610,7 @@ class FileSystem:
                 # Keep track of last comp group
                 last_comps = compgrp
                 last_comps.parent = graph[-1]
+                localgrps.append(compgrp)
 
                 # Build module loading list, if needed
                 for comp_action in compgrp:
@@ -454,83 +631,110 @@ class FileSystem:
 
             first_comps.parent.add(modgrp)
             first_comps.depends_on(modgrp)
+            # Without serialization, all groups should wait for modules.
+            if pipeline:
+                for compgrp in localgrps:
+                    compgrp.depends_on(modgrp)
 
         # Apply tuning to last component group, if needed
         if tunings is not None and last_comps is not None:
             tune = localsrv.tune(tunings, localcomps, self.fs_name, **kwargs)
             last_comps.parent.add(tune)
             tune.depends_on(last_comps)
+            if pipeline:
+                for compgrp in localgrps:
+                    tune.depends_on(compgrp)
 
         # Add module unloading to last component group, if needed.
         if need_unload and last_comps is not None:
-            unload = localsrv.unload_modules(**kwargs)
-            last_comps.parent.add(unload)
+            unload = None
+            if unloads is not None:
+                unload = unloads.get(str(localsrv.hostname))
+            if unload is None:
+                unload = localsrv.unload_modules(**kwargs)
+                last_comps.parent.add(unload)
+                if unloads is not None:
+                    unloads[str(localsrv.hostname)] = unload
             unload.depends_on(last_comps)
 
         # Join the different part together
-        graph.sequential()
+        if pipeline:
+            for kind, acts in bykind.items():
+                for other, others in bykind.items():
+                    if _start_needs(kind, other):
+                        for act in acts:
+                            for dep in others:
+                                if dep is not act:
+                                    act.depends_on(dep)
+        else:
+            graph.sequential()
 
         return graph
 
 
-    def format(self, comps=None, **kwargs):
-        """Format filesystem targets."""
-        comps = (comps or self.components).managed(supports='format')
-        actions = self._prepare('format', comps, **kwargs)
+    def _launch(self, action, comps=None, **kwargs):
+        """
+        Prepare and launch `action' on filesystem components, but do not
+        run the task.
+
+        Return a function checking for errors once the task has run. See
+        _SIMPLE_ACTIONS for the supported actions.
+        """
+        states, check_actions, options = _SIMPLE_ACTIONS[action]
+        options = dict(options, **kwargs)
+        comps = (comps or self.components).managed(supports=action)
+        actions = self._prepare(action, comps, **options)
         actions.launch()
-        self._run_actions()
+        if not check_actions:
+            actions = None
+        return lambda: self._check_errors(states, comps, actions)
 
-        # Check for errors and return OFFLINE or error code
-        return self._check_errors([OFFLINE], comps, actions)
+    def _run_simple(self, action, comps=None, **kwargs):
+        """Launch `action', run it and check for errors."""
+        finish = self._launch(action, comps, **kwargs)
+        self._run_actions()
+        return finish()
 
+    def format(self, comps=None, **kwargs):
+        """Format filesystem targets."""
+        return self._run_simple('format', comps, **kwargs)
 
     def tunefs(self, comps=None, **kwargs):
         """Modify component option set at format."""
-        comps = (comps or self.components).managed(supports='tunefs')
-        actions = self._prepare('tunefs', comps, **kwargs)
-        actions.launch()
-        self._run_actions()
-
-        # Check for errors and return OFFLINE or error code
-        return self._check_errors([OFFLINE], comps, actions)
-
+        return self._run_simple('tunefs', comps, **kwargs)
 
     def fsck(self, comps=None, **kwargs):
         """Check component filesystem coherency."""
-        comps = (comps or self.components).managed(supports='fsck')
-        actions = self._prepare('fsck', comps, **kwargs)
-        actions.launch()
-        self._run_actions()
-        # Check for errors and return OFFLINE or error code
-        return self._check_errors([OFFLINE], comps, actions)
-
+        return self._run_simple('fsck', comps, **kwargs)
 
     def status(self, comps=None, **kwargs):
         """Get status of filesystem."""
-        comps = (comps or self.components).managed(supports='status')
-        actions = self._prepare('status', comps, allservers=True, **kwargs)
-        actions.launch()
-        self._run_actions()
+        return self._run_simple('status', comps, **kwargs)
 
-        # Here we check MOUNTED but in fact, any status is OK.
-        return self._check_errors([MOUNTED], comps)
+    def start(self, comps=None, pipeline=False, **kwargs):
+        """
+        Start Lustre file system servers.
 
-    def start(self, comps=None, **kwargs):
-        """Start Lustre file system servers."""
+        If `pipeline' is set, targets do not wait for all components of the
+        previous start order to be started, only for the ones they need.
+        """
         comps = (comps or self.components).managed(supports='start')
 
         # What starting order to use?
-        key = lambda t: t.TYPE == MDT.TYPE
-        mdt_comps = comps.filter(key=key)
+        orders = None
+        mdt_comps = comps.bytype(MDT.TYPE)
         if mdt_comps:
             # Found enabled MDT(s): perform writeconf check.
             self.status(comps=mdt_comps)
         for target in mdt_comps:
             if target.has_first_time_flag() or target.has_writeconf_flag():
-                MDT.START_ORDER, OST.START_ORDER = OST.START_ORDER, MDT.START_ORDER
+                # MDTs are started before OSTs, for this start only.
+                orders = {MDT.TYPE: OST.START_ORDER,
+                          OST.TYPE: MDT.START_ORDER}
                 break
 
-        actions = self._prepare('start', comps, groupby='START_ORDER', **kwargs)
+        actions = self._prepare('start', comps, groupby='START_ORDER',
+                                pipeline=pipeline, orders=orders, **kwargs)
         actions.launch()
         self._run_actions()
 
@@ -538,44 +742,19 @@ class FileSystem:
 
     def stop(self, comps=None, **kwargs):
         """Stop file system."""
-        comps = (comps or self.components).managed(supports='stop')
-        actions = self._prepare('stop', comps, groupby='START_ORDER',
-                                reverse=True, need_unload=True, **kwargs)
-        actions.launch()
-        self._run_actions()
-
-        return self._check_errors([OFFLINE], comps)
+        return self._run_simple('stop', comps, **kwargs)
 
     def mount(self, comps=None, **kwargs):
         """Mount FS clients."""
-        comps = (comps or self.components).managed(supports='mount')
-        actions = self._prepare('mount', comps, **kwargs)
-        actions.launch()
-        self._run_actions()
-
-        # Ok, workers have completed, perform late status check...
-        return self._check_errors([MOUNTED], comps, actions)
+        return self._run_simple('mount', comps, **kwargs)
 
     def umount(self, comps=None, **kwargs):
         """Unmount FS clients."""
-        comps = (comps or self.components).managed(supports='umount')
-        actions = self._prepare('umount', comps, need_unload=True, **kwargs)
-        actions.launch()
-        self._run_actions()
-
-        # Ok, workers have completed, perform late status check...
-        return self._check_errors([OFFLINE], comps)
+        return self._run_simple('umount', comps, **kwargs)
 
     def execute(self, comps=None, **kwargs):
         """Execute custom command."""
-        comps = (comps or self.components).managed(supports='execute')
-        actions = self._prepare('execute', comps, **kwargs)
-        actions.launch()
-        self._run_actions()
-
-        # Here we check MOUNTED but in fact, any status is OK.
-        # XXX: Is that ok, to check MOUNTED here?
-        return self._check_errors([MOUNTED], comps, actions)
+        return self._run_simple('execute', comps, **kwargs)
 
     def tune(self, tuning_model, comps=None, **kwargs):
         """Tune server."""
@@ -603,3 +782,59 @@ class FileSystem:
 
         # Check actions status and return MOUNTED if no error
         return self._check_errors([MOUNTED], None, actions)
+
+
+def multi_status(fs_comps, **kwargs):
+    """
+    Get status of several file systems at once.
+
+    `fs_comps' is a list of (fs, comps) tuples. Remote servers shared by
+    these file systems receive only one shine command for all of them.
+
+    Return the list of status results, in the same order.
+    """
+    proxies = {}
+    plans = []
+    for fs, comps in fs_comps:
+        comps = (comps or fs.components).managed(supports='status')
+        fs._proxies = proxies
+        try:
+            actions = fs._prepare('status', comps, allservers=True, **kwargs)
+        finally:
+            fs._proxies = None
+        plans.append((fs, comps, actions))
+
+    for fs, comps, actions in plans:
+        fs.proxy_errors = MsgTree()
+        actions.launch()
+
+    # All file systems share the same task, run it only once.
+    if plans:
+        plans[0][0]._run_actions()
+
+    # Here we check MOUNTED but in fact, any status is OK.
+    return [fs._check_errors([MOUNTED], comps) for fs, comps, _ in plans]
+
+
+def multi_run(fs_calls):
+    """
+    Run actions of several file systems in the same task run.
+
+    `fs_calls' is a list of (fs, action, kwargs) tuples, where `action' is
+    the name of a FileSystem method like 'stop' or 'umount' and `kwargs'
+    its arguments. Errors are checked for each file system separately.
+    Lustre modules are unloaded once, after all file systems.
+
+    Return the list of results, in the same order.
+    """
+    finishers = []
+    unloads = {}
+    for fs, action, kwargs in fs_calls:
+        fs.proxy_errors = MsgTree()
+        finishers.append(fs._launch(action, unloads=unloads, **kwargs))
+
+    # All file systems share the same task, run it only once.
+    if fs_calls:
+        fs_calls[0][0]._run_actions()
+
+    return [finish() for finish in finishers]
@@ -0,0 +1,244 @@
+# Mountdata.py -- Read Lustre mountdata from ldiskfs devices
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+
+"""
+Minimal ldiskfs (ext3/ext4) reader for Lustre target mountdata.
+
+Lustre stores target settings in the CONFIGS/mountdata file of the target
+filesystem, as a struct lustre_disk_data (see lustre/include/lustre_disk.h).
+This module reads this file directly from the device, without mounting it or
+running tunefs.lustre.
+
+Only the common layouts are supported. MountdataError is raised for anything
+else and callers should then use tunefs.lustre.
+"""
+
+import struct
+
+### From ext4 on-disk format:
+SB_OFFSET = 1024
+EXT2_SUPER_MAGIC = 0xEF53
+EXT2_ROOT_INO = 2
+EXT4_FEATURE_INCOMPAT_FILETYPE = 0x0002
+EXT4_FEATURE_INCOMPAT_META_BG = 0x0010
+EXT4_FEATURE_INCOMPAT_64BIT = 0x0080
+EXT4_EXTENTS_FL = 0x00080000
+EXT4_INLINE_DATA_FL = 0x10000000
+EXT4_EXT_MAGIC = 0xF30A
+EXT4_NDIR_BLOCKS = 12
+
+# Files read here are small, bigger ones means something is wrong.
+MAX_FILE_SIZE = 1 << 20
+
+### From lustre/include/lustre_disk.h:
+MOUNTDATA_DIR = "CONFIGS"
+MOUNTDATA_FILE = "mountdata"
+LDD_MAGIC = 0x1dd00001
+# ldd_magic, 4 other fields, ldd_flags, ldd_svindex, ldd_mount_type,
+# ldd_fsname, ldd_svname
+LDD_FORMAT = '<8I64s64s'
+
+
+class MountdataError(Exception):
+    """Device content is not understood."""
+
+
+class _Ldiskfs(object):
+    """Read-only access to files of an ldiskfs device."""
+
+    def __init__(self, fdev):
+        self._fdev = fdev
+
+        sblock = self._read(SB_OFFSET, 1024)
+        if len(sblock) < 1024:
+            raise MountdataError("device too small")
+
+        (self._first_data_block, log_block_size) = \
+                                        struct.unpack('<II', sblock[20:28])
+        self._inodes_per_group = struct.unpack('<I', sblock[40:44])[0]
+        magic = struct.unpack('<H', sblock[56:58])[0]
+        rev_level = struct.unpack('<I', sblock[76:80])[0]
+        self._incompat = struct.unpack('<I', sblock[96:100])[0]
+
+        if magic != EXT2_SUPER_MAGIC:
+            raise MountdataError("not a ldiskfs device")
+        if self._incompat & EXT4_FEATURE_INCOMPAT_META_BG:
+            raise MountdataError("meta_bg is not supported")
+        if log_block_size > 6 or self._inodes_per_group == 0:
+            raise MountdataError("bad superblock")
+
+        self._block_size = 1024 << log_block_size
+
+        if rev_level == 0:
+            self._inode_size = 128
+        else:
+            self._inode_size = struct.unpack('<H', sblock[88:90])[0]
+
+        self._desc_size = 32
+        if self._incompat & EXT4_FEATURE_INCOMPAT_64BIT:
+            self._desc_size = struct.unpack('<H', sblock[254:256])[0]
+
+    def _read(self, offset, size):
+        """Read `size' bytes from device at `offset'."""
+        self._fdev.seek(offset)
+        return self._fdev.read(size)
+
+    def _read_block(self, blocknr):
+        """Read block `blocknr' content."""
+        data = self._read(blocknr * self._block_size, self._block_size)
+        if len(data) != self._block_size:
+            raise MountdataError("block %d is out of device" % blocknr)
+        return data
+
+    def _inode(self, ino):
+        """Return raw content of inode `ino'."""
+        group, index = divmod(ino - 1, self._inodes_per_group)
+        desc_offset = (self._first_data_block + 1) * self._block_size \
+                      + group * self._desc_size
+        desc = self._read(desc_offset, self._desc_size)
+        if len(desc) != self._desc_size:
+            raise MountdataError("bad group descriptor for inode %d" % ino)
+
+        table = struct.unpack('<I', desc[8:12])[0]
+        if self._desc_size >= 64:
+            table |= struct.unpack('<I', desc[40:44])[0] << 32
+
+        inode = self._read(table * self._block_size
+                           + index * self._inode_size, 128)
+        if len(inode) != 128:
+            raise MountdataError("inode %d is out of device" % ino)
+        return inode
+
+    def _extent_blocks(self, node, blocks):
+        """Add (logical, physical, length) of an extent tree node to blocks."""
+        magic, entries, _, depth = struct.unpack('<4H', node[0:8])
+        if magic != EXT4_EXT_MAGIC:
+            raise MountdataError("bad extent header")
+
+        for i in range(entries):
+            entry = node[12 + i * 12:24 + i * 12]
+            if depth == 0:
+                lblock, length, start_hi, start_lo = \
+                                        struct.unpack('<IHHI', entry)
+                # Uninitialized extent, reads as zeros
+                if length > 32768:
+                    continue
+                blocks.append((lblock, (start_hi << 32) | start_lo, length))
+            else:
+                _, leaf_lo, leaf_hi = struct.unpack('<IIH', entry[0:10])
+                self._extent_blocks(self._read_block((leaf_hi << 32) | leaf_lo),
+                                    blocks)
+
+    def _indirect_blocks(self, blocknr, level, lblock, blocks):
+        """
+        Add (logical, physical, 1) of all data blocks referenced by an
+        indirect block of `level' to blocks. Return next logical block.
+        """
+        per_block = self._block_size / 4
+        if blocknr == 0:
+            return lblock + per_block ** level
+
+        ptrs = struct.unpack('<%dI' % per_block, self._read_block(blocknr))
+        for ptr in ptrs:
+            if level == 1:
+                if ptr:
+                    blocks.append((lblock, ptr, 1))
+                lblock += 1
+            else:
+                lblock = self._indirect_blocks(ptr, level - 1, lblock, blocks)
+        return lblock
+
+    def read_file(self, ino):
+        """Return the content of file or directory `ino'."""
+        inode = self._inode(ino)
+        size = struct.unpack('<I', inode[4:8])[0]
+        size |= struct.unpack('<I', inode[108:112])[0] << 32
+        flags = struct.unpack('<I', inode[32:36])[0]
+        i_block = inode[40:100]
+
+        if flags & EXT4_INLINE_DATA_FL:
+            raise MountdataError("inline data are not supported")
+        if size > MAX_FILE_SIZE:
+            raise MountdataError("inode %d is too big" % ino)
+
+        blocks = []
+        if flags & EXT4_EXTENTS_FL:
+            self._extent_blocks(i_block, blocks)
+        else:
+            ptrs = struct.unpack('<15I', i_block)
+            for lblock in range(EXT4_NDIR_BLOCKS):
+                if ptrs[lblock]:
+                    blocks.append((lblock, ptrs[lblock], 1))
+            lblock = EXT4_NDIR_BLOCKS
+            for level in (1, 2, 3):
+                lblock = self._indirect_blocks(ptrs[EXT4_NDIR_BLOCKS - 1
+                                                    + level],
+                                               level, lblock, blocks)
+
+        nblocks = (size + self._block_size - 1) / self._block_size
+        content = ['\0' * self._block_size] * nblocks
+        for lblock, pblock, length in blocks:
+            for i in range(length):
+                if lblock + i < nblocks:
+                    content[lblock + i] = self._read_block(pblock + i)
+        return ''.join(content)[:size]
+
+    def lookup(self, dir_ino, name):
+        """Return inode number of `name' in directory `dir_ino'."""
+        data = self.read_file(dir_ino)
+        filetype = self._incompat & EXT4_FEATURE_INCOMPAT_FILETYPE
+        offset = 0
+        while offset + 8 <= len(data):
+            ino, rec_len, name_len = struct.unpack('<IHH',
+                                                   data[offset:offset + 8])
+            if filetype:
+                name_len &= 0xFF
+            if rec_len < 8:
+                raise MountdataError("bad directory entry")
+            if ino and data[offset + 8:offset + 8 + name_len] == name:
+                return ino
+            offset += rec_len
+        raise MountdataError("%s not found" % name)
+
+
+def read_mountdata(dev):
+    """
+    Read Lustre mountdata of ldiskfs device `dev'.
+
+    Return a (ldd_flags, ldd_svname) tuple. Raise MountdataError if device
+    layout is not recognised and IOError if device could not be read.
+    """
+    fdev = open(dev, 'rb')
+    try:
+        ldiskfs = _Ldiskfs(fdev)
+        dir_ino = ldiskfs.lookup(EXT2_ROOT_INO, MOUNTDATA_DIR)
+        data = ldiskfs.read_file(ldiskfs.lookup(dir_ino, MOUNTDATA_FILE))
+    finally:
+        fdev.close()
+
+    size = struct.calcsize(LDD_FORMAT)
+    if len(data) < size:
+        raise MountdataError("mountdata file too small")
+    fields = struct.unpack(LDD_FORMAT, data[0:size])
+    if fields[0] != LDD_MAGIC:
+        raise MountdataError("bad mountdata magic")
+
+    return fields[5], fields[9].split('\0', 1)[0]
@@ -0,0 +1,256 @@
+# ProcSnapshot.py -- Cached view of Lustre related procfs entries
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+
+"""
+Shared and indexed view of procfs entries used by components checks.
+
+A run checks a lot of local components (targets, clients, server modules)
+and each of them used to read the same /proc files. ProcSnapshot reads each
+source only once, when first needed, and indexes it by target label, mount
+device, mount point or partition name.
+
+During a run (see activate() and deactivate()), all checks share the same
+snapshot. As a local command could change Lustre state, snapshot is dropped
+each time one of them ends (see invalidate()). Out of a run, snapshot() always
+returns a fresh one.
+"""
+
+import os
+from glob import glob
+
+
+class ProcSnapshot(object):
+    """
+    Lazily read content of /proc files used to check Lustre component states.
+
+    Each source is read at most once, on first access.
+    """
+
+    def __init__(self, root='/proc'):
+        self.root = root
+
+        self._mounts_bydev = None
+        self._mounts_bypath = None
+        self._partitions = None
+        self._modules = None
+        # label -> ([mntdev paths], [recovery_status paths])
+        self._targets = None
+        self._mntdevs = {}
+        self._recovery = {}
+        # fsname -> [clilov paths]
+        self._lovs = None
+        # fsname -> [import state paths]
+        self._imports = None
+        self._import_states = {}
+
+    def _path(self, *parts):
+        """Return the path of a file below snapshot root."""
+        return os.path.join(self.root, *parts)
+
+    def _read_lines(self, path, mandatory=False):
+        """
+        Return the list of lines of `path', or None if it is unreadable.
+
+        If `mandatory' is set, IOError is raised instead.
+        """
+        try:
+            fproc = open(path)
+            try:
+                return fproc.readlines()
+            finally:
+                fproc.close()
+        except IOError:
+            if mandatory:
+                raise
+            return None
+
+    #
+    # /proc/mounts
+    #
+    def _load_mounts(self):
+        """Read and index /proc/mounts by device and by mount point."""
+        lines = self._read_lines(self._path('mounts'), True)
+        self._mounts_bydev = {}
+        self._mounts_bypath = {}
+        for line in lines:
+            fields = line.split(' ', 3)
+            if len(fields) < 3:
+                continue
+            entry = tuple(fields[0:3])
+            self._mounts_bydev.setdefault(entry[0], []).append(entry)
+            self._mounts_bypath.setdefault(entry[1], []).append(entry)
+
+    def mounts_by_dev(self, dev):
+        """
+        Return the list of (device, mount point, fs type) mounted from `dev'.
+        """
+        if self._mounts_bydev is None:
+            self._load_mounts()
+        return self._mounts_bydev.get(dev, [])
+
+    def mounts_by_path(self, path):
+        """
+        Return the list of (device, mount point, fs type) mounted on `path'.
+        """
+        if self._mounts_bypath is None:
+            self._load_mounts()
+        return self._mounts_bypath.get(path, [])
+
+    #
+    # /proc/partitions
+    #
+    def partition_size(self, name):
+        """Return the size, in bytes, of partition `name' or None."""
+        if self._partitions is None:
+            lines = self._read_lines(self._path('partitions'), True)
+            self._partitions = {}
+            for line in lines:
+                fields = line.split()
+                if len(fields) > 1 and fields[-2].isdigit():
+                    self._partitions.setdefault(fields[-1],
+                                                int(fields[-2]) * 1024)
+        return self._partitions.get(name)
+
+    #
+    # /proc/modules
+    #
+    def modules(self):
+        """Return a dict of loaded module names and their use count."""
+        if self._modules is None:
+            lines = self._read_lines(self._path('modules'), True)
+            self._modules = {}
+            for line in lines:
+                modname, _, count, _ = line.split(' ', 3)
+                self._modules[modname] = int(count)
+        return self._modules
+
+    #
+    # /proc/fs/lustre
+    #
+    def _load_targets(self):
+        """Index target mntdev and recovery_status entries by label."""
+        self._targets = {}
+        for index, name in enumerate(('mntdev', 'recovery_status')):
+            for path in glob(self._path('fs', 'lustre', '*', '*', name)):
+                label = os.path.basename(os.path.dirname(path))
+                paths = self._targets.setdefault(label, ([], []))
+                paths[index].append(path)
+
+    def target_paths(self, label):
+        """
+        Return mntdev and recovery_status paths lists for target `label'.
+        """
+        if self._targets is None:
+            self._load_targets()
+        return self._targets.get(label, ([], []))
+
+    def mntdev(self, label):
+        """Return the device target `label' is started on, or None."""
+        if label not in self._mntdevs:
+            # Since Lustre 2.4. More than one path could be returned.
+            # The first one is fine.
+            paths = self.target_paths(label)[0]
+            lines = paths and self._read_lines(paths[0])
+            if lines:
+                self._mntdevs[label] = lines[0].rstrip('\n')
+            else:
+                self._mntdevs[label] = None
+        return self._mntdevs[label]
+
+    def recovery_status(self, label):
+        """Return recovery_status lines for target `label', or None."""
+        if label not in self._recovery:
+            paths = self.target_paths(label)[1]
+            self._recovery[label] = paths and self._read_lines(paths[0]) \
+                                    or None
+        return self._recovery[label]
+
+    def client_lovs(self, fsname):
+        """Return the list of client LOV entries for filesystem `fsname'."""
+        if self._lovs is None:
+            self._lovs = {}
+            for path in glob(self._path('fs', 'lustre', 'lov', '*-clilov-*')):
+                name = os.path.basename(path).split('-clilov-', 1)[0]
+                self._lovs.setdefault(name, []).append(path)
+        return self._lovs.get(fsname, [])
+
+    def import_states(self, fsname):
+        """
+        Return a list of (path, lines) for all `state' files of `fsname'
+        client imports (OSC, MDC, MGC).
+        """
+        if self._imports is None:
+            self._imports = {}
+            for path in glob(self._path('fs', 'lustre', '??c', '*', 'state')):
+                name = os.path.basename(os.path.dirname(path))
+                name = name.split('-', 1)[0]
+                self._imports.setdefault(name, []).append(path)
+
+        if fsname not in self._import_states:
+            states = []
+            for path in self._imports.get(fsname, []):
+                states.append((path, self._read_lines(path) or []))
+            self._import_states[fsname] = states
+        return self._import_states[fsname]
+
+
+# Snapshot shared by all checks of the current run, see snapshot().
+_ROOT = '/proc'
+_ACTIVE = False
+_CURRENT = None
+
+def activate(root='/proc'):
+    """
+    Start sharing a snapshot between all checks until deactivate().
+
+    Does nothing if a run is already active.
+    """
+    global _ROOT, _ACTIVE, _CURRENT
+    if not _ACTIVE:
+        _ROOT = root
+        _ACTIVE = True
+        _CURRENT = None
+
+def deactivate():
+    """Stop sharing a snapshot. Next checks will read procfs again."""
+    global _ROOT, _ACTIVE, _CURRENT
+    _ROOT = '/proc'
+    _ACTIVE = False
+    _CURRENT = None
+
+def invalidate():
+    """Drop the current shared snapshot, if any, as procfs has changed."""
+    global _CURRENT
+    _CURRENT = None
+
+def snapshot():
+    """
+    Return the procfs snapshot checks should consult.
+
+    When a run is active, the same snapshot is returned until invalidate()
+    is called. Otherwise a new one is returned.
+    """
+    global _CURRENT
+    if not _ACTIVE:
+        return ProcSnapshot(_ROOT)
+    if _CURRENT is None:
+        _CURRENT = ProcSnapshot(_ROOT)
+    return _CURRENT
@@ -35,6 +35,8 @@ class Router(Component):
     Manages a LNET router in Shine framework.
     """
 
+    __slots__ = ()
+
     TYPE = 'router'
     DISPLAY_ORDER = 1
     START_ORDER = 1
@@ -26,7 +26,8 @@ import socket
 
 from ClusterShell.Task import NodeSet
 
-from Shine.Lustre import ServerError
+from Shine.Lustre import ServerError, ProcSnapshot, slots_getstate, \
+                         slots_setstate
 from Shine.Lustre.EventHandler import EventHandler
 from Shine.Lustre.Actions.Modules import LoadModules, UnloadModules
 from Shine.Lustre.Actions.Tune import Tune
@@ -70,6 +71,10 @@ class ServerGroup(object):
         return NodeSet.fromlist((srv.hostname for srv in self))
 
 
+# Event handler of servers created without one. EventHandler has no state,
+# so one instance is enough for all of them.
+_DEFAULT_HDLR = EventHandler()
+
 class Server(object):
     """
     Represents a node in the cluster, by its hostname and NIDs.
@@ -77,6 +82,9 @@ class Server(object):
     Currently, it is link to no specific filesystem nor components.
     """
 
+    __slots__ = ('nids', 'hostname', 'modules', 'action_enabled', 'hdlr',
+                 '_running_actions')
+
     _CACHE_HOSTNAME_SHORT = None
     _CACHE_HOSTNAME_LONG = None
 
@@ -84,11 +92,18 @@ class Server(object):
         assert type(nids) is list
         self.nids = nids
         self.hostname = NodeSet(hostname)
-        self.modules = dict()
+        self.modules = {}
         self.action_enabled = True
 
-        self.hdlr = hdlr or EventHandler()
-        self._running_actions = []
+        self.hdlr = hdlr or _DEFAULT_HDLR
+        # Running actions. It is replaced, never updated in place.
+        self._running_actions = ()
+
+    def __getstate__(self):
+        return slots_getstate(self)
+
+    def __setstate__(self, state):
+        slots_setstate(self, state)
 
     def __str__(self):
         return "%s (%s)" % (self.hostname, ','.join(self.nids))
@@ -146,26 +161,24 @@ class Server(object):
 
         It analyzes which Lustre module is loaded and keeps it in self.modules
         """
-        self.modules.clear()
-        try:
-            modlist = open('/proc/modules')
-            for line in modlist:
-                modname, _, count, _ = line.split(' ', 3)
-                if modname in ('libcfs', 'lustre', 'ldiskfs', 'fsfilt_ldiskfs'):
-                    self.modules[modname] = int(count)
-        finally:
-            modlist.close()
+        modules = ProcSnapshot.snapshot().modules()
+        self.modules = dict([(modname, modules[modname]) for modname in
+                             ('libcfs', 'lustre', 'ldiskfs', 'fsfilt_ldiskfs')
+                             if modname in modules])
+
     #
     # Inprogress action methods
     #
     def _add_action(self, act):
         """Add the named action to the running action list."""
         assert act not in self._running_actions
-        self._running_actions.append(act)
+        self._running_actions += (act,)
 
     def _del_action(self, act):
         """Remove the named action from the running action list."""
-        self._running_actions.remove(act)
+        actions = list(self._running_actions)
+        actions.remove(act)
+        self._running_actions = tuple(actions)
 
     def _list_action(self):
         """Return the running action list."""
@@ -0,0 +1,210 @@
+# StatusCache.py -- Last local status results of components
+# Copyright (C) 2026 CEA
+#
+# This file is part of shine
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
+#
+
+
+"""
+Cache of the last local status check of each component.
+
+Each server keeps, in one file per file system below 'status_dir', the
+state record (see Component.state_record()) of the last status check of its
+local components, with the time it was taken. A status action given a
+`max_age' could use it instead of checking the component again, avoiding
+mountdata probes and procfs reads when status is polled often.
+
+Records are gathered in memory during a run and written by flush(), when
+the run ends. Actions changing a component state drop its record (see
+FSAction.ev_close()).
+"""
+
+import os
+import copy
+import time
+import cPickle
+
+from Shine.Configuration.Globals import Globals
+
+
+class StatusCache(object):
+    """
+    Timestamped component state records of a file system, stored in `path'.
+
+    The file is read when first needed, and read again when another process
+    has replaced it. Records changed by this process are kept apart until
+    save(), which applies them on the latest file content, so concurrent
+    writers do not lose each other's records.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.dirty = False
+        self._records = None
+        # Cache file identity when it was read, see _refresh()
+        self._filestat = None
+        # key -> (stamp, record), or None for forgotten keys, not saved yet
+        self._changes = {}
+
+    def _stat(self):
+        """Return what identifies the current cache file content."""
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return (info.st_ino, info.st_size, info.st_mtime)
+
+    def _load(self):
+        """Read cache file. A missing or corrupted file is an empty cache."""
+        self._records = {}
+        self._filestat = self._stat()
+        try:
+            cachefile = open(self.path, 'rb')
+            try:
+                records = cPickle.load(cachefile)
+            finally:
+                cachefile.close()
+        except (IOError, EOFError, cPickle.UnpicklingError, ValueError,
+                TypeError, AttributeError, ImportError):
+            records = None
+        if type(records) is dict:
+            self._records = records
+        # Local changes are more recent than the file content.
+        for key, value in self._changes.iteritems():
+            if value is None:
+                self._records.pop(key, None)
+            else:
+                self._records[key] = value
+
+    def _refresh(self):
+        """Read cache file if it was not read yet or if it was replaced."""
+        if self._records is None or self._stat() != self._filestat:
+            self._load()
+
+    def get(self, key, max_age, now=None):
+        """
+        Return the record stored for `key' if it is not older than `max_age'
+        seconds, None otherwise.
+        """
+        self._refresh()
+        if now is None:
+            now = time.time()
+        stamp, record = self._records.get(key, (None, None))
+        if stamp is None or not 0 <= now - stamp <= max_age:
+            return None
+        return record
+
+    def put(self, key, record, now=None):
+        """Store `record' for `key', taken at `now'."""
+        if now is None:
+            now = time.time()
+        self._change(key, (now, record))
+
+    def forget(self, key):
+        """Drop the record stored for `key', if any."""
+        self._refresh()
+        if key in self._records:
+            self._change(key, None)
+
+    def _change(self, key, value):
+        """Set `key' to `value', None meaning no record, until save()."""
+        self._refresh()
+        self._changes[key] = value
+        if value is None:
+            self._records.pop(key, None)
+        else:
+            self._records[key] = value
+        self.dirty = True
+
+    def save(self):
+        """
+        Write the cache file, if it was modified.
+
+        Local changes are applied on the current file content, which is
+        replaced atomically. Cache is only an optimization, so errors are
+        ignored.
+        """
+        if not self.dirty:
+            return
+        self._refresh()
+        self.dirty = False
+        self._changes = {}
+        tmppath = '%s.%d' % (self.path, os.getpid())
+        try:
+            dirname = os.path.dirname(self.path)
+            if not os.path.isdir(dirname):
+                os.makedirs(dirname)
+            cachefile = open(tmppath, 'wb')
+            try:
+                cPickle.dump(self._records, cachefile,
+                             cPickle.HIGHEST_PROTOCOL)
+            finally:
+                cachefile.close()
+            os.rename(tmppath, self.path)
+            self._filestat = self._stat()
+        except (IOError, OSError):
+            try:
+                os.unlink(tmppath)
+            except OSError:
+                pass
+
+
+# File system name -> StatusCache used by this process
+_CACHES = {}
+
+def _cache(fs_name):
+    """Return the StatusCache of file system `fs_name'."""
+    if fs_name not in _CACHES:
+        path = os.path.join(Globals().get_status_dir(), '%s.cache' % fs_name)
+        _CACHES[fs_name] = StatusCache(path)
+    return _CACHES[fs_name]
+
+def lookup(comp, max_age, mountdata=False):
+    """
+    Return the cached state record of `comp', if it is not older than
+    `max_age' seconds, None otherwise.
+
+    If `mountdata' is set, records of checks which did not read mountdata
+    are not used.
+    """
+    record = _cache(comp.fs.fs_name).get(comp.uniqueid(), max_age)
+    if record is not None and mountdata and not record.get('mountdata'):
+        return None
+    return record
+
+def record(comp, mountdata=False):
+    """
+    Remember the current state of `comp', just checked. `mountdata' tells
+    if this check read its mountdata.
+    """
+    # Records could share some fields with the component.
+    record = copy.deepcopy(comp.state_record())
+    record['mountdata'] = mountdata
+    _cache(comp.fs.fs_name).put(comp.uniqueid(), record)
+
+def forget(comp):
+    """Drop the record of `comp', as an action has changed its state."""
+    _cache(comp.fs.fs_name).forget(comp.uniqueid())
+
+def flush():
+    """Write all modified caches."""
+    for cache in _CACHES.values():
+        cache.save()
+
+def reset():
+    """Forget all caches read by this process."""
+    _CACHES.clear()
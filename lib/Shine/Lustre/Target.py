@@ -20,7 +20,6 @@
 
 import os
 import stat
-from glob import glob
 
 from ClusterShell.NodeSet import NodeSet
 
@@ -30,6 +29,7 @@ from Shine.Lustre.Actions.StopTarget import StopTarget
 from Shine.Lustre.Actions.Fsck import Fsck
 
 from Shine.Lustre.Disk import Disk, DiskDeviceError
+from Shine.Lustre import ProcSnapshot
 from Shine.Lustre.Component import Component, ComponentError, \
                                    MOUNTED, EXTERNAL, RECOVERING, OFFLINE, \
                                    TARGET_ERROR, RUNTIME_ERROR, INACTIVE, \
@@ -41,6 +41,11 @@ from itertools import groupby
 
 class Target(Component, Disk):
 
+    __slots__ = Disk.FIELDS + ('_states', '_state_cache', '_label',
+                               'defaultserver', 'failservers', 'index',
+                               'group', 'tag', 'network', 'mntdev',
+                               'recov_info', 'journal', '_compat')
+
     #
     # Text form for different client states. 
     #
@@ -66,6 +71,8 @@ class Target(Component, Disk):
         """
         Disk.__init__(self, dev)
         self._states = {}
+        # Global state computed from _states, see get_state()
+        self._state_cache = None
         Component.__init__(self, fs, server, enabled, mode, active)
 
         self.defaultserver = server      # Default server the target runs on
@@ -73,11 +80,13 @@ class Target(Component, Disk):
 
         assert index is not None
         self.index = int(index)
+        self._label = self._build_label()
         self.group = group
         self.tag = tag
         self.network = network
         self.mntdev = self.dev
         self.recov_info = None
+        self._compat = False
 
         if jdev:
             self.journal = Journal(self, jdev)
@@ -92,11 +101,21 @@ class Target(Component, Disk):
         if not self.is_active():
             self.state = INACTIVE
 
-    @property
-    def label(self):
+    def _build_label(self):
         """Return the target label which match the Lustre target name."""
         return "%s-%s%04x" % (self.fs.fs_name, self.TYPE.upper(), self.index)
 
+    @property
+    def label(self):
+        """
+        Return the target label which match the Lustre target name.
+
+        It is computed once, when the target is created.
+        """
+        if self._label is None:
+            self._label = self._build_label()
+        return self._label
+
     def __lt__(self, other):
         return self.START_ORDER < other.START_ORDER
 
@@ -111,7 +130,23 @@ class Target(Component, Disk):
         # add_server() is called.
         return self.label
 
+    def _set_node_state(self, nodename, value):
+        """Update target state on `nodename' and forget the global one."""
+        self._states[nodename] = value
+        self._state_cache = None
+        self._changed()
+
     def get_state(self):
+        """
+        Return target global state, computed again only when a node state
+        has changed.
+        """
+        # The cache is also dropped if the _states dict was replaced.
+        if self._state_cache is None or self._state_cache[0] is not self._states:
+            self._state_cache = (self._states, self._compute_state())
+        return self._state_cache[1]
+
+    def _compute_state(self):
         """Compute target global state based on remote nodes results."""
         # Group target's remote nodes statuses by state.
         sdict = {}
@@ -150,7 +185,7 @@ class Target(Component, Disk):
 
     def set_state(self, value):
         """Update target state on the current node."""
-        self._states[str(self.server.hostname)] = value
+        self._set_node_state(str(self.server.hostname), value)
 
     state = property(get_state, set_state)
 
@@ -164,17 +199,27 @@ class Target(Component, Disk):
     def set_local_state(self, value):
         """Set local server's target state."""
         if self.fs.local_server is not None:
-            self._states[str(self.fs.local_server.hostname)] = value
+            self._set_node_state(str(self.fs.local_server.hostname), value)
 
     local_state = property(get_local_state, set_local_state)
 
+    def clear_state(self, nodes=None):
+        """
+        Forget target state on the servers in `nodes' (all of them by
+        default), before it is checked again.
+        """
+        for srv in self.allservers():
+            nodename = str(srv.hostname)
+            if nodes is None or nodename in nodes:
+                self._set_node_state(nodename, None)
+
     def sanitize_state(self, nodes=None):
         """
         Clean component state if it is wrong.
         """
         for nodename in nodes:
             if self._states[nodename] is None:
-                self._states[nodename] = RUNTIME_ERROR
+                self._set_node_state(nodename, RUNTIME_ERROR)
 
     def update(self, other):
         """
@@ -183,11 +228,9 @@ class Target(Component, Disk):
         Disk.update(self, other)
         # We used to call Component.update(). Be careful if it is updated.
         srvname = str(other.server.hostname)
-        self._states[srvname] = other._states[srvname]
+        self._set_node_state(srvname, other._states[srvname])
         if self._states[srvname] == RECOVERING:
-            # Compat v0.910: 'recov_info' value depends on remote version
-            self.recov_info = getattr(other, 'recov_info',
-                                      getattr(other, 'status_info', None))
+            self.recov_info = other.recov_info
         self.index = other.index
 
         # other could be a pre shine 1.5 object, in this case, let's report it.
@@ -198,10 +241,36 @@ class Target(Component, Disk):
                   "\tTo avoid this, please synchronize shine versions."
             self.fs._handle_shine_proxy_error(srvname, msg)
 
+    def state_record(self):
+        """
+        Return a compact dict of my serializable fields.
+
+        All per-node states are sent, the receiver picks the one of the
+        sending node.
+        """
+        record = Component.state_record(self)
+        del record['state']
+        record.update(Disk.state_record(self))
+        record['states'] = dict(self._states)
+        record['recov_info'] = self.recov_info
+        record['index'] = self.index
+        return record
+
+    def update_record(self, record, server):
+        """
+        Update my serializable fields from a record sent by `server'.
+        """
+        Disk.update_record(self, record)
+        srvname = str(server.hostname)
+        self._set_node_state(srvname, record['states'][srvname])
+        if self._states[srvname] == RECOVERING:
+            self.recov_info = record['recov_info']
+        self.index = record['index']
+
     def add_server(self, server):
         assert isinstance(server, Server)
         self.failservers.append(server)
-        self._states[str(server.hostname)] = None
+        self._set_node_state(str(server.hostname), None)
 
     def update_server(self):
         """
@@ -332,12 +401,10 @@ class Target(Component, Disk):
 
         self.local_state = None   # Unknown
 
-        # find pathnames matching wanted lustre procfs
-        # (Since Lustre 2.4. More than one path could be returned.
-        #  The first one is fine.)
-        mntdev_path = glob('/proc/fs/lustre/*/%s/mntdev' % self.label)
+        procfs = ProcSnapshot.snapshot()
 
-        recov_path = glob('/proc/fs/lustre/*/%s/recovery_status' % self.label)
+        # find pathnames matching wanted lustre procfs
+        mntdev_path, recov_path = procfs.target_paths(self.label)
         assert len(recov_path) <= 1
 
         # check for label presence in /proc : is this lustre target started?
@@ -349,28 +416,19 @@ class Target(Component, Disk):
                                        "/proc/fs/lustre for %s" % self.label)
         else:
             # get target's real device
-            fproc = open(mntdev_path[0])
-            try:
-                self.mntdev = fproc.readline().rstrip('\n')
-            finally:
-                fproc.close()
+            self.mntdev = procfs.mntdev(self.label)
 
             loaded = True
 
             # check for presence in /proc/mounts
-            f_proc_mounts = open("/proc/mounts", 'r')
-            try:
-                for line in f_proc_mounts:
-                    if line.find("%s " % self.mntdev) == 0:
-                        if line.split(' ', 3)[2] == "lustre":
-                            if loaded:
-                                self.local_state = MOUNTED
-                            else:
-                                self.local_state = TARGET_ERROR
-                                raise ComponentError(self, "multiple " \
-                                        " mounts detected for %s" % self.label)
-            finally:
-                f_proc_mounts.close()
+            for _, _, fstype in procfs.mounts_by_dev(self.mntdev):
+                if fstype == "lustre":
+                    if loaded:
+                        self.local_state = MOUNTED
+                    else:
+                        self.local_state = TARGET_ERROR
+                        raise ComponentError(self, "multiple " \
+                                " mounts detected for %s" % self.label)
 
             if self.local_state != MOUNTED and loaded:
                 self.local_state = TARGET_ERROR
@@ -388,19 +446,17 @@ class Target(Component, Disk):
 
             if self.local_state == MOUNTED and self.TYPE != MGT.TYPE:
                 # check for MDT or OST recovery (MGS doesn't make any recovery)
-                try:
-                    fproc = open(recov_path[0], 'r')
-                except (IOError, IndexError):
+                lines = procfs.recovery_status(self.label)
+                if lines is None:
                     self.local_state = TARGET_ERROR
                     raise ComponentError(self, "recovery_state file not " \
                                                   "found for %s" % self.label)
 
-                try:
-
-                    for line in fproc:
-                        if line.startswith("status:"):
-                            status = line.rstrip().split(' ', 2)[1]
-                            break
+                fproc = iter(lines)
+                for line in fproc:
+                    if line.startswith("status:"):
+                        status = line.rstrip().split(' ', 2)[1]
+                        break
 
 #
 # Recovering information depends on Lustre version.
@@ -414,27 +470,25 @@ class Target(Component, Disk):
 # completed_clients:  connect-replay  TOTAL-recov-delay/TOTAL  TOTAL-recov/TOTAL
 # evicted_clients:    stale           ---                      ---
 #
-                    if status == "RECOVERING":
-                        time_remaining = "??"
-                        completed = -1
-                        evicted = 0
-                        total = 0
-                        for line in fproc:
-                            line = line.strip()
-                            if line.startswith("time_remaining:"):
-                                time_remaining = line.split(' ', 1)[1]
-                            elif line.startswith("connected_clients:"):
-                                total = int(line.split('/', 1)[1])
-                            elif line.startswith("evicted_clients:"):
-                                evicted = int(line.split(' ', 1)[1])
-                            elif line.startswith("completed_clients:"):
-                                completed = line.split(' ', 1)[1]
-                                completed = int(completed.split('/', 1)[0])
-                        self.local_state = RECOVERING
-                        self.recov_info = "%ss (%s/%s)" % (time_remaining,
-                                                    completed + evicted, total)
-                finally:
-                    fproc.close()
+                if status == "RECOVERING":
+                    time_remaining = "??"
+                    completed = -1
+                    evicted = 0
+                    total = 0
+                    for line in fproc:
+                        line = line.strip()
+                        if line.startswith("time_remaining:"):
+                            time_remaining = line.split(' ', 1)[1]
+                        elif line.startswith("connected_clients:"):
+                            total = int(line.split('/', 1)[1])
+                        elif line.startswith("evicted_clients:"):
+                            evicted = int(line.split(' ', 1)[1])
+                        elif line.startswith("completed_clients:"):
+                            completed = line.split(' ', 1)[1]
+                            completed = int(completed.split('/', 1)[0])
+                    self.local_state = RECOVERING
+                    self.recov_info = "%ss (%s/%s)" % (time_remaining,
+                                                completed + evicted, total)
 
     #
     # Helper methods to check component state in Actions.
@@ -499,29 +553,40 @@ class Target(Component, Disk):
         and a 'state' property (forbidding access to the inherited
         'state' attribute)
         """
-        self.__dict__.update(state)
-        if not hasattr(self, '_states'):
+        Component.__setstate__(self, state)
+        self._state_cache = None
+        if '_label' not in state:
+            # Computed on first use, once self.fs is set.
+            self._label = None
+        if 'recov_info' not in state:
+            # Compat v0.910
+            self.recov_info = state.get('status_info')
+        if '_states' not in state:
             # Remote object is a pre shine 1.5 object.
             # Create and initialize new style _states attribute.
-            setattr(self, '_states',
-                    {str(self.server.hostname): state['state']})
+            self._states = {str(self.server.hostname): state['state']}
 
             # Add this flag to be able to later notify user of this.
-            setattr(self, '_compat', True)
+            self._compat = True
+        elif '_compat' not in state:
+            self._compat = False
 
 class MGT(Target):
 
+    __slots__ = ()
+
     TYPE = 'mgt'
     START_ORDER = 2
     DISPLAY_ORDER = 2
 
-    @property
-    def label(self):
+    def _build_label(self):
         """Always returns the MGS label which is 'MGS'."""
         return 'MGS'
 
 class MDT(Target):
 
+    __slots__ = ()
+
     TYPE = 'mdt'
     # START_ORDER needs to have OST class declared.
     # See value below.
@@ -530,6 +595,8 @@ class MDT(Target):
 
 class OST(Target):
 
+    __slots__ = ()
+
     TYPE = 'ost'
     START_ORDER = MGT.START_ORDER + 1
     DISPLAY_ORDER = MDT.DISPLAY_ORDER + 1
@@ -543,6 +610,8 @@ class Journal(Component):
     Manage a target external journal device.
     """
 
+    __slots__ = ('target', 'dev', 'dev_size')
+
     TYPE = 'journal'
 
     def __init__(self, target, device):
@@ -550,6 +619,8 @@ class Journal(Component):
                            target.action_enabled, target._mode)
         self.target = target
         self.dev = device
+        # Unknown, like Disk.dev_size before the device is checked
+        self.dev_size = 0
 
     @property
     def label(self):
@@ -561,6 +632,12 @@ class Journal(Component):
     def longtext(self):
         return "%s journal (%s)" % (self.target.get_id(), self.dev)
 
+    def state_record(self):
+        """Return a compact dict of my serializable fields."""
+        record = Component.state_record(self)
+        record['target'] = self.target.uniqueid()
+        return record
+
     def full_check(self, mountdata=True):
         """Device type check."""
 
@@ -10,3 +10,57 @@ class ComponentError(Exception):
     def __init__(self, comp, message):
         Exception.__init__(self, message)
         self.comp = comp
+
+class FSError(Exception):
+    """
+    Base FileSystem error exception.
+    """
+
+class FSRemoteError(FSError):
+    """
+    Remote host(s) not available, or a remote operation failed.
+    """
+    def __init__(self, nodes, rc, msg):
+        FSError.__init__(self)
+        self.msg = msg
+        self.nodes = nodes
+        self.rc = int(rc)
+
+    def __str__(self):
+        return "%s: %s [rc=%d]" % (self.nodes, self.msg, self.rc)
+
+
+def _slot_descriptors(obj):
+    """Return (name, descriptor) of all slots of `obj' class hierarchy."""
+    descrs = []
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            descrs.append((name, cls.__dict__[name]))
+    return descrs
+
+def slots_getstate(obj, ignore=()):
+    """
+    Return a dict of the slot attributes set on `obj', for pickling.
+
+    Slots are read through their descriptor, properties built on them
+    (see Component.state) are not called. Unset slots are skipped.
+    """
+    odict = {}
+    for name, descr in _slot_descriptors(obj):
+        if name not in ignore:
+            try:
+                odict[name] = descr.__get__(obj, type(obj))
+            except AttributeError:
+                pass
+    return odict
+
+def slots_setstate(obj, state):
+    """
+    Set `obj' slot attributes from a dict built by slots_getstate().
+
+    Names which are not slots, sent by other shine versions, are ignored.
+    """
+    descrs = dict(_slot_descriptors(obj))
+    for name, value in state.iteritems():
+        if name in descrs:
+            descrs[name].__set__(obj, value)
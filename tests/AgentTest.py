@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# Shine.Agent test suite
+# Copyright (C) 2026 CEA
+
+"""Unit test for the persistent shine agent"""
+
+import os
+import socket
+import threading
+import unittest
+from StringIO import StringIO
+
+import Utils
+
+from Shine.Agent import AgentServer, AgentError, agent_call, agent_connect
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre import ProcSnapshot, StatusCache
+from Shine.Lustre.Disk import _MOUNTDATA_CACHE
+from Shine.Lustre.Actions.Action import _RESOURCES, get_resource
+
+
+class EchoAgent(AgentServer):
+    """Agent which prints its request instead of running it."""
+
+    def __init__(self, sockpath):
+        AgentServer.__init__(self, sockpath)
+        self.running = threading.Event()
+        self.release = threading.Event()
+
+    def run_request(self, args):
+        print ' '.join(args)
+        if args == ['crash']:
+            raise RuntimeError('Oops')
+        if args == ['block']:
+            self.running.set()
+            self.release.wait(10)
+        return len(args)
+
+
+class AgentTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Utils.make_tempdir()
+        self.sockpath = os.path.join(self.tmpdir, 'agent.sock')
+        self.agent = None
+
+    def tearDown(self):
+        if self.agent:
+            self.agent.close()
+        Utils.clean_tempdir(self.tmpdir)
+
+    def _bind(self):
+        """Create an EchoAgent listening on the test socket."""
+        self.agent = EchoAgent(self.sockpath)
+        self.agent.bind()
+
+    def _serve(self, count):
+        """Start an EchoAgent serving `count' requests in a thread."""
+        self._bind()
+        thread = threading.Thread(target=self.agent.serve, args=(count,))
+        thread.setDaemon(True)
+        thread.start()
+        return thread
+
+    def test_request(self):
+        """agent runs a request and returns its output and rc"""
+        thread = self._serve(2)
+        output = StringIO()
+        rc = agent_call(self.sockpath, ['status', '-f', 'foo bar', '-R'],
+                        output)
+        self.assertEqual(rc, 4)
+        self.assertEqual(output.getvalue(), "status -f foo bar -R\n")
+
+        # Agent keeps serving requests
+        output = StringIO()
+        self.assertEqual(agent_call(self.sockpath, ['list'], output), 1)
+        self.assertEqual(output.getvalue(), "list\n")
+        thread.join(10)
+        self.assertFalse(thread.isAlive())
+
+    def test_request_crash(self):
+        """agent survives to a request crash"""
+        thread = self._serve(2)
+        output = StringIO()
+        self.assertEqual(agent_call(self.sockpath, ['crash'], output), 1)
+        self.assertTrue('RuntimeError: Oops' in output.getvalue())
+
+        output = StringIO()
+        self.assertEqual(agent_call(self.sockpath, ['list'], output), 1)
+        thread.join(10)
+        self.assertFalse(thread.isAlive())
+
+    def test_busy_agent(self):
+        """a request sent to a busy agent is not queued"""
+        thread = self._serve(3)
+        blocked = threading.Thread(target=agent_call,
+                                   args=(self.sockpath, ['block'], StringIO()))
+        blocked.setDaemon(True)
+        blocked.start()
+        self.agent.running.wait(10)
+
+        self.assertRaises(socket.timeout, agent_connect, self.sockpath, 0.2)
+
+        # Once done, it serves requests again
+        self.agent.release.set()
+        blocked.join(10)
+        self.assertEqual(agent_call(self.sockpath, ['list'], StringIO()), 1)
+        thread.join(10)
+        self.assertFalse(thread.isAlive())
+
+    def test_socket_mode(self):
+        """agent socket is only accessible by its owner"""
+        self._bind()
+        self.assertEqual(os.stat(self.sockpath).st_mode & 0777, 0700)
+
+    def test_no_agent(self):
+        """agent_call() raises an error if no agent is listening"""
+        self.assertRaises(socket.error, agent_call, self.sockpath, ['list'])
+
+    def test_already_running(self):
+        """two agents cannot listen on the same socket"""
+        self._bind()
+        self.assertRaises(AgentError, AgentServer(self.sockpath).bind)
+
+    def test_stale_socket(self):
+        """a stale socket file is replaced"""
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.sockpath)
+        sock.close()
+        thread = self._serve(1)
+        self.assertEqual(agent_call(self.sockpath, ['list'], StringIO()), 1)
+        thread.join(10)
+        self.assertFalse(thread.isAlive())
+
+    def test_reset_state(self):
+        """agent forgets process-wide state before each request"""
+        Globals().replace('agent_socket', self.sockpath)
+        get_resource('loopdev').acquire()
+        _MOUNTDATA_CACHE[('/dev/foo', 0, 0)] = (0, 'foo-MDT0000')
+        StatusCache._cache('foo')
+        ProcSnapshot.activate()
+        ProcSnapshot.snapshot()
+
+        EchoAgent(self.sockpath).reset_state()
+        self.assertEqual(Globals().get('agent_socket'), None)
+        self.assertEqual(_RESOURCES, {})
+        self.assertEqual(_MOUNTDATA_CACHE, {})
+        self.assertEqual(StatusCache._CACHES, {})
+        self.assertEqual(ProcSnapshot._ACTIVE, False)
+        self.assertEqual(ProcSnapshot._CURRENT, None)
@@ -9,9 +9,11 @@ import unittest
 import sys
 from Shine.Configuration.Globals import Globals
 from Shine.CLI.TextTable import TextTable
-from Shine.CLI.Display import setup_table, table_fill, display, DisplayError
+from Shine.CLI.Display import setup_table, table_fill, display, DisplayError, \
+                              status_snapshot, display_transitions
 
-from Shine.Lustre.FileSystem import FileSystem, Server, MOUNTED
+from Shine.Lustre.FileSystem import FileSystem, Server, MOUNTED, OFFLINE, \
+                                    RECOVERING
 
 class DummyCommand(object):
     """Command mock-up for test purpose only."""
@@ -250,6 +252,18 @@ class ComplexFillTests(unittest.TestCase):
         table_fill(tbl, self._fs, None, supports='dev')
         self.assertEqual(str(tbl), 'MGT foo1 1\nMDT foo2 1\nOST foo3 2')
 
+    def test_client_set(self):
+        """client set nodes are counted and split per state"""
+        clients = self._fs.new_client_set(Server('cli[1-10]', []), '/foo')
+        clients.state = MOUNTED
+        clients.set_node_state('cli5', OFFLINE)
+        tbl = TextTable(fmt="%3type %count %status %nodes")
+        tbl.show_header = False
+        table_fill(tbl, self._fs, lambda t: (t.TYPE, t.text_status()),
+                   supports='mount')
+        self.assertEqual(str(tbl), 'CLI 9 mounted cli[1-4,6-10]\n'
+                                   'CLI 1 offline cli5')
+
 
 class DisplayTest(unittest.TestCase):
 
@@ -351,3 +365,54 @@ MGT  1 unknown foo1
 MDT  1 unknown foo2
 OST  2 unknown foo3
 CLI  1 unknown foo0""")
+
+
+class TransitionsTests(unittest.TestCase):
+
+    def setUp(self):
+        self._fs = FileSystem('foo')
+        self._mgt = self._fs.new_target(Server('foo1', ['foo1@tcp']), 'mgt',
+                                        0, '/dev/mgt')
+        self._mdt = self._fs.new_target(Server('foo2', ['foo2@tcp']), 'mdt',
+                                        0, '/dev/mdt')
+        self._cmd = DummyCommand(DummyOptions('never', True))
+
+    def test_no_change(self):
+        """no transition is displayed if nothing changed"""
+        self._mgt.state = MOUNTED
+        before = status_snapshot(self._fs)
+        self.assertEqual(display_transitions(self._cmd, self._fs, before,
+                                             status_snapshot(self._fs)), "")
+
+    def test_changes(self):
+        """only changed components are displayed"""
+        self._mgt.state = MOUNTED
+        self._mdt.state = RECOVERING
+        self._mdt.recov_info = "0:42"
+        before = status_snapshot(self._fs)
+        self._mdt.state = MOUNTED
+        self.assertEqual(display_transitions(self._cmd, self._fs, before,
+                                             status_snapshot(self._fs)),
+                         "foo foo-MDT0000 on foo2: recovering for 0:42 -> online")
+
+    def test_client_set(self):
+        """client set nodes with the same transition share a line"""
+        clients = self._fs.new_client_set(Server('cli[1-4]', []), '/foo')
+        clients.state = MOUNTED
+        before = status_snapshot(self._fs)
+        clients.set_node_state('cli2', OFFLINE)
+        clients.set_node_state('cli3', OFFLINE)
+        self.assertEqual(display_transitions(self._cmd, self._fs, before,
+                                             status_snapshot(self._fs)),
+                         "foo foo-client on cli[2-3]: mounted -> offline")
+
+    def test_color(self):
+        """transitions are highlighted with colors"""
+        self._cmd = DummyCommand(DummyOptions('always', True))
+        self._mgt.state = OFFLINE
+        before = status_snapshot(self._fs)
+        self._mgt.state = MOUNTED
+        self.assertEqual(display_transitions(self._cmd, self._fs, before,
+                                             status_snapshot(self._fs)),
+                         "foo MGS on foo1: offline -> "
+                         "\033[1;33monline\033[0m")
@@ -0,0 +1,260 @@
+#!/usr/bin/env python
+# Shine.Commands test suite
+# Copyright (C) 2026 CEA
+
+"""Unit test for the command registry and command helpers"""
+
+import sys
+import subprocess
+import unittest
+from StringIO import StringIO
+
+from ClusterShell.NodeSet import NodeSet
+
+from Shine.Commands import COMMAND_LIST, CommandRegistry
+import Shine.Commands.Status
+from Shine.Commands.Status import NodeBackoff, Status
+from Shine.Commands.Base.CommandRCDefs import RC_FAILURE, RC_ST_OFFLINE, \
+                                              RC_ST_ONLINE, RC_RUNTIME_ERROR
+from Shine.Commands.Base.FSEventHandler import FSGlobalEventHandler
+from Shine.Lustre.FileSystem import FileSystem, MOUNTED, RUNTIME_ERROR
+from Shine.Lustre.Server import Server
+
+
+class CommandRegistryTest(unittest.TestCase):
+
+    def test_lookup(self):
+        """command classes are found by name"""
+        self.assertTrue('status' in COMMAND_LIST)
+        self.assertFalse('foo' in COMMAND_LIST)
+        self.assertEqual(len(COMMAND_LIST), 17)
+        cls = COMMAND_LIST['list']
+        self.assertEqual(cls.NAME, 'list')
+        self.assertTrue(COMMAND_LIST['list'] is cls)
+        self.assertTrue('list' in COMMAND_LIST.loaded())
+
+    def test_unknown(self):
+        """unknown command raises KeyError"""
+        registry = CommandRegistry({'list': 'List'})
+        self.assertRaises(KeyError, registry.__getitem__, 'status')
+
+    def test_startup_imports(self):
+        """controller startup does not import any command module"""
+        probe = "import sys, Shine.Controller\n" \
+                "print ' '.join([name for name in sys.modules\n" \
+                "                if sys.modules[name]])"
+        proc = subprocess.Popen([sys.executable, '-c', probe],
+                                stdout=subprocess.PIPE)
+        modules = proc.communicate()[0].split()
+        self.assertEqual(proc.returncode, 0)
+        self.assertTrue('Shine.Controller' in modules)
+        for name in ('Status', 'Format', 'Update', 'Show'):
+            self.assertFalse('Shine.Commands.%s' % name in modules)
+        self.assertFalse('Shine.Lustre.FileSystem' in modules)
+        self.assertFalse('Shine.Configuration.TuningModel' in modules)
+        # Nor the modules only needed to run a command
+        for name in ('Lustre.Actions.Proxy', 'Lustre.Actions.Action',
+                     'Lustre.Actions.Status', 'Lustre.Actions.Tune',
+                     'Lustre.Server', 'Lustre.StatusCache', 'CLI.Display',
+                     'Commands.Base.RemoteCallEventHandler'):
+            self.assertFalse('Shine.%s' % name in modules, name)
+
+    def test_parallel_fs_commands(self):
+        """commands supporting --parallel-fs"""
+        for name in ('status', 'stop', 'mount', 'umount', 'execute'):
+            self.assertTrue(COMMAND_LIST[name].PARALLEL_FS)
+        for name in ('start', 'format', 'tune'):
+            self.assertFalse(COMMAND_LIST[name].PARALLEL_FS)
+
+
+class FakeOptions(object):
+    verbose = 0
+    watch = 1
+
+class WatchOptions(FakeOptions):
+    view = 'fs'
+    failover = None
+    dryrun = False
+    fanout = None
+    mountdata = 'auto'
+    max_age = None
+    color = 'never'
+    header = True
+
+class FakeCommand(object):
+    NAME = 'stop'
+    options = FakeOptions()
+
+
+class FSEventHandlerTest(unittest.TestCase):
+
+    def test_timer_all_fs(self):
+        """in progress message counts all file systems being processed"""
+        eh = FSGlobalEventHandler(FakeCommand())
+        filesystems = []
+        for idx in (1, 2):
+            fs = FileSystem('fs%d' % idx)
+            srv = Server('foo%d' % idx, ['foo%d@tcp' % idx])
+            tgt = fs.new_target(srv, 'ost', 0, '/dev/sda')
+            tgt._add_action('stop')
+            filesystems.append(fs)
+            eh.pre(fs)
+
+        saved, sys.stdout = sys.stdout, StringIO()
+        try:
+            eh.ev_timer(None)
+            output = sys.stdout.getvalue()
+        finally:
+            sys.stdout = saved
+        self.assertTrue(output.endswith(
+            "In progress for 2 component(s) on foo[1-2] ...\n"), output)
+
+        # Finished file systems are not counted anymore.
+        eh.post(filesystems[0])
+        self.assertEqual(eh._filesystems, [filesystems[1]])
+
+
+class NodeBackoffTest(unittest.TestCase):
+
+    def test_backoff(self):
+        """failing nodes are skipped for a growing number of polls"""
+        backoff = NodeBackoff()
+        self.assertEqual(backoff.skipped(), set())
+        self.assertEqual(backoff.update(['foo1', 'foo2'], set(['foo2'])),
+                         ['foo2'])
+        self.assertEqual(backoff.skipped(), set(['foo2']))
+        self.assertEqual(backoff.update(['foo1'], set()), [])
+        # Still failing: skipped twice, not reported again
+        self.assertEqual(backoff.skipped(), set())
+        self.assertEqual(backoff.update(['foo1', 'foo2'], set(['foo2'])), [])
+        self.assertEqual(backoff.skipped(), set(['foo2']))
+        self.assertEqual(backoff.skipped(), set(['foo2']))
+        self.assertEqual(backoff.skipped(), set())
+
+    def test_recovery(self):
+        """a node answering again is polled each time"""
+        backoff = NodeBackoff()
+        backoff.update(['foo1'], set(['foo1']))
+        backoff.skipped()
+        backoff.update(['foo1'], set())
+        self.assertEqual(backoff.skipped(), set())
+
+    def test_max_skip(self):
+        """skipped polls are limited to MAX_SKIP"""
+        backoff = NodeBackoff()
+        for _ in range(10):
+            backoff.update(['foo1'], set(['foo1']))
+        skipped = 0
+        while backoff.skipped():
+            skipped += 1
+        self.assertEqual(skipped, NodeBackoff.MAX_SKIP)
+
+
+class WatchTest(unittest.TestCase):
+
+    def test_interrupted(self):
+        """watch returns the last status rc when interrupted"""
+        cmd = Status(FakeOptions())
+        ok_fs = FileSystem('fs1')
+        bad_fs = FileSystem('fs2')
+        def prepare_fs(fs, fs_conf, eh, vlevel):
+            if fs is bad_fs:
+                return RC_FAILURE
+            return ('status', {})
+        rounds = []
+        def watch_round(watched, eh, backoff, snapshots, rcs):
+            if rounds:
+                raise KeyboardInterrupt
+            rounds.append([fs.fs_name for fs in watched])
+            rcs['fs1'] = RC_ST_OFFLINE
+        cmd.prepare_fs = prepare_fs
+        cmd._watch_round = watch_round
+        cmd._wait = lambda delay: None
+
+        saved, sys.stderr = sys.stderr, StringIO()
+        try:
+            rc = cmd.execute_watch_fs([(ok_fs, None), (bad_fs, None)], None,
+                                      0)
+            output = sys.stderr.getvalue()
+        finally:
+            sys.stderr = saved
+        self.assertEqual(rounds, [['fs1']])
+        self.assertEqual(output, "ERROR: Cannot watch `fs2' (rc=%d)\n" %
+                                 RC_FAILURE)
+        self.assertEqual(rc, max(RC_FAILURE, RC_ST_OFFLINE))
+
+    def _round(self, cmd, backoff, snapshots, rcs, answering):
+        """
+        Run a watch round where only `answering' nodes report their
+        components as mounted. Return its output.
+        """
+        calls = []
+        def multi_run(fs_calls):
+            results = []
+            for fs, _, kwargs in fs_calls:
+                calls.append(kwargs)
+                for comp in kwargs['comps']:
+                    nodes = comp.allservers().nodeset()
+                    for node in nodes.difference(kwargs['excluded']):
+                        if node not in answering:
+                            fs._handle_shine_proxy_error(node, "timeout")
+                            comp.sanitize_state(nodes=NodeSet(node))
+                        elif comp.capable('split'):
+                            comp.set_node_state(node, MOUNTED)
+                        else:
+                            comp._set_node_state(node, MOUNTED)
+                results.append(fs._check_errors([MOUNTED], kwargs['comps']))
+            return results
+
+        saved_run = Shine.Commands.Status.multi_run
+        saved, sys.stdout = sys.stdout, StringIO()
+        Shine.Commands.Status.multi_run = multi_run
+        try:
+            cmd._watch_round([self.fs], None, backoff, snapshots, rcs)
+            output = sys.stdout.getvalue()
+        finally:
+            Shine.Commands.Status.multi_run = saved_run
+            sys.stdout = saved
+        return calls, output
+
+    def test_node_stops_answering(self):
+        """a node failing after a first answer shows up as a transition"""
+        self.fs = FileSystem('fs1')
+        for index, node in enumerate(['foo1', 'foo2']):
+            srv = Server(node, ['%s@tcp' % node])
+            self.fs.new_target(srv, 'ost', index, '/dev/sda')
+        clients = self.fs.new_client_set(Server('cli[1-3]', []), '/fs1')
+        cmd = Status(WatchOptions())
+        cmd._status_result = lambda fs, result, eh: cmd.fs_status_to_rc(result)
+        backoff = NodeBackoff()
+        snapshots = {}
+        rcs = {}
+
+        self._round(cmd, backoff, snapshots, rcs,
+                    ['foo1', 'foo2', 'cli1', 'cli2', 'cli3'])
+        self.assertEqual(rcs, {'fs1': RC_ST_ONLINE})
+
+        # foo2 and cli2 do not answer anymore
+        calls, output = self._round(cmd, backoff, snapshots, rcs,
+                                    ['foo1', 'cli1', 'cli3'])
+        lines = [line.split(' ', 1)[1] for line in output.splitlines()]
+        self.assertTrue("fs1 fs1-OST0001 on foo2: online -> CHECK FAILURE"
+                        in lines, lines)
+        self.assertTrue("cli2 is not responding, polling it less often"
+                        in lines, lines)
+        self.assertTrue("foo2 is not responding, polling it less often"
+                        in lines, lines)
+        self.assertEqual(rcs, {'fs1': RC_RUNTIME_ERROR})
+        self.assertEqual(clients.get_node_state('cli2'), RUNTIME_ERROR)
+
+        # They are skipped, the rest of the client set is still polled
+        calls, output = self._round(cmd, backoff, snapshots, rcs,
+                                    ['foo1', 'cli1', 'cli3'])
+        self.assertEqual(str(calls[0]['excluded']), 'cli2,foo2')
+        self.assertEqual(sorted([comp.label for comp in calls[0]['comps']]),
+                         ['fs1-OST0000', 'fs1-client'])
+        self.assertEqual(output.split(' ', 1)[1],
+                         "fs1: stale status of fs1-OST0001, fs1-client, "
+                         "not polled on cli2,foo2\n")
+        self.assertEqual(clients.get_node_state('cli2'), RUNTIME_ERROR)
+        self.assertEqual(clients.get_node_state('cli1'), MOUNTED)
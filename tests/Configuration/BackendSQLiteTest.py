@@ -0,0 +1,175 @@
+#!/usr/bin/env python
+# Shine.Configuration.Backend.SQLite test suite
+# $Id$
+
+
+"""Unit test for Backend SQLite"""
+
+import os
+import time
+import unittest
+
+from Utils import makeTempFile, makeTempFilename, \
+                  setup_tempdirs, clean_tempdirs
+from Shine.Configuration.Globals import Globals
+from Shine.Configuration.Configuration import Configuration
+from Shine.Configuration.Backend.BackendRegistry import BackendRegistry
+
+STORAGE = """mgt: node=foo1 dev=/dev/sda
+mdt: node=foo1 dev=/dev/sdd
+ost: node=foo1 dev=/dev/sdb
+ost: node=foo1 dev=/dev/sdc
+ost: node=foo2 dev=/dev/sdb ha_node=foo1"""
+
+class BackendSQLiteTest(unittest.TestCase):
+
+    def setUp(self):
+        self._confs = []
+        setup_tempdirs()
+        Globals().replace('backend', 'SQLite')
+        self._dbfile = makeTempFilename()
+        Globals().replace('storage_db', self._dbfile)
+
+    def tearDown(self):
+        for conf in self._confs:
+            conf.unregister_fs()
+        Globals().replace('storage_file', '/etc/shine/storage.conf')
+        del Globals()['storage_db']
+        os.unlink(self._dbfile)
+        clean_tempdirs()
+        Globals().replace('backend', 'None')
+
+    def make_temp_conf(self, txt):
+        self._storagefile = makeTempFile(txt)
+        Globals().replace('storage_file', self._storagefile.name)
+
+    def make_temp_fs(self, txt, register=False):
+        fsfile = makeTempFile(txt)
+        conf = Configuration.create_from_model(fsfile.name)
+        self._confs.append(conf)
+        if register:
+            conf.register_fs()
+            conf.register_targets()
+        return conf._fs.model
+
+    def test_simple_mgs(self):
+        self.make_temp_conf("mgt: node=foo1 dev=/dev/sda")
+        model = self.make_temp_fs("""fs_name: example
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1""")
+        self.assertEqual(model.get('mgt')[0].get('dev'), '/dev/sda')
+
+    def test_ha_nodes(self):
+        """target with several ha_nodes"""
+        self.make_temp_conf("mgt: node=foo1 dev=/dev/sda ha_node=foo1 ha_node=foo2")
+        model = self.make_temp_fs("""fs_name: example
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1 ha_node=foo1""")
+        self.assertEqual(model.get('mgt')[0].get('ha_node'), ['foo1', 'foo2'])
+
+    def test_registered_devices_are_used(self):
+        """registered devices are not available to other filesystems"""
+        self.make_temp_conf(STORAGE)
+        model = self.make_temp_fs("""fs_name: fs1
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1
+mdt: node=foo1
+ost: node=foo1 dev=/dev/sdb""", register=True)
+        self.assertEqual(model.get('ost')[0].get('dev'), '/dev/sdb')
+
+        backend = BackendRegistry().get('SQLite')
+        backend.start()
+        devs = [(dev.get('node'), dev.get('dev'))
+                for dev in backend.get_target_devices('ost')]
+        self.assertEqual(devs, [('foo1', '/dev/sdc'), ('foo2', '/dev/sdb')])
+        self.assertEqual(backend.get_target_devices('mgt'), [])
+
+        # Update mode also sees devices from the same filesystem
+        devs = backend.get_target_devices('ost', fs_name='fs1',
+                                          update_mode=True)
+        self.assertEqual(len(devs), 3)
+
+        model = self.make_temp_fs("""fs_name: fs2
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1 mode=external
+mdt: node=foo1 mode=external
+ost: node=foo1""")
+        self.assertEqual(len(model.get('ost')), 1)
+        self.assertEqual(model.get('ost')[0].get('dev'), '/dev/sdc')
+        backend.stop()
+
+    def test_unregister(self):
+        """unregistered devices are available again"""
+        self.make_temp_conf(STORAGE)
+        self.make_temp_fs("""fs_name: fs1
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1
+mdt: node=foo1
+ost: node=foo[1-2]""", register=True)
+        backend = BackendRegistry().get('SQLite')
+        backend.start()
+        self.assertEqual(backend.get_target_devices('ost'), [])
+
+        self._confs.pop().unregister_fs()
+        self.assertEqual(len(backend.get_target_devices('ost')), 3)
+        backend.stop()
+
+    def test_storage_file_update(self):
+        """storage file changes keep device assignments"""
+        self.make_temp_conf(STORAGE)
+        self.make_temp_fs("""fs_name: fs1
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1
+mdt: node=foo1
+ost: node=foo1 dev=/dev/sdb""", register=True)
+
+        # Drop a used and an unused OST, add a new one
+        self._storagefile.seek(0)
+        self._storagefile.truncate()
+        self._storagefile.write("""ost: node=foo2 dev=/dev/sdb jdev=/dev/sdj
+ost: node=foo3 dev=/dev/sdb""")
+        self._storagefile.flush()
+        mtime = time.time() + 10
+        os.utime(self._storagefile.name, (mtime, mtime))
+
+        backend = BackendRegistry().get('SQLite')
+        backend.start()
+        devs = [(dev.get('node'), dev.get('dev'), dev.get('jdev'))
+                for dev in backend.get_target_devices('ost')]
+        self.assertEqual(devs, [('foo2', '/dev/sdb', '/dev/sdj'),
+                                ('foo3', '/dev/sdb', None)])
+        devs = backend.get_target_devices('ost', fs_name='fs1',
+                                          update_mode=True)
+        self.assertEqual(len(devs), 3)
+        backend.stop()
+
+    def test_update_keeps_indexes(self):
+        """update mode keeps target indexes of registered devices"""
+        self.make_temp_conf("""mgt: node=foo1 dev=/dev/sda
+mdt: node=foo1 dev=/dev/sdd
+ost: node=foo2 dev=/dev/sdb
+ost: node=foo3 dev=/dev/sdb""")
+        model = self.make_temp_fs("""fs_name: fs1
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1
+mdt: node=foo1
+ost: node=foo[2-3]""", register=True)
+        indexes = dict([(ost.get('node'), ost.get('index'))
+                        for ost in model.get('ost')])
+        self.assertEqual(indexes, {'foo2': 0, 'foo3': 1})
+
+        # A new device, sorted before the others
+        self._storagefile.write("\nost: node=foo1 dev=/dev/sdb\n")
+        self._storagefile.flush()
+        mtime = time.time() + 10
+        os.utime(self._storagefile.name, (mtime, mtime))
+
+        fsfile = makeTempFile("""fs_name: fs1
+nid_map: nodes=foo[1-10] nids=foo[1-10]@tcp0
+mgt: node=foo1
+mdt: node=foo1
+ost: node=foo[1-3]""")
+        conf = Configuration.create_from_model(fsfile.name, update_mode=True)
+        indexes = dict([(ost.get('node'), ost.get('index'))
+                        for ost in conf._fs.model.get('ost')])
+        self.assertEqual(indexes, {'foo1': 2, 'foo2': 0, 'foo3': 1})
@@ -5,12 +5,15 @@
 
 """Unit test for Shine.Configuration.FileSystem"""
 
+import os
+import cPickle
 import unittest
 import textwrap
 import time
 
 from Utils import makeTempFile, setup_tempdirs, clean_tempdirs
 from Shine.Configuration.FileSystem import FileSystem, ModelFileIOError, ConfigDeviceNotFoundError
+from Shine.Configuration.FileSystem import COMPILED_SUFFIX, COMPILED_VERSION
 from Shine.Configuration.Exceptions import ConfigException, ConfigInvalidFileSystem
 from Shine.Configuration.TargetDevice import TargetDevice
 from Shine.Configuration.Backend.Backend import Backend
@@ -177,6 +180,34 @@ mgt: node=foo1
 mdt: node=foo2
 ost: node=foo2 index=0
 ost: node=foo1 index=0
+""")
+
+    def test_many_indexes(self):
+        """filesystem with thousands of OSTs and some indexes set"""
+        self._fs = self.makeConfFileSystem("""
+fs_name: example
+nid_map: nodes=foo[1-2] nids=foo[1-2]@tcp0
+mgt: node=foo1
+mdt: node=foo2
+ost: node=foo1 index=2
+ost: node=foo2 dev=/dev/sd[0-2999]
+ost: node=foo1 index=4
+""")
+        osts = self._fs.get('ost')
+        self.assertEqual(len(osts), 3002)
+        self.assertEqual([ost.get('index') for ost in osts[:5]],
+                         [2, 0, 1, 3, 5])
+        self.assertEqual(osts[-2].get('index'), 3001)
+        self.assertEqual(osts[-1].get('index'), 4)
+
+    def test_bad_index(self):
+        """filesystem with an out of range index"""
+        self.assertRaises(ConfigInvalidFileSystem, self.makeConfFileSystem, """
+fs_name: example
+nid_map: nodes=foo[1-2] nids=foo[1-2]@tcp0
+mgt: node=foo1
+mdt: node=foo2
+ost: node=foo2 index=65535
 """)
 
     def make_fs_with_backend(self, backend, text):
@@ -654,3 +685,101 @@ ost: node=foo3 dev=/dev/sda tag=ost_fooE_dev_sda
         self.assertEqual(len(actions), 2)
         self.assertTrue(actions.get('mount', False))
         self.assertEqual(actions.get('copyconf'), True)
+
+
+class CompiledModelTest(unittest.TestCase):
+
+    def setUp(self):
+        setup_tempdirs()
+        self._testfile = makeTempFile("""fs_name: compiled
+nid_map: nodes=foo[1-2] nids=foo[1-2]@tcp
+mgt: node=foo1 dev=/dev/sda
+mdt: node=foo1 dev=/dev/sdb
+ost: node=foo2 dev=/dev/sdc[1-4]
+""")
+        self._fs = FileSystem.create_from_model(self._testfile.name)
+        self.cachepath = self._fs.xmf_path + COMPILED_SUFFIX
+
+    def tearDown(self):
+        self._fs.unregister()
+        clean_tempdirs()
+
+    def _tamper(self, description):
+        """Change compiled model description, without changing model file."""
+        fcache = open(self.cachepath, 'rb')
+        cached = cPickle.load(fcache)
+        fcache.close()
+        cached['model'].replace('description', description)
+        fcache = open(self.cachepath, 'wb')
+        cPickle.dump(cached, fcache)
+        fcache.close()
+
+    def _rewrite(self, **fields):
+        """Replace fields of the compiled model file."""
+        fcache = open(self.cachepath, 'rb')
+        cached = cPickle.load(fcache)
+        fcache.close()
+        cached.update(fields)
+        fcache = open(self.cachepath, 'wb')
+        cPickle.dump(cached, fcache)
+        fcache.close()
+
+    def _append(self, text):
+        fxmf = open(self._fs.xmf_path, 'a')
+        fxmf.write(text)
+        fxmf.close()
+
+    def test_compiled_file(self):
+        """test loading a filesystem creates its compiled model"""
+        self.assertTrue(os.path.exists(self.cachepath))
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.model, self._fs.model)
+        self.assertEqual(len(fs.get('ost')), 4)
+
+    def test_compiled_used(self):
+        """test unchanged model file is not parsed again"""
+        self._tamper('from cache')
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.get('description'), 'from cache')
+
+    def test_model_changed(self):
+        """test modified model file is parsed again"""
+        self._tamper('from cache')
+        self._append("description: updated\n")
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.get('description'), 'updated')
+        # Compiled version is updated
+        self._tamper('from cache')
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.get('description'), 'from cache')
+
+    def test_same_content(self):
+        """test model file with a new mtime and same content uses hash"""
+        self._tamper('from cache')
+        info = os.stat(self._fs.xmf_path)
+        os.utime(self._fs.xmf_path, (info.st_atime, info.st_mtime - 10))
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.get('description'), 'from cache')
+
+    def test_bad_compiled_file(self):
+        """test corrupted compiled model is ignored"""
+        fcache = open(self.cachepath, 'wb')
+        fcache.write('garbage')
+        fcache.close()
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.model, self._fs.model)
+        self.assertEqual(len(fs.get('ost')), 4)
+
+    def test_other_shine_version(self):
+        """test compiled model of another shine code is ignored"""
+        self._tamper('from cache')
+        self._rewrite(version=(COMPILED_VERSION, '0.1', 'olddigest'))
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.get('description'), None)
+        self.assertEqual(fs.model, self._fs.model)
+
+    def test_bad_compiled_model(self):
+        """test compiled model which is not a Model is ignored"""
+        self._rewrite(model={'fs_name': 'compiled'})
+        fs = FileSystem.load_from_fsname('compiled')
+        self.assertEqual(fs.model, self._fs.model)
@@ -10,7 +10,8 @@ import textwrap
 
 from Utils import makeTempFile
 
-from Shine.Configuration.Model import Model, ModelFileValueError
+from Shine.Configuration.Model import Model, ModelFileValueError, \
+                                       CandidateSet
 
 class ModelTest(unittest.TestCase):
 
@@ -157,6 +158,42 @@ mgt: node=(\<badregexp>""")
             mgt: node=foo7 ha_node=foo8 ha_node=foo9"""))
         self.assertEqual(len(model.get('mgt')[0].match_device(candidate)), 0)
 
+    def test_match_device_candidate_set(self):
+        """check match_device() gives the same result with a CandidateSet"""
+        devices = [{'node': 'foo%d' % (i % 4), 'tag': 'tag%d' % (i % 3),
+                    'dev': '/dev/sd%d' % i} for i in range(24)]
+        devices.append({'tag': 'tag1', 'dev': '/dev/other'})
+        model = Model()
+        model.parse(textwrap.dedent("""fs_name: match
+            nid_map: nodes=foo[0-3] nids=foo[0-3]@tcp
+            ost: node=foo1
+            ost: node=foo[12] dev=/dev/sd1.
+            ost: tag=tag1 node=foo.
+            ost: tag=tag2 dev=/dev/sd2"""))
+        for target in model.get('ost'):
+            self.assertEqual(target.match_device(CandidateSet(devices)),
+                             target.match_device(devices))
+        self.assertEqual(len(model.get('ost')[0].match_device(devices)), 6)
+
+    def test_candidate_set_remove(self):
+        """check removed candidates are not matched anymore"""
+        devices = [{'node': 'foo1', 'dev': '/dev/sda'},
+                   {'node': 'foo1', 'dev': '/dev/sdb'},
+                   {'node': 'foo2', 'dev': '/dev/sdc'}]
+        candidates = CandidateSet(devices)
+        model = Model()
+        model.parse(textwrap.dedent("""fs_name: match
+            nid_map: nodes=foo[1-2] nids=foo[1-2]@tcp
+            ost: node=foo1
+            ost: node=foo.*"""))
+        candidates.remove(devices[0])
+        self.assertEqual(len(candidates), 2)
+        self.assertEqual(model.get('ost')[0].match_device(candidates),
+                         [devices[1]])
+        self.assertEqual(model.get('ost')[1].match_device(candidates),
+                         devices[1:])
+        self.assertRaises(ValueError, candidates.remove, devices[0])
+
     def test_several_spaces(self):
         model = Model()
         model.parse("""fs_name:  spaces 
@@ -6,6 +6,7 @@
 """Unit test for Model"""
 
 import unittest
+import subprocess
 
 from Utils import makeTempFile
 from ClusterShell.NodeSet import NodeSet
@@ -31,6 +32,36 @@ class TuningModelTest(unittest.TestCase):
         m = TuningModel(filename="../conf/tuning.conf.example")
         m.parse()
 
+    def test_written_value(self):
+        """test written values match the former shell command output"""
+        example = TuningModel(filename="../conf/tuning.conf.example")
+        example.parse()
+        tunings = example.get_params_for_name(None, ['mds'])
+        for value in ('1', '/tmp/toto.log', '"/tmp/toto space.log"',
+                      '"+neterror  +warning"', '"a\\\\b \\$x"', "it\\'s",
+                      '\'a\'"b"c', 'x  y'):
+            tunings.append(TuningParameter('/foo', value, ['mds']))
+
+        values = []
+        for tuning in tunings:
+            # Tunings used to be applied by a bash shell (RHEL /bin/sh)
+            proc = subprocess.Popen(['bash', '-c', 'echo -n %s' %
+                                     tuning.value], stdout=subprocess.PIPE)
+            expected = proc.communicate()[0]
+            self.assertEqual(tuning.written_value(), expected)
+            values.append(tuning.written_value())
+        self.assertEqual(values, ['-all', '1', '/tmp/toto.log',
+                                  '/tmp/toto space.log',
+                                  '+neterror  +warning', 'a\\b $x', "it's",
+                                  'abc', 'x y'])
+
+    def test_unbalanced_quotes(self):
+        """test tuning value with unbalanced quotes"""
+        model = self.makeTempTuningModel("""
+alias foo=/foo
+it's foo MDS""")
+        self.assertRaises(TuningError, model.parse)
+
     def testEmptyFile(self):
         """test empty tuning"""
         m = self.makeTempTuningModel("")
@@ -146,3 +177,40 @@ alias panic_on_lbug=/proc/sys/lnet/panic_on_lbug
 1 panic_on_lbug ROUTER
 0 panic_on_lbug ROUTER""")
         self.assertRaises(TuningError, model.parse)
+
+    def test_node_name_lookup(self):
+        """test tuning lookup on node names with several patterns"""
+        model = self.makeTempTuningModel("""
+alias foo=/foo
+alias bar=/bar
+alias baz=/baz
+1 foo OSS;foo[1-5]
+2 bar foobar2;bar[1-3],foo9
+3 baz foo[10-20];MDS""")
+        model.parse()
+        names = lambda tunings: sorted([tun.name for tun in tunings])
+        self.assertEqual(names(model.get_params_for_name('foo3', [])),
+                         ['/foo'])
+        self.assertEqual(names(model.get_params_for_name('foo9', [])),
+                         ['/bar'])
+        self.assertEqual(names(model.get_params_for_name('foobar2', [])),
+                         ['/bar'])
+        self.assertEqual(names(model.get_params_for_name('foo12', ['oss'])),
+                         ['/baz', '/foo'])
+        self.assertEqual(names(model.get_params_for_name('foo2', ['oss'])),
+                         ['/foo'])
+        self.assertEqual(model.get_params_for_name('foo21', []), [])
+        self.assertEqual(model.get_params_for_name(NodeSet('foo[4-6]'), []),
+                         [])
+
+    def test_index_updated(self):
+        """test parameters created after parsing are found"""
+        model = self.makeTempTuningModel("""
+alias foo=/foo
+1 foo OSS""")
+        model.parse()
+        self.assertEqual(len(model.get_params_for_name('foo1', ['oss'])), 1)
+        model.create_parameter_alias('bar', '/bar')
+        model.create_parameter('bar', '2', ['oss'], ['foo1'])
+        self.assertEqual(len(model.get_params_for_name('foo1', ['oss'])), 2)
+        self.assertEqual(len(model.get_params_for_name('foo1', [])), 1)
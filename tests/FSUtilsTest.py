@@ -218,3 +218,43 @@ mount_path: /param
         self.assertTrue(comps[3].server.action_enabled)
         self.assertTrue(comps[4].server.action_enabled)
         self.assertTrue(comps[5].server.action_enabled)
+
+    def test_client_set(self):
+        # client_set_size=4 gathers all clients in one ClientSet
+        Globals().replace('client_set_size', 4)
+        try:
+            fsconf, fs = open_lustrefs(self.fsconf.get_fs_name())
+        finally:
+            del Globals()['client_set_size']
+        clients = fs.components.filter(supports='mount')
+        self.assertEqual(len(clients), 1)
+        clients = list(clients)[0]
+        self.assertEqual(str(clients.nodes), "foo[8-11]")
+        self.assertEqual(clients.mount_path, "/param")
+        self.assertTrue(clients.action_enabled)
+
+    def test_client_set_exclude(self):
+        # excluded clients are gathered in a disabled ClientSet
+        Globals().replace('client_set_size', 4)
+        try:
+            fsconf, fs = open_lustrefs(self.fsconf.get_fs_name(),
+                                       excluded=NodeSet("foo[9-10]"))
+        finally:
+            del Globals()['client_set_size']
+        clients = fs.components.filter(supports='mount')
+        self.assertEqual(len(clients), 2)
+        enabled = list(clients.enabled())
+        self.assertEqual(len(enabled), 1)
+        self.assertEqual(str(enabled[0].nodes), "foo[8,11]")
+        self.assertTrue(enabled[0].server.action_enabled)
+
+    def test_client_set_too_small(self):
+        # client_set_size above the client count keeps one client per node
+        Globals().replace('client_set_size', 5)
+        try:
+            fsconf, fs = open_lustrefs(self.fsconf.get_fs_name())
+        finally:
+            del Globals()['client_set_size']
+        clients = fs.components.filter(supports='mount')
+        self.assertEqual(len(clients), 4)
+        self.assertFalse([clnt for clnt in clients if clnt.capable('nodes')])
@@ -209,6 +209,18 @@ class ActionsTest(unittest.TestCase):
                 'mkdir -p "/mnt/action/mgt/0" && ' +
                 '/bin/mount -t lustre /dev/root /mnt/action/mgt/0')
 
+    def test_start_target_loopdev_resource(self):
+        """test start actions on loop devices are serialized per server"""
+        disk = Utils.make_disk()
+        tgt1 = self.fs.new_target(self.srv1, 'mgt', 0, disk.name)
+        tgt2 = self.fs.new_target(self.srv1, 'ost', 0, disk.name)
+        res1 = StartTarget(tgt1).resources()
+        res2 = StopTarget(tgt2).resources()
+        self.assertEqual(len(res1), 1)
+        self.assertEqual(res1[0].name, 'localhost:loopdev')
+        self.assertTrue(res1[0] is res2[0])
+        self.assertEqual(Execute(tgt1).resources(), [])
+
     def test_start_target_addopts(self):
         """test command line start target (addl options)"""
         tgt = self.fs.new_target(self.srv1, 'mgt', 0, '/dev/root')
@@ -784,3 +796,15 @@ class ActionsTest(unittest.TestCase):
         """test proxy with dryrun"""
         action = self._create_proxy(debug=False, dryrun=True)
         self.check_cmd(action, 'nosetests dummy -f action -R --dry-run')
+
+    def test_proxy_check(self):
+        """test proxy with check"""
+        action = self._create_proxy(debug=False, check=True)
+        self.check_cmd(action, 'nosetests dummy -f action -R --check')
+
+    def test_proxy_max_age(self):
+        """test proxy with max_age"""
+        action = self._create_proxy(debug=False, max_age=60)
+        self.check_cmd(action, 'nosetests dummy -f action -R --max-age=60')
+        action = self._create_proxy(debug=False, max_age=0)
+        self.check_cmd(action, 'nosetests dummy -f action -R --max-age=0')
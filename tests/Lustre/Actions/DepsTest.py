@@ -25,6 +25,7 @@ import unittest
 from ClusterShell.Task import task_self
 
 from Shine.Lustre.Actions.Action import CommonAction, ActionGroup, \
+                                        Resource, \
                                         ACT_OK, ACT_WAITING, ACT_ERROR
 
 class TestAction(CommonAction):
@@ -43,6 +44,13 @@ class TestAction(CommonAction):
         task_self().run()
 
 
+class NoopAction(CommonAction):
+    """Action which immediately succeeds, without running a command."""
+
+    def _launch(self):
+        self.set_status(ACT_OK)
+
+
 class DepsTests(unittest.TestCase):
 
     def test_simple_ok(self):
@@ -234,6 +242,29 @@ class DepsTests(unittest.TestCase):
         self.assertEqual(act1.status(), ACT_ERROR)
         self.assertEqual(act2.status(), ACT_ERROR)
 
+    def test_long_chain_launch_bottom(self):
+        """Launch at the bottom of a very long chain is fine"""
+        actions = [NoopAction() for _ in range(5000)]
+        for prev, act in zip(actions, actions[1:]):
+            act.depends_on(prev)
+
+        actions[-1].launch()
+
+        for act in actions:
+            self.assertEqual(act.status(), ACT_OK)
+
+    def test_long_chain_error(self):
+        """Error at the top of a very long chain is propagated"""
+        actions = [TestAction('/bin/false')]
+        actions += [NoopAction() for _ in range(5000)]
+        for prev, act in zip(actions, actions[1:]):
+            act.depends_on(prev)
+
+        actions[0].launch_and_run()
+
+        for act in actions:
+            self.assertEqual(act.status(), ACT_ERROR)
+
 
 class ActionGroupTests(unittest.TestCase):
 
@@ -521,3 +552,133 @@ class ActionGroupTests(unittest.TestCase):
         self.assertEqual(grp1.status(), ACT_ERROR)
         self.assertEqual(act2.status(), ACT_WAITING)
         self.assertEqual(grp2.status(), ACT_ERROR)
+
+    def test_large_sequential_group(self):
+        """A large sequential group runs all its members in order"""
+        done = []
+        class OrderedAction(NoopAction):
+            def _launch(self):
+                done.append(self)
+                NoopAction._launch(self)
+
+        for _ in range(5000):
+            self.grp.add(OrderedAction())
+        self.grp.sequential()
+        self.grp.launch()
+
+        self.assertEqual(done, list(self.grp))
+        self.assertEqual(self.grp.status(), ACT_OK)
+
+    def test_error_waits_all_members(self):
+        """A group is on error only when all its members are finished"""
+        act1 = TestAction('/bin/false')
+        act2 = TestAction('sleep 0.2')
+        self.grp.add(act1)
+        self.grp.add(act2)
+        follower = NoopAction()
+        follower.depends_on(self.grp)
+
+        follower.launch()
+        task_self().run()
+
+        self.assertEqual(act1.status(), ACT_ERROR)
+        self.assertEqual(act2.status(), ACT_OK)
+        self.assertEqual(self.grp.status(), ACT_ERROR)
+        self.assertEqual(follower.status(), ACT_ERROR)
+
+
+class ResourceTests(unittest.TestCase):
+
+    def setUp(self):
+        self.log = []
+
+    def _actions(self, count, resources, cmd='sleep 0.1'):
+        """Create actions using `resources' and log their start and end."""
+        log = self.log
+        class LoggedAction(TestAction):
+            def resources(self):
+                return resources
+            def _launch(self):
+                log.append(('start', self))
+                TestAction._launch(self)
+            def set_status(self, status):
+                if status in (ACT_OK, ACT_ERROR):
+                    log.append(('end', self))
+                TestAction.set_status(self, status)
+        return [LoggedAction(cmd) for _ in range(count)]
+
+    def _max_running(self):
+        running = maximum = 0
+        for event, _ in self.log:
+            if event == 'start':
+                running += 1
+                maximum = max(running, maximum)
+            else:
+                running -= 1
+        return maximum
+
+    def test_exclusive(self):
+        """Actions sharing a resource are run one at a time"""
+        res = Resource('foo')
+        grp = ActionGroup()
+        for act in self._actions(3, [res]):
+            grp.add(act)
+
+        grp.launch()
+        task_self().run()
+
+        self.assertEqual(grp.status(), ACT_OK)
+        self.assertEqual(self._max_running(), 1)
+        self.assertEqual(res.users, 0)
+
+    def test_capacity(self):
+        """Resource capacity is honoured"""
+        res = Resource('foo', 2)
+        grp = ActionGroup()
+        for act in self._actions(5, [res]):
+            grp.add(act)
+
+        grp.launch()
+        task_self().run()
+
+        self.assertEqual(grp.status(), ACT_OK)
+        self.assertEqual(self._max_running(), 2)
+
+    def test_errors_release(self):
+        """Resource is released on error"""
+        res = Resource('foo')
+        grp = ActionGroup()
+        for act in self._actions(2, [res], '/bin/false'):
+            grp.add(act)
+
+        grp.launch()
+        task_self().run()
+
+        self.assertEqual(grp.status(), ACT_ERROR)
+        self.assertEqual([act.status() for act in grp], [ACT_ERROR] * 2)
+        self.assertEqual(res.users, 0)
+
+    def test_other_actions_not_limited(self):
+        """Actions without resources are not limited"""
+        res = Resource('foo')
+        grp = ActionGroup()
+        for act in self._actions(2, [res]) + self._actions(2, []):
+            grp.add(act)
+
+        grp.launch()
+        task_self().run()
+
+        self.assertEqual(grp.status(), ACT_OK)
+        self.assertEqual(self._max_running(), 3)
+
+    def test_launch_error_release(self):
+        """Resource is released if the action could not be launched"""
+        res = Resource('foo')
+        class BrokenAction(CommonAction):
+            def resources(self):
+                return [res]
+            def _launch(self):
+                raise ValueError("broken")
+        self.assertRaises(ValueError, BrokenAction().launch)
+        self.assertEqual(res.users, 0)
+
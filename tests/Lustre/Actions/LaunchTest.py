@@ -20,19 +20,28 @@
 
 import os
 import copy
+import time
 import types
+import shutil
+import struct
 import unittest
 import Utils
 
 
+from Shine.Configuration.Globals import Globals
 from Shine.Configuration.TuningModel import TuningModel
 
-from Shine.Lustre.Actions.Action import ACT_OK, ACT_ERROR
+from Shine.Lustre import StatusCache, ComponentError
+from ClusterShell.Task import task_self
+
+from Shine.Lustre.Actions.Action import CommonAction, Resource, ACT_OK, \
+                                        ACT_ERROR
 from Shine.Lustre.Actions.Install import Install
 from Shine.Lustre.EventHandler import EventHandler
 from Shine.Lustre.Server import Server
 from Shine.Lustre.FileSystem import FileSystem
 from Shine.Lustre.Component import MOUNTED, OFFLINE, TARGET_ERROR
+from Shine.Lustre.Target import MDT
 
 
 class CommonTestCase(unittest.TestCase):
@@ -150,9 +159,9 @@ class TargetActionTest(CommonTestCase):
     def test_format_if_started(self):
         """Format when target is started failed"""
         def check_set_online(self):
-            self.__class__.lustre_check(self)
+            type(self).__base__.lustre_check(self)
             self.state = MOUNTED
-        self.tgt.lustre_check = types.MethodType(check_set_online, self.tgt)
+        Utils.patch_method(self.tgt, 'lustre_check', check_set_online)
 
         act = self.tgt.format()
         result = self.check_base(self.tgt, 'comp', act, ACT_ERROR,
@@ -272,6 +281,24 @@ class TargetActionTest(CommonTestCase):
         self.assertEqual(result.retcode, 0)
         self.assertEqual(self.tgt.state, OFFLINE)
 
+    def test_execute_check_error_release(self):
+        """Resources are released when the result check fails"""
+        res = Resource('foo')
+        act = self.tgt.execute(addopts='/bin/true', mountdata='never')
+        act.resources = lambda: [res]
+        calls = []
+        def failing_check(self):
+            calls.append(self)
+            if len(calls) > 1:
+                raise ComponentError(self, "check failed")
+            type(self).__base__.lustre_check(self)
+        Utils.patch_method(self.tgt, 'lustre_check', failing_check)
+
+        act.launch()
+        self.assertRaises(ComponentError, self.fs._run_actions)
+        self.assertEqual(res.users, 0)
+        del calls[:]
+
     def test_execute_dryrun(self):
         """Execute of a command in dry-run mode"""
         act = self.tgt.execute(addopts='/bin/echo %device', mountdata='never',
@@ -325,6 +352,38 @@ class TargetActionTest(CommonTestCase):
         self.assertEqual(result.retcode, None)
         self.assertEqual(self.tgt.state, TARGET_ERROR)
 
+    def test_status_cached(self):
+        """Status on a target uses its recent cached status"""
+        status_dir = Utils.make_tempdir()
+        Globals().replace('status_dir', status_dir)
+        StatusCache.reset()
+        try:
+            self.tgt.state = MOUNTED
+            StatusCache.record(self.tgt, mountdata=True)
+            self.tgt.state = None
+
+            # Not formatted, so a real check fails (see test_status_error)
+            act = self.tgt.status(max_age=60)
+            self.check_base(self.tgt, 'comp', act, ACT_OK, ['start', 'done'],
+                            'status of MGS (%s)' % self.tgt.dev)
+            self.assertEqual(self.tgt.state, MOUNTED)
+
+            # A record without mountdata is not used when they are needed
+            StatusCache.record(self.tgt, mountdata=False)
+            self.tgt.state = None
+            self.eh.clear()
+            act = self.tgt.status(max_age=60, mountdata='always')
+            self.check_base(self.tgt, 'comp', act, ACT_ERROR,
+                            ['start', 'failed'],
+                            'status of MGS (%s)' % self.tgt.dev)
+            self.assertEqual(self.tgt.state, TARGET_ERROR)
+        finally:
+            StatusCache.reset()
+            for name in os.listdir(status_dir):
+                os.unlink(os.path.join(status_dir, name))
+            Utils.clean_tempdir(status_dir)
+            del Globals()['status_dir']
+
     #
     # Start Target
     #
@@ -346,7 +405,7 @@ class TargetActionTest(CommonTestCase):
         def is_started(self):
             self.state = MOUNTED
             return True
-        self.tgt.is_started = types.MethodType(is_started, self.tgt)
+        Utils.patch_method(self.tgt, 'is_started', is_started)
         act = self.tgt.start()
         result = self.check_base(self.tgt, 'comp', act, ACT_OK,
                                  ['start', 'done'],
@@ -617,7 +676,7 @@ class ServerActionTest(CommonTestCase):
         """Load modules when already loaded is ok"""
         def lustre_check(self):
             self.modules = {'lustre': 0, 'libcfs': 1}
-        self.srv.lustre_check = types.MethodType(lustre_check, self.srv)
+        Utils.patch_method(self.srv, 'lustre_check', lustre_check)
         act = self.srv.load_modules()
         result = self.check_base(self.srv, 'server', act, ACT_OK,
                                  ['start', 'done'],
@@ -869,6 +928,130 @@ class TuneActionTest(CommonTestCase):
                          "'echo -n 1 > /proc/modules' failed\n"
                          "'echo -n 1 > /proc/cmdline' failed")
 
+    def test_tune_batched(self):
+        """All tunings are written by a single action"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            for name in ('foo', 'bar'):
+                open(os.path.join(tmpdir, name), 'w').close()
+            self.model.create_parameter(os.path.join(tmpdir, '*'), '"a b"',
+                                        node_type_list=['mgs'])
+            self.model.create_parameter(os.path.join(tmpdir, 'bad/file'), 2,
+                                        node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action')
+            act.launch()
+            self.fs._run_actions()
+            self.assertEqual(len(act), 1)
+            self.assertEqual(act.status(), ACT_OK)
+            for name in ('foo', 'bar'):
+                self.assertEqual(open(os.path.join(tmpdir, name)).read(),
+                                 'a b')
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tune_batched_error(self):
+        """Failed tunings of a batch are reported one by one"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            path = os.path.join(tmpdir, 'foo')
+            os.mkdir(path)
+            self.model.create_parameter(path, 2, node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action')
+            result = self.check_base(self.srv, 'server', act, ACT_ERROR,
+                                     ['start', 'failed'], 'apply tunings')
+            self.assertEqual(str(result), "'echo -n 2 > %s' failed" % path)
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tune_unchanged(self):
+        """Tunings already set are not written"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            path = os.path.join(tmpdir, 'foo')
+            open(path, 'w').write('2\n')
+            self.model.create_parameter(path, 2, node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action')
+            act.launch()
+            self.fs._run_actions()
+            self.assertEqual(act.status(), ACT_OK)
+            self.assertEqual(open(path).read(), '2\n')
+            self.assertFalse([msg for msg in self.eh.msglist
+                              if path in str(msg)])
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tune_check(self):
+        """Check mode reports different tunings without writing them"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            for name, value in (('foo', '1'), ('bar', '3')):
+                open(os.path.join(tmpdir, name), 'w').write(value)
+            self.model = TuningModel()
+            self.model.create_parameter(os.path.join(tmpdir, 'foo'), 1,
+                                        node_type_list=['mgs'])
+            self.model.create_parameter(os.path.join(tmpdir, 'bar'), 2,
+                                        node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action',
+                                check=True)
+            result = self.check_base(self.srv, 'server', act, ACT_ERROR,
+                                     ['start', 'failed'], 'check tunings')
+            self.assertEqual(str(result), "%s is '3' instead of '2'" %
+                                          os.path.join(tmpdir, 'bar'))
+            self.assertEqual(open(os.path.join(tmpdir, 'bar')).read(), '3')
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tune_check_bracketed(self):
+        """Check mode compares selected items and sizes of read-backs"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            self.model = TuningModel()
+            for name, current, value in (('sel', 'crc32 [adler]', 'adler'),
+                                         ('size', '33554432', '32M'),
+                                         ('bad', 'crc32 [adler]', 'crc32')):
+                path = os.path.join(tmpdir, name)
+                open(path, 'w').write(current + '\n')
+                self.model.create_parameter(path, value,
+                                            node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action',
+                                check=True)
+            result = self.check_base(self.srv, 'server', act, ACT_ERROR,
+                                     ['start', 'failed'], 'check tunings')
+            self.assertEqual(str(result),
+                             "%s is 'crc32 [adler]' instead of 'crc32'" %
+                             os.path.join(tmpdir, 'bad'))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test_tune_mask(self):
+        """Masks cannot be compared, they are written but not reported"""
+        tmpdir = Utils.make_tempdir()
+        try:
+            path = os.path.join(tmpdir, 'debug')
+            open(path, 'w').write('ioctl neterror warning error\n')
+            self.model = TuningModel()
+            self.model.create_parameter(path, '"+ha"', node_type_list=['mgs'])
+
+            act = self.srv.tune(self.model, self.fs.components, 'action',
+                                check=True)
+            self.check_base(self.srv, 'server', act, ACT_OK,
+                            ['start', 'done'], 'check tunings')
+            self.assertEqual(open(path).read(),
+                             'ioctl neterror warning error\n')
+
+            act = self.srv.tune(self.model, self.fs.components, 'action')
+            act.launch()
+            self.fs._run_actions()
+            self.assertEqual(act.status(), ACT_OK)
+            self.assertEqual(open(path).read(), '+ha')
+        finally:
+            shutil.rmtree(tmpdir)
+
 
 class InstallActionTest(CommonTestCase):
 
@@ -964,3 +1147,119 @@ class InstallActionTest(CommonTestCase):
 
         # Status checks
         self.assertEqual(act.status(), ACT_ERROR)
+
+
+class PipelineStartTest(CommonTestCase):
+    """Pipelined start with local and remote components."""
+
+    class LogAction(CommonAction):
+        """Record its name in `log' when run, after `delay' seconds."""
+
+        def __init__(self, log, name, delay=0, modules=()):
+            CommonAction.__init__(self)
+            self.log = log
+            self.name = name
+            self.delay = delay
+            self.modules = list(modules)
+
+        def needed_modules(self):
+            return self.modules
+
+        def _launch(self):
+            if self.delay:
+                task_self().timer(self.delay, handler=self)
+            else:
+                self.ev_timer(None)
+
+        def ev_timer(self, timer):
+            self.log.append(self.name)
+            self.set_status(ACT_OK)
+
+    def test_modules_before_local_start(self):
+        """pipelined local start waits for modules, not only for the MGS"""
+        log = []
+        test = self
+
+        class LocalServer(Server):
+            def load_modules(self, modname, **kwargs):
+                return test.LogAction(log, 'load %s' % modname, delay=0.2)
+
+        class LocalMDT(MDT):
+            def start(self, **kwargs):
+                return test.LogAction(log, 'start', modules=['lustre'])
+
+        class PipelineFS(FileSystem):
+            def _proxy_action(self, action, servers, comps=None, **kwargs):
+                return test.LogAction(log, 'proxy %s' % servers)
+
+        fs = PipelineFS('pipeline')
+        fs.new_target(Server('remote', ['remote@tcp']), 'mgt', 0, '/dev/mgt')
+        fs.local_server = LocalServer(Utils.HOSTNAME,
+                                      ['%s@tcp' % Utils.HOSTNAME])
+        fs._attach_component(LocalMDT(fs, fs.local_server, 0, '/dev/mdt'))
+
+        graph = fs._prepare('start', groupby='START_ORDER', pipeline=True)
+        graph.launch()
+        task_self().run()
+
+        self.assertEqual(graph.status(), ACT_OK)
+        self.assertEqual(log, ['proxy remote', 'load lustre', 'start'])
+
+
+class MountdataProbeTest(CommonTestCase):
+
+    TUNEFS = """#!/bin/sh
+echo run >> %s
+sleep 1
+echo "Target:     action-$(basename $2)"
+echo "Flags:      0x2"
+"""
+
+    def setUp(self):
+        CommonTestCase.setUp(self)
+        self.bindir = Utils.make_tempdir()
+        self.calls = os.path.join(self.bindir, 'calls')
+        script = os.path.join(self.bindir, 'tunefs.lustre')
+        fobj = open(script, 'w')
+        fobj.write(self.TUNEFS % self.calls)
+        fobj.close()
+        os.chmod(script, 0755)
+        Globals().replace('command_path', self.bindir)
+
+        srv1 = Server(Utils.HOSTNAME, ["%s@tcp" % Utils.HOSTNAME], hdlr=self.eh)
+        self.fs.local_server = srv1
+        self.tgts = []
+        for index in range(3):
+            dev = os.path.join(self.bindir, 'OST%04x' % index)
+            fobj = open(dev, 'w')
+            fobj.truncate(1024 * 1024)
+            fobj.seek(1024 + 44)
+            fobj.write(struct.pack('<IIHxxH', 0, 1, 0, 0xEF53))
+            fobj.close()
+            self.tgts.append(self.fs.new_target(srv1, 'ost', index, dev))
+
+    def tearDown(self):
+        del Globals()['command_path']
+        for tgt in self.tgts:
+            tgt.mountdata_forget()
+        shutil.rmtree(self.bindir)
+
+    def status(self):
+        acts = [tgt.status(mountdata='always') for tgt in self.tgts]
+        for act in acts:
+            act.launch()
+        self.fs._run_actions()
+        for act in acts:
+            self.assertEqual(act.status(), ACT_OK)
+
+    def test_probes(self):
+        """Mountdata of several targets are read at once and cached"""
+        before = time.time()
+        self.status()
+        self.assertTrue(time.time() - before < 3)
+        self.assertEqual(len(open(self.calls).readlines()), 3)
+        for tgt in self.tgts:
+            self.assertEqual(tgt.ldd_svname, tgt.label)
+
+        self.status()
+        self.assertEqual(len(open(self.calls).readlines()), 3)
@@ -18,20 +18,37 @@
 # Foundation, Inc., 59 Temple Place - Suite 330, Boston, MA  02111-1307, USA.
 #
 
+import sys
 import types
 import unittest
+import os
 import binascii
+import pickle
+import threading
 import Utils
 
+from ClusterShell.Task import task_self
+
+from Shine.Configuration.Globals import Globals
 from Shine.Lustre.EventHandler import EventHandler
 from Shine.Lustre.FileSystem import FileSystem
-from Shine.Lustre.Component import MOUNTED, OFFLINE, RUNTIME_ERROR
+from Shine.Lustre.Component import MOUNTED, OFFLINE, RUNTIME_ERROR, \
+                                   ComponentGroup
 from Shine.Lustre.Server import Server
 from Shine.Lustre.Actions.Action import ACT_OK, ACT_ERROR
 from Shine.Lustre.Actions.StartTarget import StartTarget
 
-from Shine.Lustre.Actions.Proxy import shine_msg_pack, SHINE_MSG_MAGIC, \
-                                       SHINE_MSG_VERSION
+from Shine.Lustre.Actions.Proxy import shine_msg_pack, shine_msg_unpack, \
+                                       shine_msg_pack_batch, \
+                                       FSProxyAction, \
+                                       SHINE_MSG_MAGIC, SHINE_MSG_VERSION
+from Shine.Agent import AgentServer
+from Shine.Commands.Base.RemoteCallEventHandler import RemoteCallEventHandler
+
+def shine_msg_pack_v3(**kwargs):
+    """Build a message as sent by shine 1.5 and older."""
+    return "%s3:%s" % (SHINE_MSG_MAGIC,
+                       binascii.b2a_base64(pickle.dumps(kwargs, -1)))
 
 class ProxyTest(unittest.TestCase):
 
@@ -117,9 +134,29 @@ class ProxyTest(unittest.TestCase):
     def test_bad_object(self):
         """send a done message which fails update due to bad property"""
         msg = shine_msg_pack(evtype='comp', info=self.info, status='done')
+        def buggy_update(self, record, server):
+            self.wrong_property = self.other_property
+        Utils.patch_method(self.tgt, 'update_record', buggy_update)
+
+        self.act.fakecmd = 'echo "%s"' % msg
+        self.act.launch()
+        self.fs._run_actions()
+        self.fs._check_errors([OFFLINE], self.fs.components)
+
+        self.assertEqual(len(self.fs.proxy_errors), 1)
+        self.assertEqual(str(list(self.fs.proxy_errors.messages())[0]),
+                         "Cannot read message (check Shine and ClusterShell "
+                         "version): 'MGT' object has no attribute "
+                         "'other_property'")
+        self.assertEqual(self.tgt.state, RUNTIME_ERROR)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_bad_object_v3(self):
+        """send a v3 done message which fails update due to bad property"""
+        msg = shine_msg_pack_v3(evtype='comp', info=self.info, status='done')
         def buggy_update(self, other):
             self.wrong_property = other.wrong_property
-        self.tgt.update = types.MethodType(buggy_update, self.tgt)
+        Utils.patch_method(self.tgt, 'update', buggy_update)
 
         self.act.fakecmd = 'echo "%s"' % msg
         self.act.launch()
@@ -151,6 +188,146 @@ class ProxyTest(unittest.TestCase):
         self.assertEqual(self.tgt.state, RUNTIME_ERROR)
         self.assertEqual(self.act.status(), ACT_OK)
 
+    def test_start_ok_v3(self):
+        """send a v3 start and done message"""
+        msgs = []
+        msgs.append(shine_msg_pack_v3(evtype='comp', info=self.info,
+                                      status='start'))
+        self.tgt.state = MOUNTED
+        msgs.append(shine_msg_pack_v3(evtype='comp', info=self.info,
+                                      status='done'))
+
+        self.act.fakecmd = 'echo "%s"' % '\n'.join(msgs)
+        self.act.launch()
+        self.fs._run_actions()
+        self.fs._check_errors([MOUNTED], self.fs.components)
+
+        self.assertEqual(len(self.fs.proxy_errors), 0)
+        self.assertEqual(self.tgt.state, MOUNTED)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_compact_record(self):
+        """v4 message only carries a state record"""
+        self.tgt.state = MOUNTED
+        self.tgt.dev_size = 4096
+        msg = shine_msg_pack(evtype='comp', info=self.info, status='done')
+        data = shine_msg_unpack(msg)
+
+        self.assertEqual(data['info'].actname, 'start')
+        self.assertEqual(str(data['info']), str(self.info))
+        record = data['info'].elem
+        self.assertEqual(type(record), dict)
+        self.assertEqual(record['id'], 'MGS')
+        self.assertEqual(record['states'], {Utils.HOSTNAME: MOUNTED})
+        self.assertEqual(record['dev_size'], 4096)
+
+    def test_client_record(self):
+        """v4 record updates a local client"""
+        client = self.fs.new_client(self.srv1, '/foo')
+        remote = FileSystem('proxy').new_client(self.srv1, '/foo')
+        remote.state = MOUNTED
+        remote.mtpt = 'localhost@tcp:/proxy'
+        info = remote.status().info()
+        data = shine_msg_unpack(shine_msg_pack(evtype='comp', info=info,
+                                               status='done'))
+        evtype = data.pop('evtype')
+        self.fs.distant_event(evtype, node=Utils.HOSTNAME, **data)
+
+        self.assertEqual(client.state, MOUNTED)
+        self.assertEqual(client.mtpt, 'localhost@tcp:/proxy')
+        self.assertTrue(data['info'].elem is client)
+
+    def test_client_set_record(self):
+        """v4 client record updates the local client set of its node"""
+        clients = self.fs.new_client_set(Server('%s,foo9' % Utils.HOSTNAME,
+                                                []), '/foo')
+        remote = FileSystem('proxy').new_client(self.srv1, '/foo')
+        remote.state = MOUNTED
+        info = remote.status().info()
+        data = shine_msg_unpack(shine_msg_pack(evtype='comp', info=info,
+                                               status='done'))
+        evtype = data.pop('evtype')
+        self.fs.distant_event(evtype, node=Utils.HOSTNAME, **data)
+
+        self.assertEqual(clients.get_node_state(Utils.HOSTNAME), MOUNTED)
+        self.assertEqual(clients.get_node_state('foo9'), None)
+        self.assertTrue(data['info'].elem is clients)
+
+    def test_batch_ok(self):
+        """send start and done events in one batch message"""
+        self.tgt.state = MOUNTED
+        msg = shine_msg_pack_batch([
+                  {'evtype': 'comp', 'info': self.info, 'status': 'start'},
+                  {'evtype': 'log', 'level': 'detail', 'msg': 'foo'},
+                  {'evtype': 'comp', 'info': self.info, 'status': 'done'}])
+        self.assertEqual(msg.count('\n'), 1)
+        self.tgt.state = None
+
+        self.act.fakecmd = 'echo "%s"' % msg
+        self.act.launch()
+        self.fs._run_actions()
+        self.fs._check_errors([MOUNTED], self.fs.components)
+
+        self.assertEqual(len(self.fs.proxy_errors), 0)
+        self.assertEqual(self.tgt.state, MOUNTED)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_batch_handler(self):
+        """remote handler coalesces progress events in batches"""
+        msgs = []
+        hdlr = RemoteCallEventHandler(batch_size=4)
+        hdlr._write = msgs.append
+        hdlr.event_callback('comp', node='foo', info=self.info,
+                            status='start')
+        for progress in (10, 50, 90):
+            hdlr.event_callback('comp', info=self.info, status='progress',
+                                result=progress)
+        hdlr.event_callback('comp', info=self.info, status='done')
+        self.assertEqual(msgs, [])
+        hdlr.flush()
+
+        self.assertEqual(len(msgs), 1)
+        events = shine_msg_unpack(msgs[0])['events']
+        self.assertEqual([evt['status'] for evt in events],
+                         ['start', 'progress', 'done'])
+        self.assertEqual(events[1]['result'], 90)
+
+        # Full batch is sent immediately
+        for _ in range(4):
+            hdlr.event_callback('log', level='detail', msg='foo')
+        self.assertEqual(len(msgs), 2)
+
+    def test_batch_snapshot(self):
+        """batched events carry the state of when they were raised"""
+        msgs = []
+        hdlr = RemoteCallEventHandler(batch_size=4)
+        hdlr._write = msgs.append
+        self.tgt.state = MOUNTED
+        hdlr.event_callback('comp', info=self.info, status='done')
+        self.tgt.state = OFFLINE
+        hdlr.flush()
+
+        events = shine_msg_unpack(msgs[0])['events']
+        self.assertEqual(events[0]['info'].elem['states'].values(),
+                         [MOUNTED])
+
+    def test_batch_end_of_run(self):
+        """pending batch is sent before the task run ends"""
+        msgs = []
+        hdlr = RemoteCallEventHandler(batch_size=4, batch_delay=0.01)
+        hdlr._write = msgs.append
+        hdlr.event_callback('log', level='detail', msg='foo')
+        self.assertEqual(msgs, [])
+        task_self().resume()
+        self.assertEqual(len(msgs), 1)
+
+        # post() hook also sends pending events
+        hdlr.event_callback('log', level='detail', msg='bar')
+        hdlr.post(self.fs)
+        self.assertEqual(len(msgs), 2)
+        task_self().resume()
+        self.assertEqual(len(msgs), 2)
+
     def test_compat_compname(self):
         """message with compname value is backward compatible"""
         msgs = []
@@ -210,3 +387,184 @@ class ProxyTest(unittest.TestCase):
         self.fs._check_errors([OFFLINE], self.fs.components)
         self.assertEqual(len(self.fs.proxy_errors), 0)
         self.assertEqual(self.act.status(), ACT_OK)
+
+
+class MultiProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs1 = FileSystem('proxya')
+        self.fs2 = FileSystem('proxyb')
+        self.srv1 = Server(Utils.HOSTNAME, ["%s@tcp" % Utils.HOSTNAME])
+        self.tgt1 = self.fs1.new_target(self.srv1, 'ost', 0,
+                                        Utils.makeTempFilename())
+        self.tgt2 = self.fs2.new_target(self.srv1, 'ost', 0,
+                                        Utils.makeTempFilename())
+
+        proxies = {}
+        self.fs1._proxies = proxies
+        self.fs2._proxies = proxies
+        self.act = self.fs1._proxy_action('status', self.srv1.hostname,
+                                          self.fs1.components)
+        act2 = self.fs2._proxy_action('status', self.srv1.hostname,
+                                      self.fs2.components)
+        self.assertTrue(act2 is self.act)
+
+    def test_prepare_cmd(self):
+        """one remote command for both filesystems"""
+        self.act.progpath = '/usr/sbin/shine'
+        self.assertEqual(self.act._prepare_cmd(),
+                         ['/usr/sbin/shine', 'status', '-f proxya,proxyb',
+                          '-R', '-l proxya-OST0000,proxyb-OST0000'])
+
+    def test_status_ok(self):
+        """events are given to the right filesystem"""
+        self.tgt1.state = MOUNTED
+        self.tgt2.state = OFFLINE
+        msgs = [shine_msg_pack(evtype='comp', status='done',
+                               info=StartTarget(tgt).info())
+                for tgt in (self.tgt1, self.tgt2)]
+        self.tgt1.state = self.tgt2.state = None
+
+        def fakeprepare(action):
+            return ['echo "%s"' % '\n'.join(msgs)]
+        self.act._prepare_cmd = types.MethodType(fakeprepare, self.act)
+        self.act.launch()
+        self.fs1._run_actions()
+
+        self.assertEqual(self.tgt1.state, MOUNTED)
+        self.assertEqual(self.tgt2.state, OFFLINE)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_status_v3(self):
+        """v3 events are given to the filesystem owning the component"""
+        self.tgt1.state = MOUNTED
+        self.tgt2.state = OFFLINE
+        msgs = [shine_msg_pack_v3(evtype='comp', status='done',
+                                  info=StartTarget(tgt).info())
+                for tgt in (self.tgt1, self.tgt2)]
+        self.tgt1.state = self.tgt2.state = None
+
+        def fakeprepare(action):
+            return ['echo "%s"' % '\n'.join(msgs)]
+        self.act._prepare_cmd = types.MethodType(fakeprepare, self.act)
+        self.act.launch()
+        self.fs1._run_actions()
+
+        self.assertEqual(self.tgt1.state, MOUNTED)
+        self.assertEqual(self.tgt2.state, OFFLINE)
+        self.assertEqual(len(self.fs1.proxy_errors), 0)
+        self.assertEqual(len(self.fs2.proxy_errors), 0)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_unselected_comp(self):
+        """events for components not selected in their filesystem are ignored"""
+        fs1 = FileSystem('proxyc')
+        fs2 = FileSystem('proxyd')
+        mgt1 = fs1.new_target(self.srv1, 'mgt', 0, Utils.makeTempFilename())
+        ost1 = fs1.new_target(self.srv1, 'ost', 0, Utils.makeTempFilename())
+        mgt2 = fs2.new_target(self.srv1, 'mgt', 0, Utils.makeTempFilename())
+
+        proxies = {}
+        fs1._proxies = proxies
+        fs2._proxies = proxies
+        # 'MGS' label is selected for proxyd only
+        act = fs1._proxy_action('status', self.srv1.hostname,
+                                ComponentGroup([ost1]))
+        fs2._proxy_action('status', self.srv1.hostname,
+                          ComponentGroup([mgt2]))
+
+        mgt1.state = mgt2.state = MOUNTED
+        ost1.state = OFFLINE
+        msgs = [shine_msg_pack(evtype='comp', status='done',
+                               info=StartTarget(tgt).info())
+                for tgt in (mgt1, ost1, mgt2)]
+        mgt1.state = mgt2.state = ost1.state = None
+
+        def fakeprepare(action):
+            return ['echo "%s"' % '\n'.join(msgs)]
+        act._prepare_cmd = types.MethodType(fakeprepare, act)
+        act.launch()
+        fs1._run_actions()
+
+        self.assertEqual(mgt1.state, None)
+        self.assertEqual(ost1.state, OFFLINE)
+        self.assertEqual(mgt2.state, MOUNTED)
+        self.assertEqual(act.status(), ACT_OK)
+
+    def test_exec_fail(self):
+        """errors are reported to all filesystems"""
+        def fakeprepare(action):
+            return ['/bin/false']
+        self.act._prepare_cmd = types.MethodType(fakeprepare, self.act)
+        self.act.launch()
+        self.fs1._run_actions()
+
+        for fs in (self.fs1, self.fs2):
+            self.assertEqual(list(fs.proxy_errors.messages())[0],
+                             "Remote action status failed: No response")
+        self.assertEqual(self.act.status(), ACT_ERROR)
+
+
+class AgentProxyTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('proxy')
+        self.srv1 = Server(Utils.HOSTNAME, ["%s@tcp" % Utils.HOSTNAME])
+        disk = Utils.makeTempFilename()
+        self.tgt = self.fs.new_target(self.srv1, 'mgt', 0, disk)
+        self.tmpdir = Utils.make_tempdir()
+        sockpath = os.path.join(self.tmpdir, 'agent.sock')
+        self.act = FSProxyAction(self.fs, 'start', self.srv1.hostname, False,
+                                 self.fs.components, sockpath=sockpath)
+        self.agent = None
+        # The "remote" node is this one.
+        Globals().replace('agent_python', sys.executable)
+
+    def tearDown(self):
+        del Globals()['agent_python']
+        if self.agent:
+            self.agent.close()
+        Utils.clean_tempdir(self.tmpdir)
+
+    def test_agent_start_ok(self):
+        """proxy action is run by the remote agent"""
+        info = StartTarget(self.tgt).info()
+        self.tgt.state = MOUNTED
+        msg = shine_msg_pack(evtype='comp', info=info, status='done')
+        self.tgt.state = None
+
+        requests = []
+        class FakeAgent(AgentServer):
+            def run_request(agent, args):
+                requests.append(args)
+                print msg,
+                return 0
+
+        self.act.progpath = '/usr/sbin/shine'
+        self.agent = FakeAgent(self.act.sockpath)
+        self.agent.bind()
+        thread = threading.Thread(target=self.agent.serve, args=(1,))
+        thread.setDaemon(True)
+        thread.start()
+
+        self.act.launch()
+        self.fs._run_actions()
+        thread.join(10)
+        self.assertFalse(thread.isAlive())
+        self.fs._check_errors([MOUNTED], self.fs.components)
+
+        self.assertEqual(requests, [['start', '-f', 'proxy', '-R', '-l',
+                                     'MGS']])
+        self.assertEqual(len(self.fs.proxy_errors), 0)
+        self.assertEqual(self.tgt.state, MOUNTED)
+        self.assertEqual(self.act.status(), ACT_OK)
+
+    def test_no_agent(self):
+        """proxy action runs shine if there is no remote agent"""
+        self.act.progpath = '/bin/false'
+        self.act.launch()
+        self.fs._run_actions()
+
+        self.assertEqual(list(self.fs.proxy_errors.messages())[0],
+                         "Remote action start failed: No response")
+        self.assertEqual(self.act.status(), ACT_ERROR)
@@ -5,11 +5,14 @@
 
 """Unit test for Client"""
 
+import pickle
 import unittest
 
 from Shine.Lustre.FileSystem import FileSystem
 from Shine.Lustre.Server import Server
-from Shine.Lustre.Client import Client
+from Shine.Lustre.Client import Client, ClientSet
+from Shine.Lustre.Component import MOUNTED, OFFLINE, CLIENT_ERROR, \
+                                   RUNTIME_ERROR
 
 class ClientTest(unittest.TestCase):
 
@@ -20,6 +23,27 @@ class ClientTest(unittest.TestCase):
         client = fs.new_client(srv, '/foo')
         self.assertEqual(str(client.allservers().nodeset()), 'foo1')
 
+    def test_proc_states(self):
+        """test proc_states are not shared between clients"""
+        fs = FileSystem('foo')
+        client1 = fs.new_client(Server('foo1', ['foo1@tcp']), '/foo')
+        client2 = fs.new_client(Server('foo2', ['foo2@tcp']), '/foo')
+        client1.proc_states['evicted'] = 1
+        self.assertEqual(client2.proc_states, {})
+        self.assertEqual(client2.mtpt, None)
+
+    def test_pickle(self):
+        """test a pickled client keeps its slots"""
+        fs = FileSystem('foo')
+        client = fs.new_client(Server('foo1', ['foo1@tcp']), '/foo', 'ro')
+        client.proc_states['evicted'] = 1
+        other = pickle.loads(pickle.dumps(client, -1))
+        self.assertFalse(hasattr(other, '__dict__'))
+        self.assertEqual(other.fs, None)
+        self.assertEqual(other.mount_options, 'ro')
+        self.assertEqual(other.proc_states, {'evicted': 1})
+        self.assertEqual(str(other.server.hostname), 'foo1')
+
     def test_unique_id(self):
         """test client.uniqueid()"""
         fs1 = FileSystem('uniqueid')
@@ -43,3 +67,86 @@ class ClientTest(unittest.TestCase):
         client2 = fs2.new_client(srv2, '/foo2')
 
         self.assertNotEqual(client1.uniqueid(), client2.uniqueid())
+
+
+class ClientSetTest(unittest.TestCase):
+
+    def setUp(self):
+        self.fs = FileSystem('foo')
+        self.clients = self.fs.new_client_set(Server('foo[1-4]', []), '/foo')
+
+    def test_uniqueid(self):
+        """test clientset.uniqueid()"""
+        self.assertEqual(self.clients.uniqueid(), 'foo-client-[foo[1-4]]-/foo')
+        client = self.fs.new_client(Server('foo1', ['foo1@tcp']), '/foo')
+        self.assertNotEqual(client.uniqueid(), self.clients.uniqueid())
+
+    def test_state(self):
+        """state is the worst known node state"""
+        self.assertEqual(self.clients.state, None)
+        self.clients.set_node_state('foo2', MOUNTED)
+        self.assertEqual(self.clients.state, MOUNTED)
+        self.assertEqual(self.clients.get_node_state('foo1'), None)
+        self.clients.set_node_state('foo3', OFFLINE)
+        self.assertEqual(self.clients.state, OFFLINE)
+        self.clients.state = MOUNTED
+        self.assertEqual(self.clients.get_node_state('foo1'), MOUNTED)
+        self.assertEqual(self.clients.state, MOUNTED)
+
+    def test_update_record(self):
+        """a client record updates the state of its node only"""
+        remote = FileSystem('foo').new_client(Server('foo3', ['foo3@tcp']),
+                                              '/foo')
+        remote.state = MOUNTED
+        self.clients.update_record(remote.state_record(),
+                                   self.clients.node_server('foo3'))
+        self.assertEqual(self.clients.get_node_state('foo3'), MOUNTED)
+        self.assertEqual(self.clients.get_node_state('foo2'), None)
+
+    def test_evicted_node(self):
+        """import states of client nodes are summed and displayed"""
+        for node, proc_states in (('foo1', {'FULL': 4}),
+                                  ('foo2', {'FULL': 3, 'EVICTED': 1}),
+                                  ('foo3', {'FULL': 2, 'EVICTED': 2})):
+            remote = FileSystem('foo').new_client(Server(node, []), '/foo')
+            remote.mtpt = '/foo'
+            remote.proc_states = proc_states
+            if 'EVICTED' in proc_states:
+                remote.state = CLIENT_ERROR
+            else:
+                remote.state = MOUNTED
+            self.clients.update_record(remote.state_record(),
+                                       self.clients.node_server(node))
+        self.assertEqual(self.clients.mtpt, '/foo')
+        self.assertEqual(self.clients.proc_states, {'FULL': 9, 'EVICTED': 3})
+        self.assertEqual(self.clients.text_status(), 'ERROR (evicted=3)')
+
+        subsets = dict([(str(clients.nodes), clients.text_status())
+                        for clients in self.clients.split()])
+        self.assertEqual(subsets, {'foo1': 'mounted',
+                                   'foo[2-3]': 'ERROR (evicted=3)',
+                                   'foo4': 'unknown'})
+
+        # Counts are replaced on the next update of a node
+        remote.proc_states = {'FULL': 4}
+        remote.state = MOUNTED
+        self.clients.update_record(remote.state_record(),
+                                   self.clients.node_server('foo3'))
+        self.assertEqual(self.clients.proc_states, {'FULL': 11, 'EVICTED': 1})
+
+    def test_sanitize_state(self):
+        """only unknown states of given nodes are sanitized"""
+        self.clients.set_node_state('foo1', MOUNTED)
+        self.clients.sanitize_state(nodes='foo[1-2]')
+        self.assertEqual(self.clients.get_node_state('foo1'), MOUNTED)
+        self.assertEqual(self.clients.get_node_state('foo2'), RUNTIME_ERROR)
+        self.assertEqual(self.clients.get_node_state('foo3'), None)
+
+    def test_split(self):
+        """split a client set per node state"""
+        self.assertEqual(self.clients.split(), [self.clients])
+        self.clients.state = MOUNTED
+        self.clients.set_node_state('foo2', OFFLINE)
+        subsets = dict([(str(clients.nodes), clients.state)
+                        for clients in self.clients.split()])
+        self.assertEqual(subsets, {'foo[1,3-4]': MOUNTED, 'foo2': OFFLINE})
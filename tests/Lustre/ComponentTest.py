@@ -12,6 +12,11 @@ from Shine.Lustre.Server import Server
 from Shine.Lustre.Component import ComponentGroup, Component, MOUNTED, OFFLINE
 from Shine.Lustre.Target import Target
 
+def typed_component(comptype, *args, **kwargs):
+    """Return a new Component whose TYPE is `comptype'."""
+    cls = type('Component', (Component,), {'__slots__': (), 'TYPE': comptype})
+    return cls(*args, **kwargs)
+
 class ComponentGroupTest(unittest.TestCase):
 
     def testGenericComponent(self):
@@ -19,8 +24,7 @@ class ComponentGroupTest(unittest.TestCase):
         fs = FileSystem('comp')
         grp = ComponentGroup()
         self.assertEqual(len(grp), 0)
-        comp = Component(fs, Server('foo', ['foo@tcp']))
-        comp.TYPE = 'A'
+        comp = typed_component('A', fs, Server('foo', ['foo@tcp']))
 
         # add()
         grp.add(comp)
@@ -63,11 +67,9 @@ class ComponentGroupTest(unittest.TestCase):
         """test ComponentGroup.labels()"""
         fs = FileSystem('comp')
         grp = ComponentGroup()
-        comp = Component(fs, Server('foo1', ['foo1@tcp']))
-        comp.TYPE = 'A'
+        comp = typed_component('A', fs, Server('foo1', ['foo1@tcp']))
         grp.add(comp)
-        comp = Component(fs, Server('foo2', ['foo2@tcp']))
-        comp.TYPE = 'B'
+        comp = typed_component('B', fs, Server('foo2', ['foo2@tcp']))
         grp.add(comp)
         self.assertEqual(str(grp.labels()), 'comp-A,comp-B')
 
@@ -202,17 +204,13 @@ class ComponentGroupTest(unittest.TestCase):
         grp = ComponentGroup()
         srv1 = Server('foo1', ['foo1@tcp'])
         srv2 = Server('foo2', ['foo2@tcp'])
-        comp1 = Component(fs, srv1)
-        comp1.TYPE = 'A'
+        comp1 = typed_component('A', fs, srv1)
         grp.add(comp1)
-        comp2 = Component(fs, srv2)
-        comp2.TYPE = 'B'
+        comp2 = typed_component('B', fs, srv2)
         grp.add(comp2)
-        comp3 = Component(fs, srv1)
-        comp3.TYPE = 'C'
+        comp3 = typed_component('C', fs, srv1)
         grp.add(comp3)
-        comp4 = Component(fs, srv2)
-        comp4.TYPE = 'D'
+        comp4 = typed_component('D', fs, srv2)
         grp.add(comp4)
         key = lambda c: c.TYPE
         results = [[srv, sorted(comps, key=key)] for srv, comps in grp.groupbyserver()]
@@ -249,18 +247,100 @@ class ComponentGroupTest(unittest.TestCase):
         fs = FileSystem('active')
         grp = ComponentGroup()
         srv = Server('foo1', ['foo1@tcp'])
-        comp1 = Component(fs, srv)
-        comp1.TYPE = 'A'
+        comp1 = typed_component('A', fs, srv)
         grp.add(comp1)
-        comp2 = Component(fs, srv, active='no')
-        comp2.TYPE = 'B'
+        comp2 = typed_component('B', fs, srv, active='no')
         grp.add(comp2)
-        comp3 = Component(fs, srv, active='nocreate')
-        comp3.TYPE = 'C'
+        comp3 = typed_component('C', fs, srv, active='nocreate')
         grp.add(comp3)
-        comp4 = Component(fs, srv, active='no', mode='external')
-        comp4.TYPE = 'D'
+        comp4 = typed_component('D', fs, srv, active='no', mode='external')
         grp.add(comp4)
         self.assertEqual(str(grp.managed()), 'active-A,active-C')
         self.assertEqual(str(grp.managed(inactive=True)),
                          'active-A,active-B,active-C,active-D')
+
+    def test_bytype(self):
+        """test ComponentGroup.bytype()"""
+        fs = FileSystem('comp')
+        grp = ComponentGroup()
+        srv = Server('foo1', ['foo1@tcp'])
+        grp.add(fs.new_target(srv, 'mdt', 0, '/dev/sda'))
+        grp.add(fs.new_target(srv, 'ost', 0, '/dev/sdb'))
+        grp.add(fs.new_target(srv, 'ost', 1, '/dev/sdc'))
+        self.assertEqual(str(grp.bytype('ost')), 'comp-OST[0000-0001]')
+        self.assertEqual(len(grp.bytype('mgt')), 0)
+        results = [(comptype, str(comps)) for comptype, comps
+                   in grp.groupby(attr='TYPE')]
+        self.assertEqual(results, [('mdt', 'comp-MDT0000'),
+                                   ('ost', 'comp-OST[0000-0001]')])
+
+    def test_cached_nodesets(self):
+        """test ComponentGroup labels() and servers() follow changes"""
+        fs = FileSystem('comp')
+        grp = ComponentGroup()
+        comp = typed_component('A', fs, Server('foo1', ['foo1@tcp']))
+        grp.add(comp)
+        self.assertEqual(str(grp.labels()), 'comp-A')
+        self.assertEqual(str(grp.servers()), 'foo1')
+        # Returned NodeSets are not the cached ones
+        grp.labels().update('comp-Z')
+        self.assertEqual(str(grp.labels()), 'comp-A')
+
+        other = typed_component('B', fs, Server('foo2', ['foo2@tcp']))
+        grp.add(other)
+        self.assertEqual(str(grp.labels()), 'comp-A,comp-B')
+        self.assertEqual(str(grp.servers()), 'foo[1-2]')
+
+        # Server changes, like failover, are seen without group changes
+        comp.server = Server('foo3', ['foo3@tcp'])
+        self.assertEqual(str(grp.servers()), 'foo[2-3]')
+        self.assertEqual(len(grp.filter(supports='failservers')), 0)
+
+    def test_byserver_bystate(self):
+        """test ComponentGroup byserver() and bystate() follow changes"""
+        fs = FileSystem('comp')
+        grp = ComponentGroup()
+        srv1 = Server('foo1', ['foo1@tcp'])
+        srv2 = Server('foo2', ['foo2@tcp'])
+        tgt1 = fs.new_target(srv1, 'ost', 0, '/dev/sda')
+        tgt1.add_server(srv2)
+        tgt2 = fs.new_target(srv2, 'ost', 1, '/dev/sdb')
+        grp.update([tgt1, tgt2])
+        tgt1.state = MOUNTED
+        tgt2.state = OFFLINE
+
+        self.assertEqual(str(grp.byserver('foo1')), 'comp-OST0000')
+        self.assertEqual(str(grp.byserver('foo2')), 'comp-OST0001')
+        self.assertEqual(str(grp.bystate(MOUNTED)), 'comp-OST0000')
+        self.assertEqual(len(grp.bystate(None)), 0)
+        results = [(state, str(comps)) for state, comps
+                   in grp.groupby(attr='state')]
+        self.assertEqual(results, [(MOUNTED, 'comp-OST0000'),
+                                   (OFFLINE, 'comp-OST0001')])
+
+        # Once indexed, state changes and failover are notified
+        tgt2.state = MOUNTED
+        self.assertEqual(str(grp.bystate(MOUNTED)), 'comp-OST[0000-0001]')
+        self.assertEqual(len(grp.bystate(OFFLINE)), 0)
+        self.assertTrue(tgt1.failover(srv2.hostname))
+        self.assertEqual(len(grp.byserver('foo1')), 0)
+        self.assertEqual(str(grp.byserver('foo2')), 'comp-OST[0000-0001]')
+        self.assertEqual(str(grp.servers()), 'foo2')
+
+        # Components added later are indexed too
+        comp = typed_component('A', fs, srv1)
+        grp.add(comp)
+        self.assertEqual(str(grp.byserver('foo1')), 'comp-A')
+        comp.state = OFFLINE
+        self.assertEqual(str(grp.bystate(OFFLINE)), 'comp-A')
+
+    def test_index_weak_watch(self):
+        """test components do not keep their indexed groups alive"""
+        fs = FileSystem('comp')
+        comp = typed_component('A', fs, Server('foo1', ['foo1@tcp']))
+        for _ in range(3):
+            ComponentGroup([comp]).servers()
+        ComponentGroup([comp]).servers()
+        self.assertEqual(len(comp._groups), 1)
+        comp.state = MOUNTED
+        self.assertEqual(comp.state, MOUNTED)
@@ -5,11 +5,23 @@
 
 """Unit test for Shine.Lustre.Disk"""
 
+import os
+import shutil
+import struct
 import unittest
 from subprocess import Popen, PIPE, STDOUT
 
 import Utils
-from Shine.Lustre.Disk import Disk, DiskDeviceError
+from Shine.Configuration.Globals import Globals
+import Shine.Lustre.Disk
+from Shine.Lustre.Disk import Disk as DiskMixin, DiskDeviceError, \
+                              device_controller
+
+class Disk(DiskMixin):
+    """Standalone Disk, Disk itself has no attribute storage."""
+
+    __slots__ = DiskMixin.FIELDS
+
 
 class DiskLoopbackTest(unittest.TestCase):
 
@@ -164,3 +176,141 @@ class DiskOtherTest(unittest.TestCase):
         disk = Disk(dev="foo")
         exp = DiskDeviceError(disk=disk, message="Something")
         self.assertEqual(str(exp), "Something")
+
+
+class DeviceControllerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sysfs = Utils.make_tempdir()
+        self.orig = Shine.Lustre.Disk.SYSFS_BLOCK
+        Shine.Lustre.Disk.SYSFS_BLOCK = os.path.join(self.sysfs, 'class')
+        os.mkdir(Shine.Lustre.Disk.SYSFS_BLOCK)
+
+    def tearDown(self):
+        Shine.Lustre.Disk.SYSFS_BLOCK = self.orig
+        shutil.rmtree(self.sysfs)
+
+    def _device(self, name, path):
+        """Add block device `name' at devices/`path' in fake sysfs."""
+        path = os.path.join(self.sysfs, 'devices', path)
+        os.makedirs(path)
+        os.symlink(path, os.path.join(self.sysfs, 'class', name))
+
+    def test_scsi(self):
+        """test SCSI devices are grouped by host adapter"""
+        self._device('sda', 'pci0/0000:00:1f.2/host0/target0:0:0/0:0:0:0/'
+                            'block/sda')
+        self._device('sdb', 'pci0/0000:00:1f.2/host0/target0:0:1/0:0:1:0/'
+                            'block/sdb')
+        self._device('sdc', 'pci0/0000:03:00.0/host1/target1:0:0/1:0:0:0/'
+                            'block/sdc')
+        ctrl = device_controller('/dev/sda')
+        self.assertEqual(ctrl, os.path.join(self.sysfs,
+                                            'devices/pci0/0000:00:1f.2'))
+        self.assertEqual(device_controller('/dev/sdb'), ctrl)
+        self.assertNotEqual(device_controller('/dev/sdc'), ctrl)
+
+    def test_other(self):
+        """test other devices are grouped by their parent device"""
+        self._device('nvme0n1', 'pci0/0000:04:00.0/nvme/nvme0/block/nvme0n1')
+        self.assertEqual(device_controller('/dev/nvme0n1'),
+                         os.path.join(self.sysfs,
+                                      'devices/pci0/0000:04:00.0/nvme/nvme0'))
+
+    def test_unknown(self):
+        """test virtual and unknown devices have no controller"""
+        self._device('dm-0', 'virtual/block/dm-0')
+        self.assertEqual(device_controller('/dev/dm-0'), None)
+        self.assertEqual(device_controller('/tmp/loopfile'), None)
+
+
+class DiskMountdataCacheTest(unittest.TestCase):
+
+    TUNEFS = """#!/bin/sh
+echo run >> %s
+echo "Read previous values:"
+echo "Target:     foo-OST0000"
+echo "Flags:      0x62"
+echo
+echo "Permanent disk data:"
+echo "Target:     foo=OST0000"
+echo "Flags:      0x2"
+"""
+
+    def setUp(self):
+        self.bindir = Utils.make_tempdir()
+        self.calls = os.path.join(self.bindir, 'calls')
+        script = os.path.join(self.bindir, 'tunefs.lustre')
+        fobj = open(script, 'w')
+        fobj.write(self.TUNEFS % self.calls)
+        fobj.close()
+        os.chmod(script, 0755)
+        Globals().replace('command_path', self.bindir)
+
+        self.diskfile = Utils.make_disk(1)
+        self._superblock(1)
+        self.disk = Disk(dev=self.diskfile.name)
+
+    def tearDown(self):
+        del Globals()['command_path']
+        self.disk.mountdata_forget()
+        shutil.rmtree(self.bindir)
+
+    def _superblock(self, wtime):
+        """Write a minimal ext2 superblock with write time `wtime'."""
+        self.diskfile.seek(1024 + 44)
+        self.diskfile.write(struct.pack('<IIHxxH', 0, wtime, 0, 0xEF53))
+        self.diskfile.flush()
+
+    def _calls(self):
+        if not os.path.exists(self.calls):
+            return 0
+        return len(open(self.calls).readlines())
+
+    def test_mountdata_cached(self):
+        """test mountdata are read once while device does not change"""
+        self.disk._mountdata_check(label_check='foo-OST0000')
+        self.assertEqual(self._calls(), 1)
+        self.assertEqual(self.disk.flags(), ['first_time', 'update'])
+
+        other = Disk(dev=self.diskfile.name)
+        self.assertEqual(other.mountdata_probe(), None)
+        other._mountdata_check(label_check='foo-OST0000')
+        self.assertEqual(self._calls(), 1)
+        self.assertEqual(other.ldd_svname, 'foo-OST0000')
+        self.assertEqual(other.flags(), ['first_time', 'update'])
+
+    def test_mountdata_changed(self):
+        """test mountdata are read again when device changes"""
+        self.disk._mountdata_check()
+        self._superblock(2)
+        self.assertNotEqual(self.disk.mountdata_probe(), None)
+        self.disk._mountdata_check()
+        self.assertEqual(self._calls(), 2)
+
+        self.disk.mountdata_forget()
+        self.disk._mountdata_check()
+        self.assertEqual(self._calls(), 3)
+
+    def test_not_ldiskfs(self):
+        """test mountdata are not cached without ldiskfs superblock"""
+        self.diskfile.truncate(0)
+        self.disk._mountdata_check()
+        self.disk._mountdata_check()
+        self.assertEqual(self._calls(), 2)
+
+    def test_probe(self):
+        """test mountdata probe result is used by next check"""
+        cmd = self.disk.mountdata_probe()
+        self.assertTrue(cmd.endswith("tunefs.lustre --dryrun %s" %
+                                     self.diskfile.name))
+        self.disk.mountdata_probed(0, "Target: foo-MDT0000\nFlags: 0x1\n")
+        self.disk._mountdata_check(label_check='foo-MDT0000')
+        self.assertEqual(self._calls(), 0)
+        self.assertEqual(self.disk.mountdata_probe(), None)
+
+    def test_probe_error(self):
+        """test mountdata probe error is reported by next check"""
+        self.disk.mountdata_probe()
+        self.disk.mountdata_probed(1, "")
+        self.assertRaises(DiskDeviceError, self.disk._mountdata_check)
@@ -22,9 +22,15 @@
 import unittest
 import Utils
 
+from ClusterShell.NodeSet import NodeSet
+
 from Shine.Lustre.Server import ServerGroup
 from Shine.Lustre.FileSystem import FileSystem, Server, FSRemoteError, \
-                                    MOUNTED, OFFLINE, MIGRATED
+                                    MOUNTED, OFFLINE, MIGRATED, RUNTIME_ERROR, \
+                                    multi_run
+from Shine.Lustre.Actions.Action import ActionGroup, get_resource
+from Shine.Lustre.Disk import LDD_F_WRITECONF
+from Shine.Lustre.Target import MDT, OST
 
 
 def _graph2obj(graph):
@@ -71,6 +77,16 @@ class PrepareTest(unittest.TestCase):
                          [[[{'NAME': 'proxy', 'action': 'start'}]]])
         self.assertEqual(str(graph[0][0][0].nodes), 'remote')
 
+    def test_excluded_nodes(self):
+        """prepare does not run anything on excluded nodes"""
+        self.fs.new_target(self.remotesrv, 'mgt', 0, '/dev/fakedev')
+        self.fs.new_client_set(Server('cli[1-3]', []), '/prepare')
+        graph = self.fs._prepare('status', excluded=NodeSet('cli2,remote'))
+
+        self.assertEqual(_graph2obj(graph),
+                         [[[{'NAME': 'proxy', 'action': 'status'}]]])
+        self.assertEqual(str(graph[0][0][0].nodes), 'cli[1,3]')
+
     def test_proxy_tunings(self):
         """prepare is ok with or without tunings"""
         self.fs.new_target(self.remotesrv, 'mgt', 0, '/dev/fakedev')
@@ -130,6 +146,77 @@ class PrepareTest(unittest.TestCase):
                          [[[{'NAME': 'stop', 'comp': comp}],
                            {'NAME': 'unload modules'}]])
 
+    def _proxies(self, graph):
+        """Return proxy actions of `graph', indexed by node names."""
+        proxies = {}
+        for tier in graph:
+            for grp in tier:
+                for act in grp:
+                    proxies[str(act.nodes)] = act
+        return proxies
+
+    def _pipeline_fs(self):
+        self.fs.new_target(Server('mgs', ['mgs@tcp']), 'mgt', 0, '/dev/mgt')
+        self.fs.new_target(Server('mds1', ['mds1@tcp']), 'mdt', 0, '/dev/mdt0')
+        self.fs.new_target(Server('mds2', ['mds2@tcp']), 'mdt', 1, '/dev/mdt1')
+        for index, name in enumerate(('oss1', 'oss1', 'oss2')):
+            self.fs.new_target(Server(name, ['%s@tcp' % name]), 'ost', index,
+                               '/dev/ost%d' % index)
+
+    def test_pipeline_start(self):
+        """pipelined start only waits for needed components"""
+        self._pipeline_fs()
+        graph = self.fs._prepare('start', groupby='START_ORDER', pipeline=True)
+        acts = self._proxies(graph)
+
+        self.assertEqual(acts['mgs'].deps, set())
+        self.assertEqual(acts['mds1'].deps, set([acts['mgs']]))
+        self.assertEqual(acts['mds2'].deps, set([acts['mgs'], acts['mds1']]))
+        self.assertEqual(acts['oss1'].deps, set([acts['mgs']]))
+        self.assertEqual(acts['oss2'].deps, set([acts['mgs']]))
+        # Start order groups are not serialized
+        for tier in graph:
+            self.assertEqual(tier.deps, set())
+
+    def test_pipeline_start_writeconf(self):
+        """pipelined start with MDT first makes OSTs wait for MDTs"""
+        self._pipeline_fs()
+        orders = {MDT.TYPE: OST.START_ORDER, OST.TYPE: MDT.START_ORDER}
+        graph = self.fs._prepare('start', groupby='START_ORDER',
+                                 pipeline=True, orders=orders)
+        acts = self._proxies(graph)
+
+        mdts = set([acts['mgs'], acts['mds1'], acts['mds2']])
+        self.assertEqual(acts['mds2'].deps, set([acts['mgs'], acts['mds1']]))
+        self.assertEqual(acts['oss1'].deps, mdts)
+        self.assertEqual(acts['oss2'].deps, mdts)
+
+    def test_start_writeconf_order(self):
+        """writeconf start order is only used for this start"""
+        self._pipeline_fs()
+        for mdt in self.fs.components.bytype(MDT.TYPE):
+            mdt._ldd_flags = LDD_F_WRITECONF
+        calls = []
+        def prepare(action, comps=None, **kwargs):
+            calls.append(kwargs)
+            return ActionGroup()
+        self.fs.status = lambda comps=None, **kwargs: None
+        self.fs._prepare = prepare
+        self.fs._run_actions = lambda: None
+        self.fs._check_errors = lambda states, comps, actions: set(states)
+
+        self.fs.start()
+        self.assertEqual(calls[0]['orders'],
+                         {MDT.TYPE: OST.START_ORDER,
+                          OST.TYPE: MDT.START_ORDER})
+        self.assertTrue(OST.START_ORDER < MDT.START_ORDER)
+
+        # Next start, without writeconf, uses the usual order
+        for mdt in self.fs.components.bytype(MDT.TYPE):
+            mdt._ldd_flags = 0
+        self.fs.start()
+        self.assertEqual(calls[1]['orders'], None)
+
 
 class SimpleFileSystemTest(unittest.TestCase):
     """Tests which do not setup a real Lustre filesystem."""
@@ -164,6 +251,45 @@ class SimpleFileSystemTest(unittest.TestCase):
         else:
             self.fail("did not raise FSRemoteError")
 
+    def test_multi_run(self):
+        """multi_run checks each file system separately"""
+        fs1 = FileSystem('testfs1')
+        fs1.new_target(Server('badnode1', ['127.0.0.2@tcp']), 'mgt', 0,
+                       '/dev/fakedev')
+        fs2 = FileSystem('testfs2')
+        fs2.new_target(Server('badnode2', ['127.0.0.3@tcp']), 'mgt', 0,
+                       '/dev/fakedev')
+
+        results = multi_run([(fs1, 'status', {}), (fs2, 'status', {})])
+        self.assertEqual(results, [set([RUNTIME_ERROR]), set([RUNTIME_ERROR])])
+        nodes = [str(keys[0]) for _, keys in fs1.proxy_errors.walk()]
+        self.assertEqual(nodes, ['badnode1'])
+        nodes = [str(keys[0]) for _, keys in fs2.proxy_errors.walk()]
+        self.assertEqual(nodes, ['badnode2'])
+
+    def test_multi_run_unload_once(self):
+        """multi_run unloads modules once, after all file systems"""
+        srvname = Utils.HOSTNAME
+        unloads = {}
+        for fsname in ('testfs1', 'testfs2'):
+            fs = FileSystem(fsname)
+            fs.new_client(Server(srvname, ['%s@tcp' % srvname]),
+                          '/%s' % fsname)
+            fs._prepare('umount', need_unload=True, unloads=unloads)
+        self.assertEqual(unloads.keys(), [srvname])
+        # It waits for the clients of both file systems.
+        self.assertEqual(len(unloads[srvname].deps), 2)
+
+    def test_multi_run_nothing(self):
+        """multi_run without file system does nothing"""
+        self.assertEqual(multi_run([]), [])
+
+    def test_run_resets_resources(self):
+        """resources left used are freed at the end of a run"""
+        get_resource('foo').acquire()
+        FileSystem('testfs')._run_actions()
+        self.assertTrue(get_resource('foo').available())
+
 
 class FileSystemTest(unittest.TestCase):
 
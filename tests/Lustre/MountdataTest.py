@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+# Shine.Lustre.Mountdata test suite
+
+"""Unit test for Shine.Lustre.Mountdata"""
+
+import os
+import shutil
+import struct
+import unittest
+
+import Utils
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre.Disk import Disk as DiskMixin, DiskDeviceError
+from Shine.Lustre.Mountdata import read_mountdata, MountdataError, \
+                                   LDD_MAGIC, LDD_FORMAT
+
+class Disk(DiskMixin):
+    """Standalone Disk, Disk itself has no attribute storage."""
+
+    __slots__ = DiskMixin.FIELDS
+
+
+BLOCK_SIZE = 1024
+INODE_SIZE = 128
+INODE_TABLE = 3
+ROOT_BLOCK = 5
+CONFIGS_BLOCK = 6
+DATA_BLOCK = 7
+CONFIGS_INO = 11
+MOUNTDATA_INO = 12
+
+def mountdata(flags=0x62, svname='foo-OST0003', magic=LDD_MAGIC):
+    """Return a lustre_disk_data content."""
+    data = struct.pack(LDD_FORMAT, magic, 0, 0, 0, 1, flags, 3, 1,
+                       'foo', svname)
+    return data + '\0' * (12288 - len(data))
+
+def dirblock(entries):
+    """Return a directory block with (inode, name) entries."""
+    data = ''
+    for i, (ino, name) in enumerate(entries):
+        rec_len = (8 + len(name) + 3) & ~3
+        if i == len(entries) - 1:
+            rec_len = BLOCK_SIZE - len(data)
+        data += struct.pack('<IHBB', ino, rec_len, len(name), 1)
+        data += name + '\0' * (rec_len - 8 - len(name))
+    return data
+
+
+class SyntheticImage(object):
+    """Build a tiny ext2/ext4 image containing CONFIGS/mountdata."""
+
+    def __init__(self, extents=False, depth=0, data=None,
+                 configs_name='CONFIGS'):
+        self.blocks = {}
+        self.inodes = {}
+        self.extents = extents
+        self.next_block = DATA_BLOCK
+
+        self.blocks[ROOT_BLOCK] = dirblock([(2, '.'), (2, '..'),
+                                            (0, 'deleted'),
+                                            (CONFIGS_INO, configs_name)])
+        self.blocks[CONFIGS_BLOCK] = dirblock([(CONFIGS_INO, '.'), (2, '..'),
+                                               (MOUNTDATA_INO, 'mountdata')])
+        self.add_inode(2, 0x41ED, BLOCK_SIZE, [ROOT_BLOCK])
+        self.add_inode(CONFIGS_INO, 0x41ED, BLOCK_SIZE, [CONFIGS_BLOCK])
+
+        if data is None:
+            data = mountdata()
+        blocks = []
+        for offset in range(0, len(data), BLOCK_SIZE):
+            blocks.append(self.alloc(data[offset:offset + BLOCK_SIZE]))
+        self.add_inode(MOUNTDATA_INO, 0x81A4, len(data), blocks, depth)
+
+    def alloc(self, content):
+        blocknr = self.next_block
+        self.next_block += 1
+        self.blocks[blocknr] = content
+        return blocknr
+
+    def add_inode(self, ino, mode, size, blocks, depth=0):
+        if self.extents:
+            flags = 0x80000
+            extent = struct.pack('<IHHI', 0, len(blocks), 0, blocks[0])
+            if depth:
+                leaf = struct.pack('<4HI', 0xF30A, 1, 4, 0, 0) + extent
+                index = struct.pack('<IIHH', 0, self.alloc(leaf), 0, 0)
+                i_block = struct.pack('<4HI', 0xF30A, 1, 4, 1, 0) + index
+            else:
+                i_block = struct.pack('<4HI', 0xF30A, 1, 4, 0, 0) + extent
+        else:
+            flags = 0
+            ptrs = blocks[:12] + [0] * (12 - len(blocks[:12]))
+            if len(blocks) > 12:
+                indirect = struct.pack('<%dI' % len(blocks[12:]), *blocks[12:])
+                ptrs.append(self.alloc(indirect))
+            i_block = struct.pack('<%dI' % len(ptrs), *ptrs)
+        i_block += '\0' * (60 - len(i_block))
+        self.inodes[ino] = struct.pack('<HHI24xI', mode, 0, size, flags) + \
+                           '\0' * 4 + i_block
+        self.inodes[ino] += '\0' * (INODE_SIZE - len(self.inodes[ino]))
+
+    def write(self, path):
+        incompat = 0x2
+        if self.extents:
+            incompat |= 0x40
+        sblock = struct.pack('<13I6H4I', 16, 64, 0, 0, 0, 1, 0, 0,
+                             8192, 8192, 16, 0, 0,
+                             0, 0, 0xEF53, 1, 1, 0, 0, 0, 0, 1)
+        sblock += '\0' * (88 - len(sblock))
+        sblock += struct.pack('<HHII', INODE_SIZE, 0, 0, incompat)
+
+        fobj = open(path, 'wb')
+        fobj.truncate(64 * BLOCK_SIZE)
+        fobj.seek(BLOCK_SIZE)
+        fobj.write(sblock)
+        fobj.seek(2 * BLOCK_SIZE + 8)
+        fobj.write(struct.pack('<I', INODE_TABLE))
+        for ino, inode in self.inodes.items():
+            fobj.seek(INODE_TABLE * BLOCK_SIZE + (ino - 1) * INODE_SIZE)
+            fobj.write(inode)
+        for blocknr, content in self.blocks.items():
+            fobj.seek(blocknr * BLOCK_SIZE)
+            fobj.write(content)
+        fobj.close()
+
+
+class ReadMountdataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Utils.make_tempdir()
+        self.img = os.path.join(self.tmpdir, 'img')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_block_map(self):
+        """test mountdata with block mapped files"""
+        SyntheticImage().write(self.img)
+        self.assertEqual(read_mountdata(self.img), (0x62, 'foo-OST0003'))
+
+    def test_indirect_block(self):
+        """test mountdata with an indirect block"""
+        SyntheticImage(data=mountdata() + '\0' * 4096).write(self.img)
+        self.assertEqual(read_mountdata(self.img), (0x62, 'foo-OST0003'))
+
+    def test_extents(self):
+        """test mountdata with extents"""
+        SyntheticImage(extents=True).write(self.img)
+        self.assertEqual(read_mountdata(self.img), (0x62, 'foo-OST0003'))
+
+    def test_extent_tree(self):
+        """test mountdata with an extent index"""
+        SyntheticImage(extents=True, depth=1).write(self.img)
+        self.assertEqual(read_mountdata(self.img), (0x62, 'foo-OST0003'))
+
+    def test_svname(self):
+        """test mountdata flags and service name"""
+        data = mountdata(flags=0x2, svname='foo:MDT0000')
+        SyntheticImage(data=data).write(self.img)
+        self.assertEqual(read_mountdata(self.img), (0x2, 'foo:MDT0000'))
+
+    def test_not_ldiskfs(self):
+        """test device without ldiskfs is not recognised"""
+        fobj = open(self.img, 'wb')
+        fobj.truncate(64 * BLOCK_SIZE)
+        fobj.close()
+        self.assertRaises(MountdataError, read_mountdata, self.img)
+
+    def test_too_small(self):
+        """test truncated device is not recognised"""
+        open(self.img, 'wb').close()
+        self.assertRaises(MountdataError, read_mountdata, self.img)
+
+    def test_no_configs(self):
+        """test device without CONFIGS is not recognised"""
+        SyntheticImage(configs_name='OTHERS').write(self.img)
+        self.assertRaises(MountdataError, read_mountdata, self.img)
+
+    def test_bad_magic(self):
+        """test mountdata with a bad magic is not recognised"""
+        SyntheticImage(data=mountdata(magic=0x1234)).write(self.img)
+        self.assertRaises(MountdataError, read_mountdata, self.img)
+
+    def test_missing_device(self):
+        """test missing device raises IOError"""
+        self.assertRaises(IOError, read_mountdata, self.img)
+
+
+class DiskNativeMountdataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = Utils.make_tempdir()
+        self.img = os.path.join(self.tmpdir, 'img')
+        # tunefs.lustre always fails
+        script = os.path.join(self.tmpdir, 'tunefs.lustre')
+        fobj = open(script, 'w')
+        fobj.write("#!/bin/sh\nexit 1\n")
+        fobj.close()
+        os.chmod(script, 0755)
+        Globals().replace('command_path', self.tmpdir)
+        Globals().replace('native_mountdata', 'yes')
+
+    def tearDown(self):
+        del Globals()['command_path']
+        del Globals()['native_mountdata']
+        Disk(self.img).mountdata_forget()
+        shutil.rmtree(self.tmpdir)
+
+    def test_native(self):
+        """test mountdata are read without tunefs.lustre"""
+        SyntheticImage().write(self.img)
+        disk = Disk(self.img)
+        self.assertEqual(disk.mountdata_probe(), None)
+        disk._mountdata_check(label_check='foo-OST0003')
+        self.assertEqual(disk.flags(), ['first_time', 'update'])
+
+    def test_fallback(self):
+        """test tunefs.lustre is used for unknown layouts"""
+        SyntheticImage(data=mountdata(magic=0x1234)).write(self.img)
+        disk = Disk(self.img)
+        self.assertNotEqual(disk.mountdata_probe(), None)
+        self.assertRaises(DiskDeviceError, disk._mountdata_check)
+
+    def test_disabled(self):
+        """test tunefs.lustre is used when native reader is disabled"""
+        Globals().replace('native_mountdata', 'no')
+        SyntheticImage().write(self.img)
+        disk = Disk(self.img)
+        self.assertNotEqual(disk.mountdata_probe(), None)
@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+# Shine.Lustre.ProcSnapshot test suite
+
+"""Unit test for ProcSnapshot"""
+
+import os
+import shutil
+import unittest
+
+import Utils
+from Shine.Lustre import ProcSnapshot
+from Shine.Lustre.ProcSnapshot import ProcSnapshot as Snapshot
+from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Server import Server
+from Shine.Lustre.Component import MOUNTED, OFFLINE, RECOVERING
+
+MOUNTS = """/dev/sda1 / ext4 rw,relatime 0 0
+/dev/sdb /mnt/foo-OST0000 lustre ro 0 0
+/dev/sdc /mnt/foo-OST0001 lustre ro 0 0
+foo1@tcp:/foo /foo lustre rw,flock 0 0
+"""
+
+PARTITIONS = """major minor  #blocks  name
+
+   8        0  488386584 sda
+   8        1     524288 sda1
+   8       16    1048576 sdb
+   8       32    2097152 sdc
+"""
+
+MODULES = """lustre 921744 2 - Live 0xffffffffa0a8c000
+ldiskfs 388452 4 - Live 0xffffffffa0866000
+libcfs 494118 11 lustre,ldiskfs, Live 0xffffffffa03e5000
+ext4 374902 1 - Live 0xffffffffa0277000
+"""
+
+RECOVERING_STATUS = """status: RECOVERING
+recovery_start: 1328098180
+time_remaining: 221
+connected_clients: 1/4
+req_replay_clients: 0
+lock_repay_clients: 0
+completed_clients: 1/4
+evicted_clients: 0
+"""
+
+class ProcSnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.root = Utils.make_tempdir()
+        self._write('mounts', MOUNTS)
+        self._write('partitions', PARTITIONS)
+        self._write('modules', MODULES)
+        self._write('fs/lustre/obdfilter/foo-OST0000/mntdev', '/dev/sdb\n')
+        self._write('fs/lustre/osd-ldiskfs/foo-OST0000/mntdev', '/dev/sdb\n')
+        self._write('fs/lustre/obdfilter/foo-OST0000/recovery_status',
+                    'status: COMPLETE\n')
+        self._write('fs/lustre/obdfilter/foo-OST0001/mntdev', '/dev/sdc\n')
+        self._write('fs/lustre/obdfilter/foo-OST0001/recovery_status',
+                    RECOVERING_STATUS)
+        self._write('fs/lustre/lov/foo-clilov-ffff8800/uuid', 'foo\n')
+        self._write('fs/lustre/osc/foo-OST0000-osc-ffff8800/state',
+                    'current_state: FULL\n')
+        self._write('fs/lustre/mdc/foo-MDT0000-mdc-ffff8800/state',
+                    'current_state: FULL\n')
+        self._write('fs/lustre/osc/bar-OST0000-osc-ffff8800/state',
+                    'current_state: EVICTED\n')
+
+    def tearDown(self):
+        ProcSnapshot.deactivate()
+        shutil.rmtree(self.root)
+
+    def _write(self, name, content):
+        path = os.path.join(self.root, name)
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        fobj = open(path, 'w')
+        fobj.write(content)
+        fobj.close()
+
+    def test_mounts(self):
+        """test mounts indexed by device and mount point"""
+        snap = Snapshot(self.root)
+        self.assertEqual(snap.mounts_by_dev('/dev/sdb'),
+                         [('/dev/sdb', '/mnt/foo-OST0000', 'lustre')])
+        self.assertEqual(snap.mounts_by_path('/foo'),
+                         [('foo1@tcp:/foo', '/foo', 'lustre')])
+        self.assertEqual(snap.mounts_by_dev('/dev/sdd'), [])
+
+    def test_partitions(self):
+        """test partition sizes"""
+        snap = Snapshot(self.root)
+        self.assertEqual(snap.partition_size('sdb'), 1048576 * 1024)
+        self.assertEqual(snap.partition_size('sda1'), 524288 * 1024)
+        self.assertEqual(snap.partition_size('name'), None)
+        self.assertEqual(snap.partition_size('sdd'), None)
+
+    def test_modules(self):
+        """test loaded modules"""
+        snap = Snapshot(self.root)
+        self.assertEqual(snap.modules()['libcfs'], 11)
+        self.assertEqual(snap.modules()['ldiskfs'], 4)
+
+    def test_targets(self):
+        """test target entries indexed by label"""
+        snap = Snapshot(self.root)
+        mntdevs, recovs = snap.target_paths('foo-OST0000')
+        self.assertEqual(len(mntdevs), 2)
+        self.assertEqual(len(recovs), 1)
+        self.assertEqual(snap.mntdev('foo-OST0000'), '/dev/sdb')
+        self.assertEqual(snap.recovery_status('foo-OST0000'),
+                         ['status: COMPLETE\n'])
+        self.assertEqual(snap.target_paths('foo-OST0002'), ([], []))
+        self.assertEqual(snap.mntdev('foo-OST0002'), None)
+        self.assertEqual(snap.recovery_status('foo-OST0002'), None)
+
+    def test_clients(self):
+        """test client entries indexed by filesystem name"""
+        snap = Snapshot(self.root)
+        self.assertEqual(len(snap.client_lovs('foo')), 1)
+        self.assertEqual(snap.client_lovs('bar'), [])
+        states = snap.import_states('foo')
+        self.assertEqual(len(states), 2)
+        self.assertEqual(states[0][1], ['current_state: FULL\n'])
+        self.assertEqual(len(snap.import_states('bar')), 1)
+
+    def test_read_once(self):
+        """test sources are read only once"""
+        snap = Snapshot(self.root)
+        self.assertEqual(snap.modules()['libcfs'], 11)
+        self.assertEqual(snap.mntdev('foo-OST0000'), '/dev/sdb')
+        self._write('modules', '')
+        self._write('fs/lustre/obdfilter/foo-OST0000/mntdev', '/dev/sdd\n')
+        self.assertEqual(snap.modules()['libcfs'], 11)
+        self.assertEqual(snap.mntdev('foo-OST0000'), '/dev/sdb')
+
+    def test_shared_snapshot(self):
+        """test snapshot is shared only during a run"""
+        self.assertNotEqual(ProcSnapshot.snapshot(), ProcSnapshot.snapshot())
+        ProcSnapshot.activate(self.root)
+        snap = ProcSnapshot.snapshot()
+        self.assertEqual(snap.root, self.root)
+        self.assertTrue(ProcSnapshot.snapshot() is snap)
+        # Already active, keep the same snapshot
+        ProcSnapshot.activate()
+        self.assertTrue(ProcSnapshot.snapshot() is snap)
+        ProcSnapshot.invalidate()
+        self.assertFalse(ProcSnapshot.snapshot() is snap)
+        self.assertEqual(ProcSnapshot.snapshot().root, self.root)
+        ProcSnapshot.deactivate()
+        self.assertEqual(ProcSnapshot.snapshot().root, '/proc')
+
+    def test_component_checks(self):
+        """test component checks consult the snapshot"""
+        ProcSnapshot.activate(self.root)
+        fs = FileSystem('foo')
+        srv = Server('foo1', ['foo1@tcp'])
+        fs.local_server = srv
+        ost0 = fs.new_target(srv, 'ost', 0, '/dev/sdb')
+        ost1 = fs.new_target(srv, 'ost', 1, '/dev/sdc')
+        ost2 = fs.new_target(srv, 'ost', 2, '/dev/sdd')
+        client = fs.new_client(srv, '/foo')
+
+        ost0.lustre_check()
+        self.assertEqual(ost0.local_state, MOUNTED)
+        self.assertEqual(ost0.mntdev, '/dev/sdb')
+        ost1.lustre_check()
+        self.assertEqual(ost1.local_state, RECOVERING)
+        self.assertEqual(ost1.recov_info, "221s (1/4)")
+        ost2.lustre_check()
+        self.assertEqual(ost2.local_state, OFFLINE)
+
+        client.lustre_check()
+        self.assertEqual(client.state, MOUNTED)
+        self.assertEqual(client.mtpt, '/foo')
+        self.assertEqual(client.proc_states, {'FULL': 2})
+
+        srv.lustre_check()
+        self.assertEqual(srv.modules,
+                         {'libcfs': 11, 'lustre': 2, 'ldiskfs': 4})
@@ -68,6 +68,17 @@ class ServerTest(unittest.TestCase):
         nodes_long = nodes | NodeSet(Server.hostname_long())
         self.assertEqual(Server.distant_servers(nodes_long), nodes)
 
+    def test_running_actions(self):
+        """test running actions are not shared between servers"""
+        srv1 = Server('foo1', ['foo1@tcp'])
+        srv2 = Server('foo2', ['foo2@tcp'])
+        srv1._add_action('start')
+        self.assertEqual(list(srv1._list_action()), ['start'])
+        self.assertEqual(list(srv2._list_action()), [])
+        srv1._del_action('start')
+        self.assertEqual(list(srv1._list_action()), [])
+        self.assertEqual(srv2.modules, {})
+
 
 class ServerGroupTest(unittest.TestCase):
 
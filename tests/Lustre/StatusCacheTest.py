@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# Shine.Lustre.StatusCache test suite
+
+"""Unit test for StatusCache"""
+
+import os
+import unittest
+
+import Utils
+from Shine.Configuration.Globals import Globals
+from Shine.Lustre import StatusCache
+from Shine.Lustre.StatusCache import StatusCache as Cache
+from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Server import Server
+from Shine.Lustre.Component import MOUNTED, OFFLINE
+
+
+class StatusCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = Utils.makeTempFilename()
+        os.unlink(self.path)
+
+    def tearDown(self):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def test_missing_file(self):
+        """a missing cache file is an empty cache"""
+        cache = Cache(self.path)
+        self.assertEqual(cache.get('foo', 60), None)
+        cache.save()
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_max_age(self):
+        """records older than max_age are ignored"""
+        cache = Cache(self.path)
+        cache.put('foo', {'state': MOUNTED}, now=1000)
+        self.assertEqual(cache.get('foo', 60, now=1030), {'state': MOUNTED})
+        self.assertEqual(cache.get('foo', 60, now=1060), {'state': MOUNTED})
+        self.assertEqual(cache.get('foo', 60, now=1061), None)
+        self.assertEqual(cache.get('foo', 0, now=1000), {'state': MOUNTED})
+        # Clock went backward
+        self.assertEqual(cache.get('foo', 60, now=999), None)
+
+    def test_save_load(self):
+        """records are kept in cache file"""
+        cache = Cache(self.path)
+        cache.put('foo', {'state': MOUNTED}, now=1000)
+        cache.save()
+        self.assertFalse(cache.dirty)
+        self.assertEqual(Cache(self.path).get('foo', 60, now=1010),
+                         {'state': MOUNTED})
+
+    def test_bad_file(self):
+        """a corrupted cache file is an empty cache"""
+        open(self.path, 'w').write("not a cache")
+        cache = Cache(self.path)
+        self.assertEqual(cache.get('foo', 60), None)
+        cache.put('foo', {'state': MOUNTED}, now=1000)
+        cache.save()
+        self.assertEqual(Cache(self.path).get('foo', 60, now=1000),
+                         {'state': MOUNTED})
+
+    def test_forget(self):
+        """forgotten records are removed from cache file"""
+        cache = Cache(self.path)
+        cache.put('foo', {'state': MOUNTED}, now=1000)
+        cache.put('bar', {'state': MOUNTED}, now=1000)
+        cache.save()
+        cache.forget('foo')
+        self.assertEqual(cache.get('foo', 60, now=1000), None)
+        cache.save()
+        cache = Cache(self.path)
+        self.assertEqual(cache.get('foo', 60, now=1000), None)
+        self.assertEqual(cache.get('bar', 60, now=1000), {'state': MOUNTED})
+
+    def test_concurrent_writers(self):
+        """records saved by another writer are read again and kept"""
+        cache1 = Cache(self.path)
+        cache2 = Cache(self.path)
+        cache1.put('foo', {'state': MOUNTED}, now=1000)
+        cache2.put('bar', {'state': OFFLINE}, now=1000)
+        cache1.save()
+        cache2.save()
+        self.assertEqual(cache1.get('bar', 60, now=1000), {'state': OFFLINE})
+
+        cache1.forget('bar')
+        cache2.put('foo', {'state': OFFLINE}, now=1010)
+        cache2.save()
+        cache1.save()
+        cache = Cache(self.path)
+        self.assertEqual(cache.get('foo', 60, now=1010), {'state': OFFLINE})
+        self.assertEqual(cache.get('bar', 60, now=1010), None)
+
+    def test_unwritable(self):
+        """errors writing the cache file are ignored"""
+        cache = Cache('/proc/shine-test/foo.cache')
+        cache.put('foo', {'state': MOUNTED})
+        cache.save()
+        self.assertFalse(cache.dirty)
+
+
+class ComponentCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.status_dir = Utils.make_tempdir()
+        Globals().replace('status_dir', self.status_dir)
+        StatusCache.reset()
+        self.fs = FileSystem('cache')
+        self.srv = Server('foo1', ['foo1@tcp'])
+        self.fs.local_server = self.srv
+
+    def tearDown(self):
+        StatusCache.reset()
+        for name in os.listdir(self.status_dir):
+            os.unlink(os.path.join(self.status_dir, name))
+        Utils.clean_tempdir(self.status_dir)
+        del Globals()['status_dir']
+
+    def test_record_lookup(self):
+        """component records are saved per file system"""
+        tgt = self.fs.new_target(self.srv, 'ost', 3, '/dev/foo')
+        tgt.state = MOUNTED
+        StatusCache.record(tgt)
+        StatusCache.flush()
+        self.assertEqual(os.listdir(self.status_dir), ['cache.cache'])
+
+        StatusCache.reset()
+        record = StatusCache.lookup(tgt, 60)
+        self.assertEqual(record['states'], {'foo1': MOUNTED})
+        self.assertEqual(record['index'], 3)
+
+    def test_record_mountdata(self):
+        """records without mountdata are not used when they are needed"""
+        tgt = self.fs.new_target(self.srv, 'ost', 3, '/dev/foo')
+        tgt.state = MOUNTED
+        StatusCache.record(tgt, mountdata=False)
+        self.assertNotEqual(StatusCache.lookup(tgt, 60), None)
+        self.assertEqual(StatusCache.lookup(tgt, 60, mountdata=True), None)
+
+        StatusCache.record(tgt, mountdata=True)
+        self.assertNotEqual(StatusCache.lookup(tgt, 60, mountdata=True), None)
+
+    def test_action_forgets_record(self):
+        """a completed action drops the component record"""
+        client = self.fs.new_client(self.srv, '/foo')
+        client.state = OFFLINE
+        StatusCache.record(client)
+        StatusCache.flush()
+        self.assertNotEqual(StatusCache.lookup(client, 60), None)
+
+        client.execute(addopts='true').launch()
+        self.fs._run_actions()
+        StatusCache.reset()
+        self.assertEqual(StatusCache.lookup(client, 60), None)
@@ -288,3 +288,38 @@ class GetStateTest(unittest.TestCase):
                             self.srv3name: RECOVERING}
         self.assertFalse(self.tgt.update_server())
         self.assertEqual(self.tgt.server, self.srv1)
+
+    def test_cached_state(self):
+        """test global state follows node state changes"""
+        self.tgt.state = OFFLINE
+        self.assertEqual(self.tgt.state, OFFLINE)
+
+        remote = FileSystem('allsrvr').new_target(self.srv2, 'ost', 0,
+                                                  '/dev/null')
+        remote.state = MOUNTED
+        self.tgt.update_record(remote.state_record(), self.srv2)
+        self.assertEqual(self.tgt.state, MIGRATED)
+
+        remote.state = OFFLINE
+        self.tgt.update_record(remote.state_record(), self.srv2)
+        self.assertEqual(self.tgt.state, OFFLINE)
+
+        remote.state = None
+        self.tgt.update_record(remote.state_record(), self.srv2)
+        self.tgt.state = None
+        self.assertEqual(self.tgt.state, None)
+        self.tgt.sanitize_state([self.srv1name])
+        self.assertEqual(self.tgt.state, RUNTIME_ERROR)
+
+        self.tgt._states = {self.srv1name: RECOVERING}
+        self.assertEqual(self.tgt.state, RECOVERING)
+        self.tgt.add_server(Server('foo4', ['foo4@tcp']))
+        self.tgt.state = MOUNTED
+        self.assertEqual(self.tgt.state, MOUNTED)
+
+    def test_label_cached(self):
+        """test label is computed once"""
+        self.assertEqual(self.tgt.label, 'allsrvr-OST0000')
+        self.tgt.fs.fs_name = 'other'
+        self.assertEqual(self.tgt.label, 'allsrvr-OST0000')
+        self.assertEqual(self.tgt.uniqueid(), 'allsrvr-OST0000')
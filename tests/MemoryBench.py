@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+# Shine component memory benchmark
+# Copyright (C) 2026 CEA
+
+"""
+Measure the memory and pickle footprint of client components.
+
+A file system with N client nodes is built twice: with one Client and one
+Server per node, then with a single ClientSet (see client_set_size). The
+size of each component graph is computed by following instance attributes
+and containers, or slots. Objects shared by all components, like the file
+system, are not counted.
+
+Usage: PYTHONPATH=../lib python MemoryBench.py [-n CLIENTS]
+
+Run it on two revisions to compare per-component footprints.
+"""
+
+import sys
+import pickle
+from optparse import OptionParser
+
+from Shine.Lustre.FileSystem import FileSystem
+from Shine.Lustre.Server import Server
+
+def deep_size(obj, seen):
+    """Return the size in bytes of `obj' and of the objects it refers to,
+    except the ones already in `seen'."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        for key, value in obj.iteritems():
+            size += deep_size(key, seen) + deep_size(value, seen)
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        for item in obj:
+            size += deep_size(item, seen)
+    if hasattr(obj, '__dict__'):
+        size += deep_size(obj.__dict__, seen)
+    for cls in type(obj).__mro__:
+        for name in cls.__dict__.get('__slots__', ()):
+            if hasattr(obj, name):
+                size += deep_size(getattr(obj, name), seen)
+    return size
+
+def measure(fs, comps):
+    """Return (memory, pickle) sizes of `comps', in bytes."""
+    # The file system, its component group and the event handler are
+    # shared by all components.
+    seen = set([id(fs), id(fs.components), id(fs.hdlr), id(fs.__dict__)])
+    memory = sum([deep_size(comp, seen) for comp in comps])
+    pickled = sum([len(pickle.dumps(comp, -1)) for comp in comps])
+    return memory, pickled
+
+def main():
+    parser = OptionParser(usage="%prog [-n CLIENTS]")
+    parser.add_option('-n', dest='count', type='int', default=10000,
+                      help="number of client nodes")
+    options, _ = parser.parse_args()
+    nodes = ['cli%d' % idx for idx in range(options.count)]
+
+    fs = FileSystem('bench')
+    clients = [fs.new_client(Server(node, ['%s@tcp' % node]), '/bench')
+               for node in nodes]
+    memory, pickled = measure(fs, clients)
+
+    fs = FileSystem('bench')
+    clientset = fs.new_client_set(Server(','.join(nodes), []), '/bench')
+    set_memory, set_pickled = measure(fs, [clientset])
+
+    print "%-20s %12s %12s %12s" % ('LAYOUT', 'MEMORY (B)', 'PER NODE',
+                                    'PICKLE (B)')
+    print "%-20s %12d %12.1f %12d" % ('Client per node', memory,
+                                      float(memory) / options.count, pickled)
+    print "%-20s %12d %12.1f %12d" % ('ClientSet', set_memory,
+                                      float(set_memory) / options.count,
+                                      set_pickled)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# Shine startup time benchmark
+# Copyright (C) 2026 CEA
+
+"""
+Measure the cold start import time of each shine command.
+
+Each measure runs in a new interpreter, which imports the controller and
+the selected command class, as `shine <command>' does before running it.
+
+Usage: PYTHONPATH=../lib python StartupBench.py [-n RUNS] [COMMAND...]
+
+Exit code is 1 if a command median time is above IMPORT_BUDGET, or if the
+controller alone loads one of the STARTUP_FORBIDDEN modules.
+"""
+
+import sys
+import subprocess
+from optparse import OptionParser
+
+# Maximum median import time of a command, in seconds.
+IMPORT_BUDGET = 0.5
+
+# Modules which must only be loaded by the commands using them.
+STARTUP_FORBIDDEN = ['Shine.Lustre.Actions.Proxy',
+                     'Shine.Lustre.Actions.Action',
+                     'Shine.Lustre.Actions.Status',
+                     'Shine.Lustre.Actions.Tune',
+                     'Shine.Lustre.Server',
+                     'Shine.Lustre.StatusCache',
+                     'Shine.Lustre.FileSystem',
+                     'Shine.CLI.Display',
+                     'Shine.Commands.Base.RemoteCallEventHandler']
+
+_PROBE = """
+import sys
+import time
+start = time.time()
+import Shine.Controller
+from Shine.Commands import COMMAND_LIST
+for name in %r:
+    COMMAND_LIST[name]
+print time.time() - start
+print ' '.join([name for name in sys.modules if sys.modules[name]])
+"""
+
+def measure(names, runs):
+    """
+    Return sorted import times, in seconds, of `runs' cold starts, and the
+    names of the modules loaded by the last one.
+    """
+    times = []
+    for _ in range(runs):
+        proc = subprocess.Popen([sys.executable, '-c', _PROBE % (names,)],
+                                stdout=subprocess.PIPE)
+        output = proc.communicate()[0]
+        if proc.returncode != 0:
+            raise RuntimeError("Probe failed for %s" % ','.join(names))
+        elapsed, modules = output.split('\n', 1)
+        times.append(float(elapsed))
+    times.sort()
+    return times, modules.split()
+
+def main():
+    parser = OptionParser(usage="%prog [-n RUNS] [COMMAND...]")
+    parser.add_option('-n', dest='runs', type='int', default=5,
+                      help="number of cold starts per command")
+    options, args = parser.parse_args()
+
+    from Shine.Commands import COMMAND_LIST
+    names = args or sorted(COMMAND_LIST)
+
+    rc = 0
+    print "%-10s %10s %10s" % ('COMMAND', 'MIN (ms)', 'MEDIAN (ms)')
+    for label, cmds in [('(none)', [])] + [(name, [name]) for name in names] \
+                       + [('(all)', sorted(COMMAND_LIST))]:
+        times, modules = measure(cmds, options.runs)
+        median = times[len(times) / 2]
+        flag = ''
+        if median > IMPORT_BUDGET:
+            flag = ' over budget'
+            rc = 1
+        print "%-10s %10.1f %10.1f%s" % (label, times[0] * 1000,
+                                         median * 1000, flag)
+        if not cmds:
+            loaded = [name for name in STARTUP_FORBIDDEN if name in modules]
+            if loaded:
+                print "Loaded at startup: %s" % ', '.join(loaded)
+                rc = 1
+    return rc
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -29,6 +29,16 @@ def rootonly(method):
     root_tested.__doc__ = method.__doc__
     return root_tested
 
+def patch_method(obj, name, func):
+    """
+    Replace method `name' of `obj' by `func', for this object only.
+
+    Components and servers have no instance dict, so `obj' class is replaced
+    by a subclass, with the same name, overriding this method.
+    """
+    cls = obj.__class__
+    obj.__class__ = type(cls.__name__, (cls,), {'__slots__': (), name: func})
+
 #
 # Temp fake disk
 #